@@ -12,10 +12,14 @@ import aprslib
 import re
 import logging
 import maidenhead as mh
+import queue
+import socket
+import threading
+import time
 
 from datetime import datetime, timezone
+from functools import lru_cache
 from math import modf
-from ka9q_js8Utils import writeStringToFile
 
 CALLSIGN_SUFFIX_REX = r"(?P<prefix>[\d\w]{,3}[/])?(?P<callsign>[\d\w]+)[/]?(?P<suffix>[\d\w]+)?"
 
@@ -23,8 +27,145 @@ DEFAULT_APRS_HOST="asia.aprs2.net"
 DEFAULT_APRS_PORT=14580
 DEFAULT_LOG_FN="./aprs_frames.log"
 
+# Frames waiting to be sent, once full new frames are dropped rather than stalling the decoders
+DEFAULT_SEND_QUEUE_SIZE=500
+# Max frames sent in one write to APRS-IS
+SEND_BATCH_SIZE=20
+# Reconnect backoff (secs), doubles after each failed attempt up to the max
+RECONNECT_BACKOFF_MIN=5
+RECONNECT_BACKOFF_MAX=300
+# How often (secs) an idle connection is checked and the server's keep-alives read off
+IDLE_CHECK_INTERVAL=15
+
+# Repeats of a station's position (same grid) within the TTL (secs) are dropped, eg heard across bands / submodes
+DEFAULT_POSITION_TTL=900
+# Per callsign position rate limit, a burst of positions then one per interval (secs)
+DEFAULT_POSITION_BURST=2
+DEFAULT_POSITION_INTERVAL=300
+
 glogger = logging.getLogger(__name__)
 
+
+@lru_cache(maxsize=4096)
+def gridToAprs(grid_locator: str):
+    # Memoized, the same few grids are reported over and over
+    # Get the top-left coordinates (latitude, longitude)
+    lat, lon = mh.to_location(grid_locator)
+    #print(f"Top-left corner: Lat={lat}, Lon={lon}")
+
+    # Get the center coordinates (latitude, longitude)
+    center_lat, center_lon = mh.to_location(grid_locator, center=True)
+    #print(f"Center of square: Lat={center_lat}, Lon={center_lon}")
+
+    latDir = "N"
+    if (lat < 0):
+        lat *= -1
+        latDir = "S"
+    
+    lonDir = "E"
+    if (lon < 0):
+        lon *= -1
+        lonDir = "W"
+
+    fLat,iLat = modf(lat)
+    fLon,iLon = modf(lon)
+
+    fLatMin,iLatMin = modf(fLat * 60)
+    fLonMin,iLonMin = modf(fLon * 60)
+
+    iLatSec = round(fLatMin * 60)
+    iLonSec = round(fLonMin * 60)
+
+    if (iLatSec == 60):
+        iLatMin += 1
+        iLatSec = 0
+
+    if (iLonSec == 60):
+        iLonMin += 1
+        iLonSec = 0
+    
+    if (iLatMin == 60):
+        iLat += 1
+        iLatMin = 0
+
+    if (iLonMin == 60):
+        iLon += 1
+        iLonMin = 0
+
+    aprsLat = iLat * 100 + iLatMin + (iLatSec / 60.0)
+    aprsLon = iLon * 100 + iLonMin + (iLonSec / 60.0)
+
+    return f"{aprsLat:07.2f}{latDir}", f"{aprsLon:08.2f}{lonDir}"
+
+
+#################################################################################
+# APRSPositionLimiter Class
+#################################################################################
+
+class APRSPositionLimiter:
+
+    ttl: int
+    burst: int
+    interval: int
+
+    def __init__(self, ttl:int=DEFAULT_POSITION_TTL, burst:int=DEFAULT_POSITION_BURST, interval:int=DEFAULT_POSITION_INTERVAL):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.ttl = ttl
+        self.burst = burst
+        self.interval = interval
+
+        # (callsign, grid) -> expiry ts
+        self.seen = {}
+        # callsign -> [tokens, last refill ts]
+        self.buckets = {}
+        self.next_purge = 0
+        # Shared by the frame aggregator's shards
+        self.lock = threading.Lock()
+
+    def allow(self, callsign:str, grid:str, now:float=None) -> bool:
+        # True if the position should be reported, False if it is a repeat or the callsign is over its rate
+        if now is None:
+            now = time.time()
+
+        key = (callsign.upper(), grid.upper())
+
+        with self.lock:
+            if now >= self.next_purge:
+                self.purge(now)
+
+            expiry = self.seen.get(key)
+            if expiry is not None and now < expiry:
+                self.logger.debug(f"Dropping repeated APRS position for: [{callsign}] Grid: [{grid}]")
+                return False
+
+            bucket = self.buckets.get(key[0])
+            if bucket is None:
+                bucket = [float(self.burst), now]
+                self.buckets[key[0]] = bucket
+            else:
+                bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) / self.interval)
+                bucket[1] = now
+
+            if bucket[0] < 1:
+                self.logger.info(f"Dropping APRS position for: [{callsign}] Grid: [{grid}], position rate limit exceeded.")
+                return False
+
+            bucket[0] -= 1
+            self.seen[key] = now + self.ttl
+            return True
+
+    def purge(self, now:float):
+        self.seen = {key: expiry for key, expiry in self.seen.items() if expiry > now}
+        # A bucket idle long enough to have refilled is the same as no bucket
+        refill_secs = self.burst * self.interval
+        self.buckets = {callsign: bucket for callsign, bucket in self.buckets.items() if now - bucket[1] < refill_secs}
+        self.next_purge = now + min(self.ttl, self.interval)
+
+
+#################################################################################
+# APRSReporter Class
+#################################################################################
+
 class APRSReporter:
 
     reporter: str
@@ -35,10 +176,12 @@ class APRSReporter:
     aprs_port: int
 
     log_fn: str;
+    send_queue_size: int
 
     AIS = None
 
-    def __init__(self, reporter:str, user:str, passcode:str, reporting_enabled:bool=True, host:str=DEFAULT_APRS_HOST, port:int=DEFAULT_APRS_PORT, log_fn: str=DEFAULT_LOG_FN):
+    def __init__(self, reporter:str, user:str, passcode:str, reporting_enabled:bool=True, host:str=DEFAULT_APRS_HOST, port:int=DEFAULT_APRS_PORT, log_fn: str=DEFAULT_LOG_FN,
+                 send_queue_size:int=DEFAULT_SEND_QUEUE_SIZE, position_ttl:int=DEFAULT_POSITION_TTL, position_interval:int=DEFAULT_POSITION_INTERVAL):
         self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
         self.reporter = reporter.upper()
         self.log_fn = log_fn
@@ -49,55 +192,23 @@ class APRSReporter:
         self.aprs_passcode=passcode
         self.AIS = aprslib.IS(callsign=user, passwd=passcode, host=host, port=port) 
 
+        # Frames are sent by a background sender thread (started on the first frame) over a single
+        # logged in connection, so a slow or unreachable APRS-IS server never holds up decoding.
+        self.send_queue_size = send_queue_size
+        self.send_queue = queue.Queue(maxsize=send_queue_size)
+        self.sender = None
+        self.sender_lock = threading.Lock()
+        # Set by close(), wakes the sender out of a reconnect backoff
+        self.stop_event = threading.Event()
+        self.connected = False
+        self.backoff = RECONNECT_BACKOFF_MIN
+        self.log_file = None
 
-    def grid2aprs(self, grid_locator: str):
-        # Get the top-left coordinates (latitude, longitude)
-        lat, lon = mh.to_location(grid_locator)
-        #print(f"Top-left corner: Lat={lat}, Lon={lon}")
-
-        # Get the center coordinates (latitude, longitude)
-        center_lat, center_lon = mh.to_location(grid_locator, center=True)
-        #print(f"Center of square: Lat={center_lat}, Lon={center_lon}")
-
-        latDir = "N"
-        if (lat < 0):
-            lat *= -1
-            latDir = "S"
-        
-        lonDir = "E"
-        if (lon < 0):
-            lon *= -1
-            lonDir = "W"
-
-        fLat,iLat = modf(lat)
-        fLon,iLon = modf(lon)
-
-        fLatMin,iLatMin = modf(fLat * 60)
-        fLonMin,iLonMin = modf(fLon * 60)
-
-        iLatSec = round(fLatMin * 60)
-        iLonSec = round(fLonMin * 60)
-
-        if (iLatSec == 60):
-            iLatMin += 1
-            iLatSec = 0
-
-        if (iLonSec == 60):
-            iLonMin += 1
-            iLonSec = 0
-        
-        if (iLatMin == 60):
-            iLat += 1
-            iLatMin = 0
-
-        if (iLonMin == 60):
-            iLon += 1
-            iLonMin = 0
+        self.position_limiter = APRSPositionLimiter(ttl=position_ttl, interval=position_interval)
 
-        aprsLat = iLat * 100 + iLatMin + (iLatSec / 60.0)
-        aprsLon = iLon * 100 + iLonMin + (iLonSec / 60.0)
 
-        return f"{aprsLat:07.2f}{latDir}", f"{aprsLon:08.2f}{lonDir}"  
+    def grid2aprs(self, grid_locator: str):
+        return gridToAprs(grid_locator)
 
 
     ############################################################################
@@ -116,18 +227,166 @@ class APRSReporter:
         if self.aprs_reporting_enabled:
             utc_now = datetime.now(timezone.utc)
             fmt_dt = utc_now.strftime("%Y/%m/%d-%H:%M:%S")
-            writeStringToFile(self.log_fn, f"{fmt_dt}: {str(frame)}\n", True)
-            # TODO - Need to review this library to see if we do an initial connect, does it "keep-alive" ? or a min retry ?
-            #     I saw a msg come through and it did not make it to the APRSIS server. Maybe UDP vs TCP ?
-            self.AIS.connect()
+
+            self.startSender()
+            try:
+                self.send_queue.put_nowait((fmt_dt, str(frame)))
+            except queue.Full:
+                self.logger.warning(f"APRS send queue full [{self.send_queue_size}], dropping frame: [{frame}]")
+
+    def startSender(self):
+        with self.sender_lock:
+            if self.sender is None:
+                self.sender = threading.Thread(target=self.senderLoop, name="aprsis-sender", daemon=True)
+                self.sender.start()
+
+    def senderLoop(self):
+        pending = []
+        stopping = False
+
+        while not (stopping and not pending):
+            if not pending:
+                try:
+                    item = self.send_queue.get(timeout=IDLE_CHECK_INTERVAL)
+                except queue.Empty:
+                    if self.stop_event.is_set():
+                        break
+                    self.checkConnection()
+                    continue
+
+                # Batch up whatever else is waiting
+                while item is not None:
+                    pending.append(item)
+                    if len(pending) >= SEND_BATCH_SIZE:
+                        break
+                    try:
+                        item = self.send_queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+                if item is None:
+                    stopping = True
+
+                self.logFrames(pending)
+
+            if not pending:
+                continue
+
+            # Pick up a connection the server has since dropped before writing to it
+            self.checkConnection()
+            if not self.connect():
+                if self.stop_event.is_set():
+                    # Closing, don't wait out the backoff. Whatever is still queued is logged so it isn't lost silently.
+                    unsent = len(pending) + self.logQueued()
+                    self.logger.warning(f"Unable to connect to APRS-IS while closing, [{unsent}] frames not sent.")
+                    break
+                self.stop_event.wait(self.backoff)
+                self.backoff = min(self.backoff * 2, RECONNECT_BACKOFF_MAX)
+                continue
+
             try:
-                self.AIS.sendall(frame)
-            finally:
-                self.AIS.close()
+                self.AIS.sendall("\r\n".join(frame for _, frame in pending))
+                self.logger.debug(f"Sent [{len(pending)}] frames to APRS-IS.")
+                pending = []
+            except (aprslib.ConnectionError, OSError) as e:
+                self.logger.warning(f"APRS-IS send failed, will reconnect and retry [{len(pending)}] frames. {e}")
+                self.disconnect()
+
+        self.disconnect()
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+    def logFrames(self, frames:list):
+        # Frames are logged as they are taken off the queue (not when sent) via a single buffered handle
+        if self.log_file is None:
+            self.log_file = open(self.log_fn, "a")
+
+        for fmt_dt, frame in frames:
+            self.log_file.write(f"{fmt_dt}: {frame}\n")
+        self.log_file.flush()
+
+    def logQueued(self) -> int:
+        # Takes everything left on the queue and logs it, returns the number of frames
+        frames = []
+        while True:
+            try:
+                item = self.send_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                frames.append(item)
+
+        if frames:
+            self.logFrames(frames)
+        return len(frames)
+
+    def connect(self) -> bool:
+        if self.connected:
+            return True
+
+        try:
+            self.AIS.connect()
+        except (aprslib.ConnectionError, aprslib.LoginError, OSError) as e:
+            self.logger.warning(f"Unable to connect to APRS-IS: [{self.aprs_host}:{self.aprs_port}] retrying in [{self.backoff}] secs. {e}")
+            self.AIS.close()
+            return False
+
+        self.logger.info(f"Connected to APRS-IS: [{self.aprs_host}:{self.aprs_port}]")
+        self.connected = True
+        self.backoff = RECONNECT_BACKOFF_MIN
+        return True
+
+    def disconnect(self):
+        if self.connected:
+            self.connected = False
+            self.AIS.close()
+
+    def checkConnection(self):
+        # Reads off (and discards) anything the server has sent (ie keep-alives) so its buffers never back up,
+        # closing the connection if the server has dropped it. It is then reopened when next needed.
+        if not self.connected:
+            return
+
+        try:
+            self.AIS.sock.setblocking(0)
+            while True:
+                data = self.AIS.sock.recv(4096)
+                if not data:
+                    self.logger.info("APRS-IS connection closed by server.")
+                    self.disconnect()
+                    break
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            self.logger.info(f"APRS-IS connection lost. {e}")
+            self.disconnect()
+
+    def close(self, timeout:float=10):
+        # Sends (or logs) any queued frames then closes the connection
+        with self.sender_lock:
+            sender = self.sender
+
+        if sender is None:
+            return
+
+        self.stop_event.set()
+        try:
+            self.send_queue.put(None, timeout=timeout)
+        except queue.Full:
+            # The sender stops by itself once the queue is empty
+            pass
+
+        sender.join(timeout)
+        if sender.is_alive():
+            self.logger.warning(f"APRS-IS sender still running after [{timeout}] secs, [{self.send_queue.qsize()}] frames queued.")
 
 
     def reportAprsPosition(self, callsign: str, grid_locator:str, comment: str):
 
+        if not self.position_limiter.allow(self.removeCallsignSuffix(callsign), grid_locator):
+            return
+
         lat,lon = self.grid2aprs(grid_locator)
 
         # Format APRS Position report
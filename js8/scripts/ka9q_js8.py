@@ -14,26 +14,45 @@
 
 
 import argparse
+import concurrent.futures
 from filelock import FileLock
+import heapq
+import itertools
 import json
 import logging
+import queue
+import math
+import mmap
 import psutil
 import os
 import re
+import shlex
 import signal
 import subprocess
 import sys
+import tempfile
 import threading
 import time
-import uuid
 
-from aprsis_reporter import APRSReporter, DEFAULT_APRS_PORT, DEFAULT_APRS_HOST
-from datetime import datetime, timezone
+from aprsis_reporter import APRSReporter, DEFAULT_APRS_PORT, DEFAULT_APRS_HOST, DEFAULT_POSITION_TTL, DEFAULT_POSITION_INTERVAL
+from pskreporter_sender import PSKReporterSender, DEFAULT_PSK_HOST, DEFAULT_PSK_PORT, DEFAULT_PSK_INTERVAL
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from ka9q_js8Parser import Js8Parser
+from ka9q_js8Parser import Js8Parser, Js8Decode, PARSER_VERSION
+from ka9q_js8Checkpoint import Js8Checkpoint, DEFAULT_CHECKPOINT_INTERVAL
+from ka9q_js8Gate import Js8EnergyGate, DEFAULT_GATE_MARGIN
+from ka9q_js8Depth import Js8DepthController, DEFAULT_MIN_DEPTH, DEFAULT_MAX_DEPTH
+from ka9q_js8DecodeStore import Js8DecodeStore, DECODE_STORE_JSONL, DECODE_STORE_SQLITE, DECODE_STORES, DECODE_STORE_FN
+from ka9q_js8History import Js8CallsignHistory, DEFAULT_HISTORY_MAX_ACTIVITIES, DEFAULT_HISTORY_MAX_INCOMPLETE
+from ka9q_js8Inotify import Inotify, IN_CLOSE_WRITE, IN_MOVED_TO, IN_Q_OVERFLOW
+from ka9q_js8Rtp import Js8RtpIngest, DEFAULT_RTP_PORT, DEFAULT_SAMPLE_RATE, RTP_ENCODINGS, parsePayloadTypes
+from ka9q_js8Segments import Js8SegmentedLog, DEFAULT_SEGMENT_BYTES, DEFAULT_SEGMENT_AGE
+from ka9q_js8Worker import Js8ServerWorker
 from ka9q_js8Utils import logError, isEmpty, findFile, truncateFile, \
-        archiveFile, writeStringsToFile, writeStringToFile, appendJson, loadJson, \
-        ARCHIVE_METHOD_MOVE, ARCHIVE_METHOD_TRUNCATE
+        archiveFile, writeStringsToFile, writeStringToFile, appendJson, loadJson, iterJson, jsonDefault, \
+        parseJTFilename, formatJTFilename, readWavInfo, writeWav, isWavComplete, \
+        appendJsonAtomic, manifestEntry, isManifestCurrent, loadManifest, writeManifest, logExists, archiveLogSegments, \
+        ARCHIVE_METHOD_MOVE, ARCHIVE_METHOD_TRUNCATE, ARCHIVE_METHOD_COMPRESS
 
 DEFAULT_DATA_DIR="./data"
 DEFAULT_MCAST_ADDR="js8-pcm.local"
@@ -42,10 +61,11 @@ DEFAULT_SPOT_LOG="/var/log/js8.log"
 PCMRECORD_BIN = "/usr/local/bin/pcmrecord"
 JS8_BIN="/usr/bin/js8"
 
-SM_TURBO = {'name': "turbo", 'code': "C", "duration": 6}
-SM_FAST  = {'name': "fast", 'code': "B", "duration": 10}
-SM_NORM  = {'name': "norm", 'code': "A", "duration": 15} 
-SM_SLOW  = {'name': "slow", 'code': "E", "duration": 30}
+# bandwidth - signal bandwidth (Hz), used by the energy gate
+SM_TURBO = {'name': "turbo", 'code': "C", "duration": 6, "bandwidth": 160}
+SM_FAST  = {'name': "fast", 'code': "B", "duration": 10, "bandwidth": 80}
+SM_NORM  = {'name': "norm", 'code': "A", "duration": 15, "bandwidth": 50} 
+SM_SLOW  = {'name': "slow", 'code': "E", "duration": 30, "bandwidth": 25}
 
 SUBMODES_BYNAME = [SM_TURBO["name"], SM_FAST["name"], SM_NORM["name"], SM_SLOW["name"]]
 
@@ -58,6 +78,25 @@ SUBMODES_LOOKUP = {
     "slow": SM_SLOW,
 }
 
+# Recording Modes:
+#   submode - a pcmrecord per frequency and submode, each recording wav's the length of the submode's slot.
+#   wide    - a single pcmrecord per frequency recording slot aligned wav's long enough to hold a whole
+#             number of slots for every submode (ie 30s = 5 x TURBO, 3 x FAST, 2 x NORM, 1 x SLOW). The 
+#             decoder then slices each submode's windows out of it.
+REC_MODE_SUBMODE = "submode"
+REC_MODE_WIDE = "wide"
+REC_MODES = [REC_MODE_SUBMODE, REC_MODE_WIDE]
+
+SM_WIDE = {'name': "wide", 'code': None, "duration": math.lcm(*[sm["duration"] for sm in SUBMODES])}
+
+# Audio Ingest:
+#   pcmrecord - decoders pick up the wav files written by the "record" process (pcmrecord).
+#   rtp       - decoders join the PCM multicast group themselves and cut each slot's audio in memory,
+#               no "record" process is required.
+INGEST_PCMRECORD = "pcmrecord"
+INGEST_RTP = "rtp"
+INGESTS = [INGEST_PCMRECORD, INGEST_RTP]
+
 FREQ_LIST=[1842, 3578, 7078, 10130, 14078, 18104, 21078, 24922, 28078, 27246]
 # SSRC autogen can/will eventually vary from actualy freq_khz (ie 17m clashes with FT8/FT4)
 FREQ_SSRC=[1842, 3578, 7078, 10130, 14078, 18104, 21078, 24922, 28078, 27246]
@@ -66,6 +105,66 @@ data_dir = DEFAULT_DATA_DIR
 
 DEFAULT_DECODE_DEPTH = 3
 
+# Frames are matched to the same activity if within +/- ACTIVITY_OFFSET_BW Hz and ACTIVITY_WINDOW_SECS of it.
+# I know the JS8 spec will print traffic +/-10Hz, but for now assume as +/- 3 as we are performing avergaing so should track
+ACTIVITY_OFFSET_BW = 3
+ACTIVITY_WINDOW_SECS = 60
+
+# Number of decode workers (0 = one per CPU core) and how often the rec folders are scanned for new recordings
+DEFAULT_DECODE_WORKERS = 0
+DEFAULT_SCAN_INTERVAL = 15
+DEFAULT_WATCH_RESCAN_INTERVAL = 60
+
+# Recordings are decoded earliest deadline first, a recording's deadline being its slot end plus the submode's duration.
+# The frequencies' decodes of each submode are staggered across this fraction of the slot (0 = all at the slot end).
+DEFAULT_DECODE_STAGGER = 0.5
+
+# What's done with recordings still queued "max slot age" slots past their deadline (the box has fallen behind):
+#   keep  - decode them anyway
+#   defer - move them to a catch-up lane, only decoded when no live recordings are waiting
+#   drop  - discard them
+BACKLOG_KEEP = "keep"
+BACKLOG_DEFER = "defer"
+BACKLOG_DROP = "drop"
+BACKLOG_POLICIES = [BACKLOG_KEEP, BACKLOG_DEFER, BACKLOG_DROP]
+DEFAULT_BACKLOG_POLICY = BACKLOG_DEFER
+DEFAULT_MAX_SLOT_AGE = 4
+# Max recordings queued per band (frequency), the band's oldest is discarded beyond this (0 = unbounded)
+DEFAULT_MAX_BAND_SPOOL = 100
+# Secs between logging / exporting the decode backlog stats
+BACKLOG_STATS_INTERVAL = 60
+
+# Scratch area (ideally tmpfs) shared by the long lived js8 decoder servers (see ka9q_js8Worker), one folder per worker
+DEFAULT_JS8_SCRATCH_DIR = "/dev/shm/ka9q-js8"
+
+# Frame aggregator shards (threads) the bands are spread over (0 = one per frequency)
+DEFAULT_AGGREGATOR_SHARDS = 0
+
+# When the spot writer fsyncs the spot log:
+#   none     - leave it to the OS
+#   batch    - after every batch written
+#   interval - at most every SPOT_FSYNC_INTERVAL secs
+SPOT_FSYNC_NONE = "none"
+SPOT_FSYNC_BATCH = "batch"
+SPOT_FSYNC_INTERVAL = "interval"
+SPOT_FSYNCS = [SPOT_FSYNC_NONE, SPOT_FSYNC_BATCH, SPOT_FSYNC_INTERVAL]
+SPOT_FSYNC_INTERVAL_SECS = 5
+
+# Max spots each rebuild-spots worker sorts in memory before writing them out as a sorted run
+DEFAULT_SPOT_RUN_SIZE = 100000
+
+# Decode files already parsed into 'all_parsed_decodes' (see rebuild-alldecodes), kept in each submode's data folder per decode store
+DECODE_MANIFEST_FN = "decode_manifest_{decode_store}.txt"
+# Decode files per rebuild-alldecodes worker task
+DEFAULT_REPARSE_BATCH = 32
+
+# How new recordings are discovered in the rec folders:
+#   watch - inotify events (falls back to "scan" if not available)
+#   scan  - periodically scan the folders
+DISCOVERY_WATCH = "watch"
+DISCOVERY_SCAN = "scan"
+DISCOVERIES = [DISCOVERY_WATCH, DISCOVERY_SCAN]
+
 APRSIS_CMD_REX = r"(?P<callsign>[\w\a/]+): @APRSIS ((GRID\s)?(?P<grid>[\w\d]+)$)?((CMD\s)?(?P<cmd_msg>:[@\-\.\d\w]+[ ]+:[@\-\.\d\w]+[ ]+.*$))?"
 
 # Configure basic logging to a file and the console
@@ -209,6 +308,159 @@ class Js8Recorder:
         return rec;
 
 
+#################################################################################
+# Js8ActivityIndex Class
+#################################################################################
+
+class Js8ActivityIndex:
+
+    # Index of a band's activity records keyed by (offset bucket, time bucket) so a frame can be matched 
+    # against only the few records near its offset and time, rather than scanning every record for the band.
+    #
+    # A record is indexed under the time buckets of both its first_ts and last_ts. With buckets at least as 
+    # wide as the matching tolerances, any matching record must be within +/-1 bucket of the frame.
+
+    buckets: dict
+    rec_keys: dict
+
+    def __init__(self, offset_bw:int=ACTIVITY_OFFSET_BW, window_secs:int=ACTIVITY_WINDOW_SECS):
+        self.offset_bw = offset_bw
+        self.window_secs = window_secs
+        self.offset_bucket = max(offset_bw, 1)
+        self.time_bucket = max(window_secs, 1)
+
+        self.buckets = {}
+        self.rec_keys = {}
+        self.seq = 0
+
+    def keysFor(self, act_rec:dict):
+        ob = act_rec["offset"] // self.offset_bucket
+        return {(ob, act_rec["first_ts"] // self.time_bucket), (ob, act_rec["last_ts"] // self.time_bucket)}
+
+    def add(self, act_rec:dict):
+        # The sequence preserves the original "first record in the band list wins" matching order
+        self.seq += 1
+        keys = self.keysFor(act_rec)
+        self.rec_keys[act_rec["id"]] = (self.seq, keys)
+
+        for key in keys:
+            self.buckets.setdefault(key, {})[act_rec["id"]] = (self.seq, act_rec)
+
+    def remove(self, act_rec:dict):
+        entry = self.rec_keys.pop(act_rec["id"], None)
+        if entry is None:
+            return
+
+        for key in entry[1]:
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.pop(act_rec["id"], None)
+                if not bucket:
+                    del self.buckets[key]
+
+    def update(self, act_rec:dict):
+        # Re-index a record after its offset / first_ts / last_ts have changed
+        entry = self.rec_keys.get(act_rec["id"])
+        if entry is None:
+            return self.add(act_rec)
+
+        seq, old_keys = entry
+        new_keys = self.keysFor(act_rec)
+        if new_keys == old_keys:
+            return
+
+        for key in old_keys - new_keys:
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.pop(act_rec["id"], None)
+                if not bucket:
+                    del self.buckets[key]
+
+        for key in new_keys - old_keys:
+            self.buckets.setdefault(key, {})[act_rec["id"]] = (seq, act_rec)
+
+        self.rec_keys[act_rec["id"]] = (seq, new_keys)
+
+    def match(self, offset:int, timestamp:int):
+        ob = offset // self.offset_bucket
+        tb = timestamp // self.time_bucket
+
+        best_seq = None
+        best = None
+        for dob in (-1, 0, 1):
+            for dtb in (-1, 0, 1):
+                bucket = self.buckets.get((ob + dob, tb + dtb))
+                if not bucket:
+                    continue
+
+                for seq, rec in bucket.values():
+                    if (best_seq is not None) and (seq >= best_seq):
+                        continue
+
+                    if (((rec["offset"] - self.offset_bw) <= offset <= (rec["offset"] + self.offset_bw)) and 
+                        ((abs(timestamp - rec["first_ts"]) <= self.window_secs) or (abs(timestamp - rec["last_ts"]) <= self.window_secs))):
+                        best_seq = seq
+                        best = rec
+
+        return best
+
+
+#################################################################################
+# Js8ActivityExpiry Class
+#################################################################################
+
+class Js8ActivityExpiry:
+
+    # Deadline ordered (heap) expiry of a band's activity. Once the band's clock passes last_ts + window_secs no 
+    # further frame can match the activity: if incomplete it has expired, if complete it is done (only the callsign 
+    # history needs it from then on).
+    #
+    # The clock is the frames' watermark, the oldest recording time frames may still arrive for (see 
+    # Js8DecodePool.lowWatermark()), so activity isn't expired while older (ie catch-up) recordings are still 
+    # to be decoded. Without one it's the frames' own timestamp.
+    #
+    # Entries are lazy: when an activity's last_ts moves on its old entry is left in the heap and re-pushed with 
+    # the new deadline when popped.
+
+    heap: list
+
+    def __init__(self, window_secs:int=ACTIVITY_WINDOW_SECS):
+        self.window_secs = window_secs
+        self.heap = []
+        self.seq = 0
+        self.clock = None
+
+    def push(self, act_rec:dict):
+        self.seq += 1
+        heapq.heappush(self.heap, (act_rec["last_ts"] + self.window_secs, self.seq, act_rec))
+
+    def advance(self, timestamp:int):
+        # Move the clock forward (never back) and return the (expired, done) activities now outside the window, 
+        # the expired ones marked as such.
+        if (self.clock is None) or (timestamp > self.clock):
+            self.clock = timestamp
+
+        expired = []
+        done = []
+        while self.heap and (self.heap[0][0] < self.clock):
+            deadline, seq, act_rec = heapq.heappop(self.heap)
+
+            if act_rec["is_expired"]:
+                continue
+
+            if (act_rec["last_ts"] + self.window_secs) != deadline:
+                self.push(act_rec)
+                continue
+
+            if act_rec["is_complete"]:
+                done.append(act_rec)
+            else:
+                act_rec["is_expired"] = True
+                expired.append(act_rec)
+
+        return expired, done
+
+
 #################################################################################
 # Js8FrameProcessor Class
 #################################################################################
@@ -217,28 +469,120 @@ class Js8FrameProcessor:
 
     aprsReporter: APRSReporter
 
-    callsigns = {}
-    msgByFreq = {}
-    msgByFreq_incomplete = {}
+    # (unbounded, memory only) callsign history unless one is passed in
+    history: Js8CallsignHistory
+
+    # Per band: activity keyed by id (see exportMsgByFreq() for the list form). Completed activity is dropped once
+    # outside the matching window (it's kept by the callsign history) unless keep_completed, ie for rebuild-history.
+    msgByFreq: dict
+    msgByFreq_incomplete: dict
+    keep_completed: bool
 
-    def __init__(self, aprsReporter:APRSReporter):
+    # Per band: activity index used for matching frames, and expiry of the activities within the matching window.
+    actIndexByFreq: dict
+    actExpiryByFreq: dict
+
+    def __init__(self, aprsReporter:APRSReporter, history:Js8CallsignHistory=None, keep_completed:bool=False):
         self.aprsReporter = aprsReporter
+        self.history = history if history is not None else Js8CallsignHistory()
+        self.keep_completed = keep_completed
         self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
 
-    def archiveExpired(self):
-        # Move "expired" activity over to msgByFreq_incomplete to keep our callsign history clean
-        for dial_freq in self.msgByFreq.keys():
+        # State is per processor, the live decoder runs one per Js8FrameAggregator shard (ie a set of bands)
+        self.msgByFreq = {}
+        self.msgByFreq_incomplete = {}
+        self.actIndexByFreq = {}
+        self.actExpiryByFreq = {}
 
-            msgs = self.msgByFreq[dial_freq]
-            msgs_copy = self.msgByFreq[dial_freq][:]
+    @property
+    def callsigns(self) -> dict:
+        return self.history.callsigns
 
-            incomp_msgs = self.msgByFreq_incomplete[dial_freq]
+    def retireExpired(self, dial_freq:int, timestamp:int=None):
+        # Advance the band's clock and move any "expired" activity over to msgByFreq_incomplete to keep our callsign history clean.
+        # Completed activity no longer matchable is dropped from the band (unless keep_completed).
+        act_expiry = self.actExpiryByFreq[dial_freq]
+        if timestamp is None:
+            timestamp = act_expiry.clock
 
-            # Iterate throug ah copy of the msgs, move the activity over to msgByFreq_incomplete
-            for act_rec in msgs_copy:
-                if act_rec["is_expired"]:
-                     incomp_msgs.append(act_rec)
-                     msgs.remove(act_rec)
+        if timestamp is None:
+            return
+
+        expired, done = act_expiry.advance(timestamp)
+        if self.keep_completed:
+            done = []
+
+        if (not expired) and (not done):
+            return
+
+        msgs = self.msgByFreq[dial_freq]
+        act_index = self.actIndexByFreq[dial_freq]
+        for act_rec in expired + done:
+            del msgs[act_rec["id"]]
+            act_index.remove(act_rec)
+
+        if expired:
+            self.msgByFreq_incomplete[dial_freq].extend(expired)
+            self.history.trimIncomplete(dial_freq, self.msgByFreq_incomplete[dial_freq])
+            self.logger.debug(f"Freq: [{dial_freq}] retired [{len(expired)}] expired incomplete activities.")
+
+    def archiveExpired(self):
+        for dial_freq in self.msgByFreq.keys():
+            self.retireExpired(dial_freq)
+
+    def exportMsgByFreq(self) -> dict:
+        return {dial_freq: list(msgs.values()) for dial_freq, msgs in self.msgByFreq.items()}
+
+    def toSnapshot(self) -> dict:
+        # Compact checkpoint of the state: the bands' live activity (still within the matching window), their expired 
+        # incomplete activity not yet paged out and the in memory callsign history. Activity records are shared between 
+        # msgByFreq and the callsign history so each is stored once (by id) and referenced.
+        activities = {}
+        def ref(act_rec):
+            activities[act_rec["id"]] = act_rec
+            return act_rec["id"]
+
+        state = {"msgByFreq": {}, "msgByFreq_incomplete": {}, "clock": {}}
+        self.snapshotBands(state, ref)
+        state["history"] = self.history.toSnapshot(ref)
+        state["activities"] = activities
+
+        return state
+
+    def snapshotBands(self, state:dict, ref):
+        # Adds this processor's bands to the snapshot state, ref(act_rec) adds the activity and returns its id
+        for dial_freq, msgs in self.msgByFreq.items():
+            state["msgByFreq"][dial_freq] = [ref(act_rec) for act_rec in msgs.values()]
+            state["msgByFreq_incomplete"][dial_freq] = [ref(act_rec) for act_rec in self.msgByFreq_incomplete[dial_freq]]
+            state["clock"][dial_freq] = self.actExpiryByFreq[dial_freq].clock
+
+    def loadSnapshot(self, state:dict):
+        activities = loadSnapshotActivities(state)
+
+        for dial_key in state["msgByFreq"].keys():
+            self.loadBand(state, dial_key, activities)
+
+        self.history.loadSnapshot(state["history"], activities)
+
+    def loadBand(self, state:dict, dial_key:str, activities:dict):
+        dial_freq = int(dial_key)
+        act_index = Js8ActivityIndex()
+        act_expiry = Js8ActivityExpiry()
+        band_act_recs = {}
+
+        for act_id in state["msgByFreq"][dial_key]:
+            act_rec = activities[act_id]
+            band_act_recs[act_id] = act_rec
+            act_index.add(act_rec)
+            if not act_rec["is_expired"]:
+                act_expiry.push(act_rec)
+
+        act_expiry.clock = state["clock"].get(dial_key)
+
+        self.msgByFreq[dial_freq] = band_act_recs
+        self.msgByFreq_incomplete[dial_freq] = [activities[act_id] for act_id in state["msgByFreq_incomplete"].get(dial_key, [])]
+        self.actIndexByFreq[dial_freq] = act_index
+        self.actExpiryByFreq[dial_freq] = act_expiry
 
     def cleanup(self):
         self.archiveExpired()
@@ -305,73 +649,31 @@ class Js8FrameProcessor:
         else:
             self.logger.error(f"Invalid @APRIS message: [{msg}] - skipped.")
 
-    def getOrCreateDict(self, dd:dict, key:str) -> dict:
-        if (key in dd):
-            return dd[key]
-        else:
-            new_rec = {}
-            dd[key] = new_rec
-            return new_rec
-        
-    def getOrCreateList(self, dd:dict, key:str) -> list:
-        if (key in dd):
-            return dd[key]
-        else:
-            new_list = []
-            dd[key] = new_list
-            return new_list    
-        
-
-    def addActivityByDateTimeFreq(self, cs_rec, act_rec):
-        # <Callsig>::<YYYY-MM-DD>::<HH>::<DIAL_FREQ>
-        act_dt = datetime.fromtimestamp(act_rec["timestamp"], tz=timezone.utc)
-        dt_YMD = act_dt.strftime("%Y-%m-%d")
-        dt_H = act_dt.strftime("%H")
-        dial_freq = act_rec["dial_freq"]
-
-        dtYMD_recs = self.getOrCreateDict(cs_rec["activity_YMD"], dt_YMD)
-        dtH_recs = self.getOrCreateDict(dtYMD_recs, dt_H)
-        band_recs = self.getOrCreateList(dtH_recs, dial_freq)
-
-        band_recs.append(act_rec)
-        
-
-    def processFrame(self, dec: dict):
+    def processFrame(self, dec: dict, watermark:int=None):
+        # watermark is the oldest recording time frames for the band may still arrive for, see Js8ActivityExpiry
         dial_freq = dec["dial_freq"]
         offset = dec["offset"]
 
         if dec["is_valid"]:
             
             if (dial_freq not in self.msgByFreq):
-                band_act_recs = []
+                band_act_recs = {}
                 self.msgByFreq[dial_freq] = band_act_recs
                 self.msgByFreq_incomplete[dial_freq] = []
+                self.actIndexByFreq[dial_freq] = Js8ActivityIndex()
+                self.actExpiryByFreq[dial_freq] = Js8ActivityExpiry()
             else:
                 band_act_recs = self.msgByFreq[dial_freq]
 
-            #scan for activity +/-10hz
-            act_rec = None
-            for rec in band_act_recs:
-                
-                # I know the JS8 spec will print traffic +/-10Hz, but for now assume as +/- 3 as we are performing avergaing so should track
-                # BW=10
-                BW=3
-                # TODO: Do I need to filter / be "mode" specific aswell ??
-                if (((rec["offset"] - BW) <= offset <= (rec["offset"] + BW)) and 
-                    ((abs(dec["timestamp"] - rec["first_ts"]) <= 60) or (abs(dec["timestamp"] - rec["last_ts"]) <= 60))):
-                    act_rec = rec
-
-                    # TODO: any more smarts to consider here ?
-                    break
+            # Retire activity that can no longer see a frame within ACTIVITY_WINDOW_SECS (of this one or the watermark)
+            self.retireExpired(dial_freq, dec["timestamp"] if watermark is None else min(dec["timestamp"], watermark))
 
-                else:
-                    # lets see if incomplete activity which has not seen a "start" (seen_first) frame has expired. If it has mark it expired and will be purged later
-                    if (((not rec["seen_first"]) or (not rec["seen_last"])) and 
-                        (not rec["is_complete"]) and 
-                        (not rec["is_expired"]) and 
-                        (abs(rec["last_ts"] - dec["timestamp"]) > 60)):
-                        rec["is_expired"] = True
+            act_index = self.actIndexByFreq[dial_freq]
+            act_expiry = self.actExpiryByFreq[dial_freq]
 
+            # Look up activity within +/- ACTIVITY_OFFSET_BW Hz and ACTIVITY_WINDOW_SECS
+            # TODO: Do I need to filter / be "mode" specific aswell ??
+            act_rec = act_index.match(offset, dec["timestamp"])
 
             if act_rec is None:
                 # TODO: Review if seend (first/last) needed here yet.
@@ -379,10 +681,12 @@ class Js8FrameProcessor:
                 act_rec = {"offset": offset, "first_ts": dec["timestamp"], "last_ts": dec["timestamp"],
                            "seen_first": False, "seen_last": False, "offset_total": offset, 
                            "is_complete": False, "is_expired": False, 
-                           "id": str(uuid.uuid4()), "msgs": [dec],
+                           "id": activityId(dec), "msgs": [dec],
                            # These will be populated upon "completeness"
                            "timestamp": None,"callsign": None, "locator": None, "freq": None, "full_msg": None, "snr": None}
-                band_act_recs.append(act_rec)                            
+                band_act_recs[act_rec["id"]] = act_rec
+                act_index.add(act_rec)
+                act_expiry.push(act_rec)
                 
             else:
 
@@ -395,6 +699,7 @@ class Js8FrameProcessor:
 
                 act_rec["offset_total"] += dec["offset"]
                 act_rec["offset"] = int(act_rec["offset_total"] / len(act_rec["msgs"]))
+                act_index.update(act_rec)
 
             # Check if we have just encounter first / last / only expected frame
             frame_class = dec["frame_class"]
@@ -448,8 +753,7 @@ class Js8FrameProcessor:
                 else:
                     # TODO: Review and confirm 
                     dec["is_valid"] = False
-                    ve = dec["validation_errors"]
-                    ve["unexepected_frame"] = True
+                    dec.addValidationError("unexepected_frame")
 
                 #
                 # If now complete do the following
@@ -492,18 +796,7 @@ class Js8FrameProcessor:
                     act_rec["freq"] = dial_freq + act_rec["offset"]
 
                     # Add / link to callsign_db
-                    if callsign in self.callsigns:
-                        cs_rec = self.callsigns[callsign]
-                        if (act_rec["timestamp"] > cs_rec["last_ts"]):
-                            cs_rec["last_ts"] = act_rec["timestamp"]
-
-                    else:
-                        #cs_rec = {"last_freq": (dial_freq+act_rec["offset"]), "last_ts": timestamp, "activity": []}
-                        cs_rec = {"last_freq": dial_freq, "first_ts": timestamp, "last_ts": timestamp, "activity": [], "activity_YMD": {}}
-                        self.callsigns[callsign] = cs_rec
-
-                    cs_rec["activity"].append(act_rec)
-                    self.addActivityByDateTimeFreq(cs_rec, act_rec)
+                    self.history.addActivity(callsign, act_rec)
                     
 
                     # Process JS8 "@" Commands
@@ -524,120 +817,994 @@ class Js8FrameProcessor:
 
 
 #################################################################################
-# Js8Decoder Class
+# Js8FrameAggregator Class
 #################################################################################
 
-class Js8Decoder:
-    mode_conf: ModeConfig = None
-    js8Parser: Js8Parser = None
-    js8FrameProc: Js8FrameProcessor = None
+class Js8FrameAggregator:
 
-    def __init__(self, mode_conf: ModeConfig, aprsReporter:APRSReporter):
+    # Single writer for frame processing. Decoders submit their frames without blocking, each band (dial_freq) is 
+    # owned by one shard, a thread with its own queue and Js8FrameProcessor, so no band's state is touched by more 
+    # than one thread. The callsign history is shared between the shards (it has its own lock).
+
+    shards: list
+
+    def __init__(self, aprsReporter:APRSReporter, history:Js8CallsignHistory, freq_list:list=FREQ_LIST, shards:int=DEFAULT_AGGREGATOR_SHARDS, 
+                 checkpoint:Js8Checkpoint=None):
         self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
-        self.mode_conf = mode_conf
-        self.js8Parser = Js8Parser(self.mode_conf.freq_khz, "usb")
-        self.js8FrameProc = Js8FrameProcessor(aprsReporter)
+        self.history = history
+        self.checkpoint = checkpoint
+
+        if shards <= 0:
+            shards = len(freq_list)
+
+        self.shards = []
+        for index in range(shards):
+            self.shards.append({"index": index, "queue": queue.Queue(), "proc": Js8FrameProcessor(aprsReporter, history)})
+
+        # Bands are spread over the shards in frequency list order, any others by their dial frequency
+        self.shard_by_freq = {}
+        for i, freq in enumerate(freq_list):
+            self.shard_by_freq[freq * 1000] = self.shards[i % shards]
+
+    def shardFor(self, dial_freq:int):
+        shard = self.shard_by_freq.get(dial_freq)
+        if shard is None:
+            shard = self.shards[(dial_freq // 1000) % len(self.shards)]
+
+        return shard
+
+    def submit(self, frame, watermark:int=None):
+        # Called by the decoders, never blocks
+        self.shardFor(frame["dial_freq"])["queue"].put((frame, watermark))
+
+    def replayFrame(self, frame, watermark:int=None):
+        # Processes the frame on the calling thread, used to replay frames (checkpoint WAL) before the shards are 
+        # started. APRSIS was already reported when the frame was first processed so is not reported again.
+        proc = self.shardFor(frame["dial_freq"])["proc"]
+        aprsReporter = proc.aprsReporter
+        proc.aprsReporter = None
+        try:
+            proc.processFrame(frame, watermark)
+        finally:
+            proc.aprsReporter = aprsReporter
 
-    def decoding_process(self):
+    def worker(self, shard:dict):
+        proc = shard["proc"]
+        frames = shard["queue"]
 
-        now_utc = datetime.now(timezone.utc)
+        while True:
+            frame, watermark = frames.get()
+            try:
+                if self.checkpoint is not None:
+                    self.checkpoint.processFrame(shard["index"], proc.processFrame, frame, watermark)
+                else:
+                    proc.processFrame(frame, watermark)
+            except Exception as e:
+                self.logger.error(f"Error while processing frame for Freq: [{frame['dial_freq']}]. {e}")
+            finally:
+                frames.task_done()
 
-        freq_khz = self.mode_conf.freq_khz
-        mode = self.mode_conf.submode['name']
+    def start(self):
+        for shard in self.shards:
+            ag_thread = threading.Thread(target=self.worker, args=(shard,), daemon=True)
+            ag_thread.start()
 
-        self.logger.info(f"Starting js8Decoder process for Freq: [{freq_khz}] kHz Mode: [{mode}] Folder: [{self.mode_conf.mode_rec_dir}]." )
+        self.logger.info(f"Frame aggregator started with [{len(self.shards)}] shards.")
 
-        files = findFile(self.mode_conf.mode_rec_dir, r"\.wav$", 2)
+    def drain(self, timeout:float=10):
+        # Wait (up to timeout secs) for the frames already submitted to be processed
+        deadline = time.time() + timeout
+        for shard in self.shards:
+            frames = shard["queue"]
+            while (frames.unfinished_tasks > 0) and (time.time() < deadline):
+                time.sleep(0.05)
 
-        base_cmd = [JS8_BIN, 
-                "-f", str(self.mode_conf.freq_hz),
-                "--js8",
-                "-b", self.mode_conf.submode["code"], 
-                "-d", str(DEFAULT_DECODE_DEPTH), 
-                "-a", self.mode_conf.mode_rec_dir, 
-                "-t", self.mode_conf.mode_tmp_dir, 
-            ]
+    def pending(self) -> int:
+        return sum(shard["queue"].qsize() for shard in self.shards)
 
-        self.logger.info(f"Processing [{len(files)}] recordings for Freq: [{freq_khz}] kHz  Submode: [{mode}]....")
-        for wav_fn in files:
-            src_fn = f"{self.mode_conf.mode_rec_dir}/{wav_fn}"
-            decode_fn = f"{wav_fn}.decode"
-            decode_ffp = f"{self.mode_conf.mode_dec_dir}/{decode_fn}"
-            decode_err_ffp = f"{self.mode_conf.mode_dec_dir}/error/{decode_fn}.error"
+    def toSnapshot(self) -> dict:
+        activities = {}
+        def ref(act_rec):
+            activities[act_rec["id"]] = act_rec
+            return act_rec["id"]
 
-            self.logger.debug(f"JS8 decoding process started for file: [{src_fn}].")
+        state = {"msgByFreq": {}, "msgByFreq_incomplete": {}, "clock": {}}
+        for shard in self.shards:
+            shard["proc"].snapshotBands(state, ref)
 
-            cmd = base_cmd + [src_fn]
+        state["history"] = self.history.toSnapshot(ref)
+        state["activities"] = activities
 
-            ret_code = None
-            with open(decode_ffp, "w") as decode_log, \
-                open(decode_err_ffp, "w") as decode_err_log:
+        return state
 
-                # Start the process in a new session, detaching it from the current terminal
-                process = subprocess.Popen(cmd,
-                                        stdout=decode_log, 
-                                        stderr=decode_err_log)
+    def loadSnapshot(self, state:dict):
+        activities = loadSnapshotActivities(state)
 
-                ret_code = process.wait()
+        for dial_key in state["msgByFreq"].keys():
+            self.shardFor(int(dial_key))["proc"].loadBand(state, dial_key, activities)
 
-            if (ret_code and (ret_code != 0)):
-                self.logger.error(f"Failed to decode wav file: {src_fn}  ReturnCode: [{ret_code}].") 
-                os.rename(decode_ffp, f"{self.mode_conf.mode_dec_error_dir}/{decode_fn}")
-            else: 
-                tmp_decode_ffp = f"{self.mode_conf.mode_dec_proc_dir}/{decode_fn}"
-                os.rename(decode_ffp, tmp_decode_ffp)
-                os.remove(decode_err_ffp)
+        self.history.loadSnapshot(state["history"], activities)
 
-                # Decode using Js8Parser 
-                parsedMsgs = self.js8Parser.processJs8DecodeFile(tmp_decode_ffp, None)
 
-                if (parsedMsgs and (len(parsedMsgs) > 0)):
-                    self.logger.debug(f"Decode file: [{tmp_decode_ffp}] contained [{len(parsedMsgs)}] messages.")
-                    os.rename(tmp_decode_ffp, f"{self.mode_conf.mode_dec_proc_dir}/{decode_fn}")
+def activityId(dec) -> str:
+    # Activity id from its first frame, so the activity gets the same id when rebuilt by a checkpoint WAL replay (and
+    # is replaced rather than added again if it was already paged out to the callsign history)
+    return f"{dec['dial_freq']}-{dec['js8mode']}-{dec['timestamp']}-{dec['offset']}-{dec['callsign'] or ''}"
+
+def loadSnapshotActivities(state:dict) -> dict:
+    activities = {}
+    for act_id, act_rec in state["activities"].items():
+        act_rec["msgs"] = [Js8Decode.fromDict(msg) for msg in act_rec["msgs"]]
+        activities[act_id] = act_rec
+
+    return activities
+
+
+def slotSchedule(slot_start:float, duration:int, stagger_offset:float=0):
+    # Decode pool (release, deadline, duration) of a slot's recording, released stagger_offset secs after the slot ends
+    slot_end = slot_start + duration
+    return slot_end + stagger_offset, slot_end + duration, duration
+
+def recordingTime(src_fn:str):
+    # Start time (secs since epoch) of a recording from its JT filename, None if not JT named
+    jt = parseJTFilename(src_fn)
+    return int(jt["record_time"].timestamp()) if jt is not None else None
+
+def shedRecording(src_fn:str):
+    # Recording discarded by the decode pool (backlog), removed so it's not picked up again
+    if os.path.exists(src_fn):
+        os.remove(src_fn)
+
+
+#################################################################################
+# Js8SpotWriter Class
+#################################################################################
+
+class Js8SpotWriter:
+
+    # Single writer for the spot log. Decoders queue their spots without blocking, the writer thread then writes 
+    # whatever has queued up (from all bands) as one batch through a single open handle. The cross process 
+    # "spot.lock" is only taken if another process also writes the spot log (lock_fn given). If rotated, once the
+    # spot log reaches the segment size / age it's copied to seg_dir (then compressed) and truncated.
+
+    spot_log_fn: str
+    fsync: str
+
+    def __init__(self, spot_log_fn:str, fsync:str=SPOT_FSYNC_NONE, lock_fn:str=None, seg_dir:str=None,
+                 segment_bytes:int=DEFAULT_SEGMENT_BYTES, segment_age:int=DEFAULT_SEGMENT_AGE):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.spot_log_fn = spot_log_fn
+        self.fsync = fsync
+        self.lock = FileLock(lock_fn) if lock_fn is not None else None
+
+        self.spots = queue.Queue()
+        self.spot_log = Js8SegmentedLog(spot_log_fn, segment_bytes, segment_age, seg_dir)
+        self.last_fsync = 0
+        self.writer_thread = None
+
+    def write(self, spots:list):
+        # Called by the decoders with a recording's spot lines, never blocks
+        self.spots.put(spots)
+
+    def writeBatch(self, batch:list):
+        now = time.time()
+        fsync = (self.fsync == SPOT_FSYNC_BATCH) or ((self.fsync == SPOT_FSYNC_INTERVAL) and (now - self.last_fsync >= SPOT_FSYNC_INTERVAL_SECS))
+
+        self.spot_log.write([spot for spots in batch for spot in spots], fsync)
+        if fsync:
+            self.last_fsync = now
+
+    def worker(self):
+        stopping = False
+
+        while not stopping:
+            batch = [self.spots.get()]
+            while True:
+                try:
+                    batch.append(self.spots.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in batch:
+                stopping = True
+                batch = [spots for spots in batch if spots is not None]
+
+            try:
+                if self.lock is not None:
+                    with self.lock:
+                        self.writeBatch(batch)
                 else:
-                    # Contrain no decoded message remove it
-                    os.remove(tmp_decode_ffp)
+                    self.writeBatch(batch)
+            except Exception as e:
+                self.logger.error(f"Failed to write [{sum(len(spots) for spots in batch)}] spots to: [{self.spot_log_fn}]. {e}")
+                self.spot_log.close()
 
-                appendJson(parsedMsgs, f"{self.mode_conf.mode_data_dir}/all_parsed_decodes.txt")
+        self.spot_log.close()
+
+    def start(self):
+        self.writer_thread = threading.Thread(target=self.worker, args=(), daemon=True)
+        self.writer_thread.start()
+        self.logger.info(f"Spot writer started for: [{self.spot_log_fn}] FSync: [{self.fsync}] Shared: [{self.lock is not None}]")
+
+    def close(self, timeout:float=10):
+        # Writes any queued spots then closes the spot log
+        if self.writer_thread is None:
+            return
 
-                # Handle Spots
-                spots = []
-                for msg in parsedMsgs:
+        self.spots.put(None)
+        self.writer_thread.join(timeout)
 
-                    self.js8FrameProc.processFrame(msg)
 
-                    spot = generateSpot(msg)
-                    if (spot is not None):
-                        spots.append(f"{spot}\n")
+#################################################################################
+# Js8Decoder Class
+#################################################################################
 
-                # Since there are many up to 40 odd freq/mode threads we need to ensure before update spots that we get lock first.
-                if (len(spots) > 0):
+class Js8Decoder:
+    mode_conf: ModeConfig = None
+    js8FrameProc: Js8FrameProcessor = None
+    pool = None
+
+    # Decoders without a frame aggregator (stand alone use) share the one frame processor, as its activity state 
+    # is for all bands and modes. Recordings may be decoded concurrently so it's only used with the lock held.
+    shared_frame_proc: Js8FrameProcessor = None
+    shared_frame_lock = threading.Lock()
+    archive_decodes: bool = True
+    stagger_offset: float = 0
+
+    def __init__(self, mode_conf: ModeConfig, aprsReporter:APRSReporter, pool=None, archive_decodes:bool=True, history:Js8CallsignHistory=None,
+                 decode_store:Js8DecodeStore=None, aggregator:Js8FrameAggregator=None, pskReporter:PSKReporterSender=None, spotWriter:Js8SpotWriter=None,
+                 decode_log:Js8SegmentedLog=None, stagger_offset:float=0, depth_ctrl:Js8DepthController=None, energy_gate:Js8EnergyGate=None):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.mode_conf = mode_conf
+        self.pool = pool
+        self.archive_decodes = archive_decodes
+        self.decode_store = decode_store
+        self.aggregator = aggregator
+        self.pskReporter = pskReporter
+        self.spotWriter = spotWriter
+        self.decode_log = decode_log
+        self.stagger_offset = stagger_offset
+        self.depth_ctrl = depth_ctrl
+        self.energy_gate = energy_gate
+
+        if aggregator is None:
+            with Js8Decoder.shared_frame_lock:
+                if Js8Decoder.shared_frame_proc is None:
+                    Js8Decoder.shared_frame_proc = Js8FrameProcessor(aprsReporter, history)
+                self.js8FrameProc = Js8Decoder.shared_frame_proc
+
+    def decodeRecording(self, src_fn:str):
+
+        wav_fn = os.path.basename(src_fn)
+        decode_fn = f"{wav_fn}.decode"
+        decode_ffp = f"{self.mode_conf.mode_dec_proc_dir}/{decode_fn}"
+
+        self.logger.debug(f"JS8 decoding process started for file: [{src_fn}].")
+
+        # Slots with nothing above the noise floor are not worth running js8 on
+        if (self.energy_gate is not None) and (not self.energy_gate.isOccupied(src_fn, self.mode_conf.submode["bandwidth"])):
+            self.logger.debug(f"-- No signal in: [{src_fn}], skipped decoding.")
+            if self.pool is not None:
+                self.pool.recordStat(self.mode_conf.freq_khz, "gated")
+            os.remove(src_fn)
+            return 0
+
+        # Decode depth is per band when adaptive, see Js8DepthController
+        depth = self.depth_ctrl.depthFor(self.mode_conf.freq_khz) if (self.depth_ctrl is not None) else DEFAULT_DECODE_DEPTH
+        decode_started = time.time()
+
+        args = ["-f", str(self.mode_conf.freq_hz),
+                "--js8",
+                "-b", self.mode_conf.submode["code"], 
+                "-d", str(depth)
+            ]
+
+        # js8's output is read straight from its stdout pipe and each line parsed as soon as it is emitted, 
+        # the raw output is only written to disk if archiving decodes (or on failure).
+        raw_lines = []
+        def rawLines(stream):
+            for line in stream:
+                raw_lines.append(line)
+                yield line
+
+        # Decode using Js8Parser (one per recording as recordings may be decoded concurrently by the pool)
+        js8Parser = Js8Parser(self.mode_conf.freq_khz, "usb")
+        parsedMsgs = []
+        spots = []
+        spot_recs = []
+
+        # Activity is only expired up to the oldest recording the pool still has for the band (this one included)
+        watermark = self.pool.lowWatermark(self.mode_conf.freq_khz) if (self.pool is not None) else None
+
+        # Decoded by this pool worker's long lived js8 server if there is one, otherwise a js8 is run for the recording
+        server = self.pool.serverWorker() if (self.pool is not None) else None
+        if server is not None:
+            stream = server.decode(args + [src_fn])
+        else:
+            cmd = [JS8_BIN] + args + ["-a", self.mode_conf.mode_rec_dir, "-t", self.mode_conf.mode_tmp_dir, src_fn]
+            # stderr goes to a (deleted on close) file rather than a pipe, as nothing reads it until stdout is done 
+            # and js8 would block if it filled a pipe.
+            err_file = tempfile.TemporaryFile(mode="w+", dir=self.mode_conf.mode_tmp_dir)
+            try:
+                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err_file, text=True)
+            except OSError:
+                err_file.close()
+                raise
+            stream = process.stdout
+
+        try:
+            for msg in js8Parser.processJs8DecodeStream(rawLines(stream), src_fn):
+                msg["decode_file"] = decode_ffp if self.archive_decodes else None
+                parsedMsgs.append(msg)
+
+                # The aggregator gets its own copy as it processes the frame on another thread
+                if self.aggregator is not None:
+                    self.aggregator.submit(msg.copy(), watermark)
+                else:
+                    with Js8Decoder.shared_frame_lock:
+                        self.js8FrameProc.processFrame(msg, watermark)
+
+                spot = generateSpot(msg)
+                if (spot is not None):
+                    spots.append(f"{spot}\n")
+                    spot_recs.append(spotRecord(msg))
+        finally:
+            if server is not None:
+                # Drain the rest of the reply, so the server is ready for the next recording
+                for _ in stream:
+                    pass
+                ret_code, err_out = server.result()
+            else:
+                process.communicate()
+                ret_code = process.returncode
+                err_file.seek(0)
+                err_out = err_file.read()
+                err_file.close()
+
+        if (ret_code and (ret_code != 0)):
+            self.logger.error(f"Failed to decode wav file: {src_fn}  ReturnCode: [{ret_code}].") 
+            writeStringsToFile(f"{self.mode_conf.mode_dec_error_dir}/{decode_fn}", raw_lines, False)
+            writeStringToFile(f"{self.mode_conf.mode_dec_error_dir}/{decode_fn}.error", err_out, False)
+        else: 
+            if self.depth_ctrl is not None:
+                self.depth_ctrl.record(self.mode_conf.freq_khz, depth, len(parsedMsgs), time.time() - decode_started, self.mode_conf.submode["duration"])
+
+            # Only keep the raw decode if it contains decoded messages
+            if (len(parsedMsgs) > 0):
+                self.logger.debug(f"Decode for: [{src_fn}] contained [{len(parsedMsgs)}] messages.")
+                if self.archive_decodes:
+                    writeStringsToFile(decode_ffp, raw_lines, False)
+
+            if self.decode_store is not None:
+                self.decode_store.addDecodes(parsedMsgs, self.mode_conf.submode["name"])
+            elif self.decode_log is not None:
+                if (len(parsedMsgs) > 0):
+                    self.decode_log.writeJson(parsedMsgs)
+            else:
+                appendJson(parsedMsgs, f"{self.mode_conf.mode_data_dir}/all_parsed_decodes.txt")
+
+            # Record the archived decode file as parsed, so rebuild-alldecodes doesn't reparse it. Only once a rebuild 
+            # has created the manifest, as it then covers all the earlier decode files.
+            decode_store = DECODE_STORE_SQLITE if (self.decode_store is not None) else DECODE_STORE_JSONL
+            manifest_fn = f"{self.mode_conf.mode_data_dir}/{DECODE_MANIFEST_FN.format(decode_store=decode_store)}"
+            if (len(parsedMsgs) > 0) and self.archive_decodes and os.path.exists(manifest_fn):
+                appendJsonAtomic([manifestEntry(decode_ffp, PARSER_VERSION)], manifest_fn)
+
+            # Spots from all the decoders go through the one spot writer. Without one (stand alone use) we need to 
+            # ensure before update spots that we get lock first.
+            if (len(spots) > 0):
+                if self.spotWriter is not None:
+                    self.spotWriter.write(spots)
+                else:
                     lock = FileLock(f"{self.mode_conf.data_dir}/spot.lock")
                     with lock:
                         writeStringsToFile(self.mode_conf.spot_log_fn, spots, True)
 
+            if (self.pskReporter is not None) and (len(spot_recs) > 0):
+                self.pskReporter.addSpots(spot_recs)
 
-            # Default to removing wav if successfully decoded and parsed. 
-            # TODO: Need to possibly add option to "arvhice" / move wav file to processed / done folder
-            #   os.rename(src_fn, f"{self.mode_conf.mode_rec_proc_dir}/{wav_fn}")
-            os.remove(src_fn)
 
-            self.logger.debug(f"-- JS8 decoding process completed for file: [{src_fn}].")
+        # Default to removing wav if successfully decoded and parsed. 
+        # TODO: Need to possibly add option to "arvhice" / move wav file to processed / done folder
+        #   os.rename(src_fn, f"{self.mode_conf.mode_rec_proc_dir}/{wav_fn}")
+        os.remove(src_fn)
 
-        self.logger.info(f"Completed processing [{len(files)}] recordings for Freq: [{freq_khz}] khz  Submode: [{mode}].")
+        self.logger.debug(f"-- JS8 decoding process completed for file: [{src_fn}].")
 
-        return 0;
+        return ret_code
+
+
+    def decodeSchedule(self, src_fn:str):
+        # Decode pool (release, deadline, duration) of a recording, from its JT filename's start time
+        jt = parseJTFilename(src_fn)
+        if jt is None:
+            return None
+
+        return slotSchedule(jt["record_time"].timestamp(), self.mode_conf.submode["duration"], self.stagger_offset)
+
+    def submitAudio(self, slot_start:int, pcm:bytes, sample_rate:int=DEFAULT_SAMPLE_RATE):
+        # Called from the RTP ingest thread when a slot closes, must not block.
+        self.pool.submit(None, self.decodeAudio, slot_start, pcm, sample_rate,
+                         schedule=slotSchedule(slot_start, self.mode_conf.submode["duration"], self.stagger_offset), band=self.mode_conf.freq_khz,
+                         slot_time=slot_start)
+
+    def decodeAudio(self, slot_start:int, pcm:bytes, sample_rate:int=DEFAULT_SAMPLE_RATE):
+        # "js8" only reads wav files so the in memory slot is handed over as a short lived scratch 
+        # file in the pool's scratch folder (ideally tmpfs), which is removed once decoded.
+        record_time = datetime.fromtimestamp(slot_start, tz=timezone.utc)
+        scratch_dir = f"{self.pool.scratch_dir}/rtp/{self.mode_conf.freq_hz}/{self.mode_conf.submode['name']}"
+        Path(scratch_dir).mkdir(parents=True, exist_ok=True)
+        scratch_fn = f"{scratch_dir}/{formatJTFilename(record_time, self.mode_conf.freq_hz, 'usb')}"
+        writeWav(scratch_fn, 1, sample_rate, 2, pcm)
+
+        return self.decodeRecording(scratch_fn)
+
+
+#################################################################################
+# Js8WideDecoder Class
+#################################################################################
+
+class Js8WideDecoder:
+    mode_conf: ModeConfig = None
+    decoders: list = None
+    pool = None
+
+    def __init__(self, mode_conf: ModeConfig, decoders: list, pool=None, scratch_dir:str=None):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.mode_conf = mode_conf
+        self.decoders = decoders
+        self.pool = pool
+        # Windows are written to the scratch folder (ideally tmpfs) so the audio is not written to disk again
+        self.scratch_dir = scratch_dir if scratch_dir is not None else self.mode_conf.mode_tmp_dir
+
+        # Windows are written into a folder per submode so windows sharing the same start time do not clash.
+        for js8_dec in self.decoders:
+            Path(f"{self.scratch_dir}/{js8_dec.mode_conf.submode['name']}").mkdir(parents=True, exist_ok=True)
+            Path(f"{self.mode_conf.mode_tmp_dir}/{js8_dec.mode_conf.submode['name']}").mkdir(parents=True, exist_ok=True)
+
+    def sliceWindows(self, src_fn:str, js8_dec: Js8Decoder):
+        # Slice the slot aligned "wide" recording into windows of the submode's duration. The samples are 
+        # read through a memory map and written straight into each window's wav (no intermediate copies).
+        # Each window is named using the JT format with its own start time so the parser sees correct record time.
+        jt = parseJTFilename(src_fn)
+        if jt is None:
+            raise ValueError(f"Wide recording: [{src_fn}] does not have a JT formatted filename.")
+
+        info = readWavInfo(src_fn)
+        duration = js8_dec.mode_conf.submode["duration"]
+        submode = js8_dec.mode_conf.submode["name"]
+        window_size = duration * info["sample_rate"] * info["block_align"]
+
+        windows = []
+        with open(src_fn, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            data_size = min(info["data_size"], file_size - info["data_offset"])
+
+            # A window that is the whole recording (ie the slow submode's) is not copied but hard linked, so in the 
+            # tmp folder (the same file system as the recording) rather than the scratch folder.
+            if ((data_size // window_size) == 1) and ((data_size - window_size) < (info["sample_rate"] * info["block_align"])):
+                win_fn = f"{self.mode_conf.mode_tmp_dir}/{submode}/{formatJTFilename(jt['record_time'], jt['freq'], jt['radio_mode'])}"
+                if os.path.exists(win_fn):
+                    os.remove(win_fn)
+                os.link(src_fn, win_fn)
+                return [win_fn]
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    for idx in range(data_size // window_size):
+                        start = info["data_offset"] + (idx * window_size)
+                        win_time = jt["record_time"] + timedelta(seconds=idx * duration)
+                        win_fn = f"{self.scratch_dir}/{submode}/{formatJTFilename(win_time, jt['freq'], jt['radio_mode'])}"
+
+                        writeWav(win_fn, info["channels"], info["sample_rate"], info["bits_per_sample"] // 8, 
+                                 view[start:start + window_size])
+                        windows.append(win_fn)
+                finally:
+                    view.release()
+
+        return windows
+
+    def decodeRecording(self, src_fn:str):
+
+        self.logger.debug(f"JS8 wide decoding process started for file: [{src_fn}].")
+
+        # All the windows are sliced before any are queued, so a failure doesn't leave some queued
+        windows = []
+        try:
+            for js8_dec in self.decoders:
+                for win_fn in self.sliceWindows(src_fn, js8_dec):
+                    windows.append((js8_dec, win_fn))
+
+        except Exception as e:
+            self.logger.error(f"Failed to process wide recording: [{src_fn}]. {e}")
+            for _, win_fn in windows:
+                os.remove(win_fn)
+            os.rename(src_fn, f"{self.mode_conf.mode_rec_error_dir}/{os.path.basename(src_fn)}")
+            return
+
+        os.remove(src_fn)
 
+        for js8_dec, win_fn in windows:
+            if self.pool is not None:
+                self.pool.submit(win_fn, js8_dec.decodeRecording, win_fn, schedule=js8_dec.decodeSchedule(win_fn),
+                                 band=self.mode_conf.freq_khz, shed=shedRecording, slot_time=recordingTime(win_fn))
+            else:
+                js8_dec.decodeRecording(win_fn)
+
+        self.logger.debug(f"-- JS8 wide decoding process completed for file: [{src_fn}].")
+
+    def decodeSchedule(self, src_fn:str):
+        # Slicing is cheap and the windows can't be queued until it's done, so due as soon as the recording ends
+        jt = parseJTFilename(src_fn)
+        if jt is None:
+            return None
+
+        duration = self.mode_conf.submode["duration"]
+        slot_end = jt["record_time"].timestamp() + duration
+        return slot_end, slot_end, duration
+
+
+#################################################################################
+# Js8DecodePool Class
+#################################################################################
+
+class Js8DecodePool:
+
+    # Jobs are run earliest deadline first. A job with a release time in the future waits (in "waiting") until
+    # then before it's ready to run, so the decodes of a slot are spread across it rather than all at its end.
+    #
+    # If the pool falls behind, jobs more than "max_slot_age" slots past their deadline are deferred to the
+    # "catchup" lane (run only when nothing live is ready, by at most half the workers) or dropped, per the
+    # backlog policy. Each band's queued jobs are also bounded by "max_band_spool", dropping its oldest.
+    # Jobs removed from the queues are only marked as "cancelled" and skipped when reached.
+    #
+    # The recording (slot) times of each band's queued and running jobs are tracked for lowWatermark().
+
+    workers: int
+    ready: list
+    waiting: list
+    catchup: list
+    pending: set
+    server_cmd: list
+    backlog_policy: str
+    max_slot_age: int
+    max_band_spool: int
+
+    def __init__(self, workers:int=None, server_cmd:list=None, scratch_dir:str=DEFAULT_JS8_SCRATCH_DIR, plan_dir:str=None,
+                 backlog_policy:str=DEFAULT_BACKLOG_POLICY, max_slot_age:int=DEFAULT_MAX_SLOT_AGE, max_band_spool:int=DEFAULT_MAX_BAND_SPOOL,
+                 stats_fn:str=None):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.workers = workers if workers else (os.cpu_count() or 1)
+        self.ready = []
+        self.waiting = []
+        self.catchup = []
+        self.jobs_cond = threading.Condition()
+        self.seq = itertools.count()
+        self.pending = set()
+        self.pending_lock = threading.Lock()
+        self.threads = []
+
+        self.backlog_policy = backlog_policy
+        self.max_slot_age = max_slot_age
+        self.max_band_spool = max_band_spool
+        self.max_catchup = max(1, self.workers // 2)
+        self.catchup_running = 0
+        self.band_queued = {}
+        self.band_slots = {}
+
+        # Backlog stats per band, totals since started and since last logged
+        self.stats_fn = stats_fn
+        self.stats = {}
+        self.stats_logged = {}
+
+        # Each worker thread keeps its own long lived js8 server (if a server command is given). If one can't be 
+        # started as a server then all the workers fall back to running a js8 per recording.
+        self.server_cmd = server_cmd
+        self.scratch_dir = scratch_dir
+        self.plan_dir = plan_dir
+        self.servers_disabled = server_cmd is None
+        self.local = threading.local()
+        self.servers = []
+        self.servers_lock = threading.Lock()
+
+    def serverWorker(self):
+        # The calling worker thread's js8 server, started (or restarted if it has died) as required. None if per recording exec is to be used.
+        if self.servers_disabled:
+            return None
+
+        server = getattr(self.local, "server", None)
+        if (server is not None) and server.isAlive():
+            return server
+
+        if server is not None:
+            self.logger.warning(f"js8 server for worker: [{threading.current_thread().name}] has exited, restarting.")
+            server.stop()
+
+        server = Js8ServerWorker(self.server_cmd, f"{self.scratch_dir}/{threading.current_thread().name}", self.plan_dir)
+        if not server.start():
+            with self.servers_lock:
+                if not self.servers_disabled:
+                    self.logger.warning(f"Unable to run: [{' '.join(self.server_cmd)}] as a js8 server, falling back to running js8 per recording.")
+                    self.servers_disabled = True
+            self.local.server = None
+            return None
+
+        self.local.server = server
+        with self.servers_lock:
+            self.servers.append(server)
+
+        return server
+
+    def stopServers(self):
+        with self.servers_lock:
+            for server in self.servers:
+                server.stop()
+            self.servers = []
+
+    def submit(self, key, func, *args, schedule:tuple=None, band=None, shed=None, slot_time:int=None):
+        # Jobs with a key (ie the recording's path) are only queued once until they have been processed,
+        # so a recording seen again by the scanner while still queued / decoding is not decoded twice.
+        # schedule is the job's (release, deadline, duration) secs since epoch, without one it's ready and due now.
+        # shed(key) is called if the job is discarded (ie to remove the recording). slot_time is the start of the 
+        # job's recording, for the band's watermark.
+        if key is not None:
+            with self.pending_lock:
+                if key in self.pending:
+                    return False
+                self.pending.add(key)
+
+        now = time.time()
+        release, deadline, duration = schedule if schedule is not None else (now, now, 0)
+        job = {"key": key, "func": func, "args": args, "deadline": deadline, "band": band, "shed": shed, "cancelled": False,
+               "stale_at": deadline + (self.max_slot_age * duration) if (duration > 0) else None, 
+               "id": next(self.seq), "slot_time": slot_time}
+
+        shed_jobs = []
+        with self.jobs_cond:
+            self.countStat(band, "queued")
+            if slot_time is not None:
+                self.band_slots.setdefault(band, {})[job["id"]] = slot_time
+
+            if self.isStale(job, now):
+                self.backlogStale(job, shed_jobs)
+            else:
+                self.enqueue(job, release, now, shed_jobs)
+
+            self.jobs_cond.notify()
+
+        self.shedJobs(shed_jobs)
+        return True
+
+    def enqueue(self, job:dict, release:float, now:float, shed_jobs:list, catchup:bool=False):
+        # With the jobs_cond held. Makes room in the band's spool first.
+        band = job["band"]
+        if (band is not None) and (self.max_band_spool > 0) and (self.band_queued.get(band, 0) >= self.max_band_spool):
+            oldest = min([queued for queued in self.queuedJobs() if queued["band"] == band] + [job], key=lambda queued: queued["deadline"])
+            self.countStat(band, "spool_dropped")
+            shed_jobs.append(oldest)
+            if oldest is job:
+                return
+            self.dequeued(oldest)
+            oldest["cancelled"] = True
+
+        self.band_queued[band] = self.band_queued.get(band, 0) + 1
+        if catchup:
+            heapq.heappush(self.catchup, (job["deadline"], next(self.seq), job))
+        elif release > now:
+            heapq.heappush(self.waiting, (release, next(self.seq), job))
+        else:
+            heapq.heappush(self.ready, (job["deadline"], next(self.seq), job))
+
+    def dequeued(self, job:dict):
+        self.band_queued[job["band"]] -= 1
+
+    def jobDone(self, job:dict):
+        # With the jobs_cond held, the job has been run or discarded
+        band_slots = self.band_slots.get(job["band"])
+        if band_slots is not None:
+            band_slots.pop(job["id"], None)
+
+    def lowWatermark(self, band):
+        # Start time of the band's oldest recording still queued or being decoded, frames older than this 
+        # won't be seen again. None if not known.
+        with self.jobs_cond:
+            band_slots = self.band_slots.get(band)
+            return min(band_slots.values()) if band_slots else None
+
+    def isStale(self, job:dict, now:float) -> bool:
+        return (self.backlog_policy != BACKLOG_KEEP) and (job["stale_at"] is not None) and (now > job["stale_at"])
+
+    def backlogStale(self, job:dict, shed_jobs:list):
+        # With the jobs_cond held, the job is not queued
+        if self.backlog_policy == BACKLOG_DROP:
+            self.countStat(job["band"], "stale_dropped")
+            shed_jobs.append(job)
+        else:
+            self.countStat(job["band"], "deferred")
+            self.enqueue(job, 0, 0, shed_jobs, True)
+
+    def queuedJobs(self):
+        for lane in (self.ready, self.waiting, self.catchup):
+            for entry in lane:
+                if not entry[2]["cancelled"]:
+                    yield entry[2]
+
+    def qsize(self) -> int:
+        with self.jobs_cond:
+            return sum(1 for _ in self.queuedJobs())
+
+    def shedJobs(self, shed_jobs:list):
+        for job in shed_jobs:
+            try:
+                if job["shed"] is not None:
+                    job["shed"](job["key"])
+            except Exception as e:
+                self.logger.error(f"Failed to discard decode job: [{job['key']}]. {e}")
+            finally:
+                if job["key"] is not None:
+                    with self.pending_lock:
+                        self.pending.discard(job["key"])
+
+                with self.jobs_cond:
+                    self.jobDone(job)
+
+    def nextJob(self):
+        # Returns the next (job, is catch-up job) to run, and any jobs shed on the way to be discarded
+        shed_jobs = []
+
+        with self.jobs_cond:
+            while True:
+                now = time.time()
+                while self.waiting and (self.waiting[0][0] <= now):
+                    _, seq, job = heapq.heappop(self.waiting)
+                    if not job["cancelled"]:
+                        heapq.heappush(self.ready, (job["deadline"], seq, job))
+
+                while self.ready:
+                    _, _, job = heapq.heappop(self.ready)
+                    if job["cancelled"]:
+                        continue
+
+                    self.dequeued(job)
+                    if self.isStale(job, now):
+                        self.backlogStale(job, shed_jobs)
+                        continue
+
+                    # Several jobs may have been released at once, so pass the wake up on to another worker
+                    if self.ready:
+                        self.jobs_cond.notify()
+                    return job, False, shed_jobs
+
+                while self.catchup and (self.catchup_running < self.max_catchup):
+                    _, _, job = heapq.heappop(self.catchup)
+                    if job["cancelled"]:
+                        continue
+
+                    self.dequeued(job)
+                    self.catchup_running += 1
+                    return job, True, shed_jobs
+
+                if shed_jobs:
+                    return None, False, shed_jobs
+
+                self.jobs_cond.wait((self.waiting[0][0] - now) if self.waiting else None)
+
+    def worker(self):
+        while True:
+            job, catchup, shed_jobs = self.nextJob()
+            self.shedJobs(shed_jobs)
+            if job is None:
+                continue
+
+            key = job["key"]
+            late = time.time() - job["deadline"]
+            if late > 0:
+                self.logger.debug(f"Decode job: [{key}] started [{late:.1f}] secs after its deadline.")
+
+            try:
+                job["func"](*job["args"])
+            except Exception as e:
+                self.logger.error(f"Decode job: [{key}] failed. {e}")
+            finally:
+                if key is not None:
+                    with self.pending_lock:
+                        self.pending.discard(key)
+
+                with self.jobs_cond:
+                    self.jobDone(job)
+                    if catchup:
+                        self.catchup_running -= 1
+                        self.jobs_cond.notify()
+
+    def countStat(self, band, stat:str):
+        # With the jobs_cond held
+        band_stats = self.stats.setdefault(band, {"queued": 0, "deferred": 0, "stale_dropped": 0, "spool_dropped": 0, "gated": 0})
+        band_stats[stat] += 1
+
+    def recordStat(self, band, stat:str):
+        # Counts by the decode jobs themselves (ie "gated" - skipped by the energy gate)
+        with self.jobs_cond:
+            self.countStat(band, stat)
+
+    def backlogStats(self):
+        with self.jobs_cond:
+            queued = {}
+            catchup = {}
+            for lane, counts in ((self.ready, queued), (self.waiting, queued), (self.catchup, catchup)):
+                for entry in lane:
+                    job = entry[2]
+                    if not job["cancelled"]:
+                        counts[job["band"]] = counts.get(job["band"], 0) + 1
+
+            bands = {}
+            for band, band_stats in self.stats.items():
+                bands[band] = dict(band_stats, waiting=queued.get(band, 0), catchup=catchup.get(band, 0))
+
+        return {"updated": int(time.time()), "policy": self.backlog_policy, "max_slot_age": self.max_slot_age, "max_band_spool": self.max_band_spool,
+                "waiting": sum(queued.values()), "catchup": sum(catchup.values()), "bands": bands}
+
+    def logStats(self):
+        stats = self.backlogStats()
+
+        shed = {}
+        for band, band_stats in stats["bands"].items():
+            logged = self.stats_logged.get(band, {})
+            for stat in ["deferred", "stale_dropped", "spool_dropped", "gated"]:
+                shed[stat] = shed.get(stat, 0) + band_stats[stat] - logged.get(stat, 0)
+            self.stats_logged[band] = band_stats
+
+        if shed["gated"] > 0:
+            self.logger.info(f"Energy gate skipped decoding [{shed['gated']}] empty recordings in the last [{BACKLOG_STATS_INTERVAL}] secs.")
+
+        if shed["deferred"] or shed["stale_dropped"] or shed["spool_dropped"]:
+            self.logger.warning(f"Decode backlog: Waiting: [{stats['waiting']}] Catch-up: [{stats['catchup']}]. Last [{BACKLOG_STATS_INTERVAL}] secs - Deferred: [{shed['deferred']}] Dropped (stale): [{shed['stale_dropped']}] Dropped (spool full): [{shed['spool_dropped']}]")
+        else:
+            self.logger.debug(f"Decode backlog: Waiting: [{stats['waiting']}] Catch-up: [{stats['catchup']}].")
+
+        if self.stats_fn is not None:
+            tmp_fn = f"{self.stats_fn}.tmp"
+            with open(tmp_fn, "w") as file:
+                json.dump(stats, file)
+            os.replace(tmp_fn, self.stats_fn)
+
+    def statsLoop(self):
+        while True:
+            time.sleep(BACKLOG_STATS_INTERVAL)
+            try:
+                self.logStats()
+            except Exception as e:
+                self.logger.error(f"Failed to log decode backlog stats. {e}")
+
+    def start(self):
+        self.logger.info(f"Starting decode pool with [{self.workers}] workers. js8 Server: [{' '.join(self.server_cmd) if self.server_cmd else None}] "
+                         f"Backlog Policy: [{self.backlog_policy}] Max Slot Age: [{self.max_slot_age}] Max Band Spool: [{self.max_band_spool}]")
+
+        for idx in range(self.workers):
+            wk_thread = threading.Thread(target=self.worker, name=f"js8-decode-{idx}", args=())
+            wk_thread.start()
+            self.threads.append(wk_thread)
+
+        st_thread = threading.Thread(target=self.statsLoop, name="js8-decode-stats", args=(), daemon=True)
+        st_thread.start()
+
+
+#################################################################################
+# Js8RecordingScanner Class
+#################################################################################
+
+class Js8RecordingScanner:
+
+    pool: Js8DecodePool
+    sources: list
+
+    def __init__(self, pool: Js8DecodePool, interval:int=DEFAULT_SCAN_INTERVAL, sources:list=None):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.pool = pool
+        self.interval = interval
+        self.sources = sources if sources else []
+
+    def addSource(self, rec_dir:str, handler, schedule=None, band=None):
+        # schedule(src_fn) gives a recording's decode pool (release, deadline, duration), band its frequency
+        self.sources.append((rec_dir, handler, schedule, band))
+
+    def scan(self):
+        queued = 0
+        for rec_dir, handler, schedule, band in self.sources:
+            for wav_fn in findFile(rec_dir, r"\.wav$", 2):
+                src_fn = f"{rec_dir}/{wav_fn}"
+                if self.pool.submit(src_fn, handler, src_fn, schedule=schedule(src_fn) if schedule else None, band=band, shed=shedRecording,
+                                    slot_time=recordingTime(src_fn)):
+                    queued += 1
+
+        return queued
 
     def start(self):
-        self.logger.info(f"Js8Decoder handler prcessor started for Freq: [{self.mode_conf.freq_khz}] khz SubMode: [{self.mode_conf.submode['name']}]")
+        self.logger.info(f"Recording scanner started for [{len(self.sources)}] folders.")
 
         while True:
+            try:
+                queued = self.scan()
+                self.logger.info(f"Queued [{queued}] new recordings, [{self.pool.qsize()}] decode jobs waiting. Sleeping for {self.interval}secs ...")
+            except Exception as e:
+                self.logger.error(f"Error while scanning for recordings. {e}")
+
+            time.sleep(self.interval)
+
+
+#################################################################################
+# Js8RecordingWatcher Class
+#################################################################################
 
-            self.decoding_process()
+class Js8RecordingWatcher(Js8RecordingScanner):
 
-            self.logger.info(f"Sleeping for 15secs ...")
-            time.sleep(15)
+    # Reacts to inotify close-write / rename events in each rec folder so a recording is queued as soon as 
+    # the recorder finishes it. A recording is accepted once its wav header shows it is complete (rather than 
+    # waiting on its mtime age). A full scan is still performed at start up, on event queue overflow and every 
+    # "interval" seconds to catch anything missed.
+
+    def __init__(self, pool: Js8DecodePool, interval:int=DEFAULT_WATCH_RESCAN_INTERVAL):
+        super().__init__(pool, interval)
+
+    def handleEvent(self, rec_dir:str, name:str, handler, schedule=None, band=None):
+        if not name.endswith(".wav"):
+            return False
+
+        src_fn = f"{rec_dir}/{name}"
+        if not isWavComplete(src_fn):
+            self.logger.debug(f"Recording: [{src_fn}] is not complete yet, skipping.")
+            return False
+
+        return self.pool.submit(src_fn, handler, src_fn, schedule=schedule(src_fn) if schedule else None, band=band, shed=shedRecording,
+                                slot_time=recordingTime(src_fn))
+
+    def scan(self):
+        queued = 0
+        for rec_dir, handler, schedule, band in self.sources:
+            for wav_fn in findFile(rec_dir, r"\.wav$", 0):
+                if self.handleEvent(rec_dir, wav_fn, handler, schedule, band):
+                    queued += 1
+
+        return queued
+
+    def start(self):
+        try:
+            inotify = Inotify()
+            handlers = {}
+            for rec_dir, handler, schedule, band in self.sources:
+                inotify.addWatch(rec_dir, IN_CLOSE_WRITE | IN_MOVED_TO)
+                handlers[rec_dir] = (handler, schedule, band)
+        except OSError as e:
+            self.logger.warning(f"Unable to watch rec folders ({e}), falling back to scanning every {DEFAULT_SCAN_INTERVAL}secs.")
+            return Js8RecordingScanner(self.pool, DEFAULT_SCAN_INTERVAL, self.sources).start()
+
+        self.logger.info(f"Recording watcher started for [{len(self.sources)}] folders.")
+
+        try:
+            self.scan()
+            last_scan = time.monotonic()
+
+            while True:
+                try:
+                    # Rescan every interval secs however busy the folders are
+                    events = inotify.read(max(0, self.interval - (time.monotonic() - last_scan)))
+                    rescan = (time.monotonic() - last_scan) >= self.interval
+
+                    for rec_dir, name, mask in events:
+                        if mask & IN_Q_OVERFLOW:
+                            self.logger.warning(f"Recording watcher event queue overflowed, rescanning.")
+                            rescan = True
+                        elif rec_dir in handlers:
+                            self.handleEvent(rec_dir, name, *handlers[rec_dir])
+
+                    if rescan:
+                        last_scan = time.monotonic()
+                        self.scan()
+
+                except Exception as e:
+                    self.logger.error(f"Error while watching for recordings. {e}")
+        finally:
+            inotify.close()
 
 
 ################################################################################
@@ -650,6 +1817,34 @@ class Js8DecodingControl:
     freq_list = FREQ_LIST
     submodes = SUBMODES_BYNAME
     mcast_addr:str = DEFAULT_MCAST_ADDR
+    rec_mode:str = REC_MODE_SUBMODE
+    ingest:str = INGEST_PCMRECORD
+    discovery:str = DISCOVERY_WATCH
+    archive_decodes:bool = True
+    decode_workers:int = DEFAULT_DECODE_WORKERS
+    rtp_port:int = DEFAULT_RTP_PORT
+    sample_rate:int = DEFAULT_SAMPLE_RATE
+    history_max_activities:int = DEFAULT_HISTORY_MAX_ACTIVITIES
+    history_max_incomplete:int = DEFAULT_HISTORY_MAX_INCOMPLETE
+    decode_store:str = DECODE_STORE_JSONL
+    checkpoint_interval:int = DEFAULT_CHECKPOINT_INTERVAL
+    aggregator_shards:int = DEFAULT_AGGREGATOR_SHARDS
+    spot_fsync:str = SPOT_FSYNC_NONE
+    spot_log_shared:bool = False
+    spot_log_rotate:bool = False
+    segment_bytes:int = DEFAULT_SEGMENT_BYTES
+    segment_age:int = DEFAULT_SEGMENT_AGE
+    js8_server:str = None
+    js8_scratch_dir:str = DEFAULT_JS8_SCRATCH_DIR
+    decode_stagger:float = DEFAULT_DECODE_STAGGER
+    backlog_policy:str = DEFAULT_BACKLOG_POLICY
+    max_slot_age:int = DEFAULT_MAX_SLOT_AGE
+    max_band_spool:int = DEFAULT_MAX_BAND_SPOOL
+    adaptive_depth:bool = False
+    min_depth:int = DEFAULT_MIN_DEPTH
+    max_depth:int = DEFAULT_MAX_DEPTH
+    energy_gate:bool = False
+    gate_margin:float = DEFAULT_GATE_MARGIN
     data_dir:str
     archive_dir:str
 
@@ -658,16 +1853,57 @@ class Js8DecodingControl:
     decoder_threads = []
 
     aprsReporter:APRSReporter
+    pskReporter:PSKReporterSender
 
     
-    def __init__(self, freq_list=FREQ_LIST, submodes=SUBMODES_BYNAME, data_dir: str=DEFAULT_DATA_DIR, mcast_addr:str=DEFAULT_MCAST_ADDR, aprsReporter:APRSReporter=None):
+    def __init__(self, freq_list=FREQ_LIST, submodes=SUBMODES_BYNAME, data_dir: str=DEFAULT_DATA_DIR, mcast_addr:str=DEFAULT_MCAST_ADDR, aprsReporter:APRSReporter=None, rec_mode:str=REC_MODE_SUBMODE,
+                 ingest:str=INGEST_PCMRECORD, rtp_port:int=DEFAULT_RTP_PORT, sample_rate:int=DEFAULT_SAMPLE_RATE, rtp_payload_types:dict=None,
+                 decode_workers:int=DEFAULT_DECODE_WORKERS, discovery:str=DISCOVERY_WATCH, archive_decodes:bool=True,
+                 history_max_activities:int=DEFAULT_HISTORY_MAX_ACTIVITIES, history_max_incomplete:int=DEFAULT_HISTORY_MAX_INCOMPLETE,
+                 decode_store:str=DECODE_STORE_JSONL, checkpoint_interval:int=DEFAULT_CHECKPOINT_INTERVAL, aggregator_shards:int=DEFAULT_AGGREGATOR_SHARDS,
+                 pskReporter:PSKReporterSender=None, spot_fsync:str=SPOT_FSYNC_NONE, spot_log_shared:bool=False, spot_log_rotate:bool=False,
+                 segment_bytes:int=DEFAULT_SEGMENT_BYTES, segment_age:int=DEFAULT_SEGMENT_AGE,
+                 js8_server:str=None, js8_scratch_dir:str=DEFAULT_JS8_SCRATCH_DIR, decode_stagger:float=DEFAULT_DECODE_STAGGER,
+                 backlog_policy:str=DEFAULT_BACKLOG_POLICY, max_slot_age:int=DEFAULT_MAX_SLOT_AGE, max_band_spool:int=DEFAULT_MAX_BAND_SPOOL,
+                 adaptive_depth:bool=False, min_depth:int=DEFAULT_MIN_DEPTH, max_depth:int=DEFAULT_MAX_DEPTH,
+                 energy_gate:bool=False, gate_margin:float=DEFAULT_GATE_MARGIN):
         self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
         self.set_data_dir(data_dir)
         self.set_freq_list(freq_list)
         self.set_submodes(submodes)
         self.mcast_addr = mcast_addr
+        self.rec_mode = rec_mode
+        self.ingest = ingest
+        self.decode_workers = decode_workers
+        self.discovery = discovery
+        self.archive_decodes = archive_decodes
+        self.rtp_port = rtp_port
+        self.sample_rate = sample_rate
+        self.rtp_payload_types = rtp_payload_types
+        self.history_max_activities = history_max_activities
+        self.history_max_incomplete = history_max_incomplete
+        self.decode_store = decode_store
+        self.checkpoint_interval = checkpoint_interval
+        self.aggregator_shards = aggregator_shards
+        self.spot_fsync = spot_fsync
+        self.spot_log_shared = spot_log_shared
+        self.spot_log_rotate = spot_log_rotate
+        self.segment_bytes = segment_bytes
+        self.segment_age = segment_age
+        self.js8_server = js8_server
+        self.js8_scratch_dir = js8_scratch_dir
+        self.decode_stagger = decode_stagger
+        self.backlog_policy = backlog_policy
+        self.max_slot_age = max_slot_age
+        self.max_band_spool = max_band_spool
+        self.adaptive_depth = adaptive_depth
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.energy_gate = energy_gate
+        self.gate_margin = gate_margin
 
         self.aprsReporter = aprsReporter
+        self.pskReporter = pskReporter
         
     def set_data_dir(self, data_dir: str):
         self.data_dir = data_dir
@@ -677,6 +1913,11 @@ class Js8DecodingControl:
         Path(self.archive_dir).mkdir(parents=True, exist_ok=True)
 
         self.recorder_pids_file = f"{data_dir}/pcmrecord.pids"
+        self.history_db_file = f"{data_dir}/callsign_history.sqlite"
+        self.decode_store_file = f"{data_dir}/{DECODE_STORE_FN}"
+        self.checkpoint_dir = f"{data_dir}/checkpoint"
+        self.js8_plan_dir = f"{data_dir}/js8_plans"
+        self.backlog_stats_file = f"{data_dir}/decode_backlog.json"
         self.decoder_pids_file = f"{data_dir}/js8decoder.pid"
 
 
@@ -705,6 +1946,22 @@ class Js8DecodingControl:
     ## Decoder related functions
     #################################################################################
 
+    def openDecodeStore(self):
+        if (self.decode_store == DECODE_STORE_SQLITE):
+            return Js8DecodeStore(self.decode_store_file)
+
+        return None
+
+    def loadDecodes(self, mode_conf:ModeConfig, store:Js8DecodeStore=None, spots_only:bool=False) -> list:
+        # Decodes for the frequency / submode from the decode store if in use, otherwise its 'all_parsed_decodes' file
+        if store is not None:
+            self.logger.debug(f"Loading previously decoded messages from [{store.db_fn}] for Freq: [{mode_conf.freq_khz}] kHz  Submode: [{mode_conf.submode['name']}]...")
+            return store.query(dial_freqs=[mode_conf.freq_hz], submodes=[mode_conf.submode["name"]], spots_only=spots_only)
+
+        all_dec_fn = f"{mode_conf.mode_data_dir}/all_parsed_decodes.txt"
+        self.logger.debug(f"Loading previously decoded messages from [{all_dec_fn}] for Freq: [{mode_conf.freq_khz}] kHz  Submode: [{mode_conf.submode['name']}]...")
+        return loadJson(all_dec_fn, Js8Decode.fromDict)
+
     def archiveDecoderPidFile(self):
         archiveFile(self.decoder_pids_file, f"{self.archive_dir}/pids")
 
@@ -765,6 +2022,16 @@ class Js8DecodingControl:
 
         self.checkStatusDecoder(pid)
 
+        if os.path.exists(self.backlog_stats_file):
+            with open(self.backlog_stats_file, "r") as file:
+                stats = json.load(file)
+
+            self.logger.info(f"  Decode Backlog: Waiting: [{stats['waiting']}] Catch-up: [{stats['catchup']}] Policy: [{stats['policy']}] (as at {datetime.fromtimestamp(stats['updated'])})")
+            for band, band_stats in sorted(stats["bands"].items(), key=lambda item: int(item[0]) if item[0].isdigit() else 0):
+                self.logger.info(f"  -- Band: [{band}] Queued: [{band_stats['queued']}] Waiting: [{band_stats['waiting']}] Catch-up: [{band_stats['catchup']}] "
+                                 f"Deferred: [{band_stats['deferred']}] Dropped (stale): [{band_stats['stale_dropped']}] Dropped (spool full): [{band_stats['spool_dropped']}] "
+                                 f"Skipped (no signal): [{band_stats.get('gated', 0)}]")
+
         return 0
 
     def stopDecoder(self, pid):
@@ -827,18 +2094,132 @@ class Js8DecodingControl:
         # Save current PPID
         self.saveDecoderPid()
 
-        for freq in self.freq_list:
+        # All recordings from every frequency / submode are decoded by one shared, bounded pool of workers
+        server_cmd = shlex.split(self.js8_server) if self.js8_server else None
+        pool = Js8DecodePool(self.decode_workers, server_cmd, self.js8_scratch_dir, self.js8_plan_dir,
+                             self.backlog_policy, self.max_slot_age, self.max_band_spool, self.backlog_stats_file)
+        if (self.discovery == DISCOVERY_WATCH):
+            scanner = Js8RecordingWatcher(pool)
+        else:
+            scanner = Js8RecordingScanner(pool)
+
+        # Callsign history shared by all decoders, older activity is paged out to disk and kept across restarts
+        history = Js8CallsignHistory(self.history_db_file, self.history_max_activities, self.history_max_incomplete)
+        decode_store = self.openDecodeStore()
+
+        # Decoded frames from every decoder are processed by the aggregator
+        aggregator = Js8FrameAggregator(self.aprsReporter, history, self.freq_list, self.aggregator_shards)
+
+        # Restore the frame processing state from the last checkpoint
+        checkpoint = None
+        if (self.checkpoint_interval > 0):
+            checkpoint = Js8Checkpoint(self.checkpoint_dir, aggregator.toSnapshot, self.checkpoint_interval, len(aggregator.shards))
+            checkpoint.restore(aggregator.loadSnapshot, lambda frame, watermark: aggregator.replayFrame(Js8Decode.fromDict(frame), watermark))
+            aggregator.checkpoint = checkpoint
+
+            cp_thread = threading.Thread(target=checkpoint.start, args=(), daemon=True)
+            cp_thread.start()
+
+        aggregator.start()
+
+        # Spots from all decoders are written by the one spot writer
+        spot_lock_fn = f"{self.data_dir}/spot.lock" if self.spot_log_shared else None
+        # Only rotated if asked, truncating it under an external reader (ie "pskreporter-sender" tailing it) isn't safe
+        if self.spot_log_rotate:
+            spotWriter = Js8SpotWriter(self.spot_log_fn, self.spot_fsync, spot_lock_fn, f"{self.archive_dir}/spots", self.segment_bytes, self.segment_age)
+        else:
+            spotWriter = Js8SpotWriter(self.spot_log_fn, self.spot_fsync, spot_lock_fn, segment_bytes=0, segment_age=0)
+        spotWriter.start()
+
+        if self.pskReporter is not None:
+            psk_thread = threading.Thread(target=self.pskReporter.start, args=(), daemon=True)
+            psk_thread.start()
+
+        # Decode depth adjusted per band from its yield and the CPU headroom, shared by each band's decoders
+        depth_ctrl = None
+        if self.adaptive_depth:
+            depth_ctrl = Js8DepthController(DEFAULT_DECODE_DEPTH, self.min_depth, self.max_depth)
+            dp_thread = threading.Thread(target=depth_ctrl.start, args=(), daemon=True)
+            dp_thread.start()
+
+        energy_gate = Js8EnergyGate(self.gate_margin) if self.energy_gate else None
+
+        def onSigterm(signum, frame):
+            self.logger.info("SIGTERM received, shutting down decoders.")
+            try:
+                aggregator.drain()
+                if checkpoint is not None:
+                    checkpoint.snapshot()
+                    checkpoint.close()
+                history.close()
+                spotWriter.close()
+                pool.stopServers()
+                pool.logStats()
+                if self.aprsReporter is not None:
+                    self.aprsReporter.close()
+                if self.pskReporter is not None:
+                    self.pskReporter.close()
+            finally:
+                logging.shutdown()
+                os._exit(0)
+
+        signal.signal(signal.SIGTERM, onSigterm)
+
+        rtp_decoders = {}
+
+        for freq_idx, freq in enumerate(self.freq_list):
+            decoders = []
             for submode in self.submodes:
                 
-                # Create a Decoder Hanlding thread.
-                #dh_thread = threading.Thread(target=js8DecoderHandler, args=(freq, submode,), daemon=True)
                 mode_conf = ModeConfig(freq, submode, self.data_dir, self.mcast_addr)
-                js8_dec = Js8Decoder(mode_conf, self.aprsReporter)
-                dh_thread = threading.Thread(target=js8_dec.start, args=())
-                dh_thread.start()
-                #dh_thread.join()
+                # Each frequency's decodes of the submode start a little later into the slot than the last
+                stagger_offset = self.decode_stagger * submode["duration"] * freq_idx / len(self.freq_list)
+                decode_log = None
+                if decode_store is None:
+                    decode_log = Js8SegmentedLog(f"{mode_conf.mode_data_dir}/all_parsed_decodes.txt", self.segment_bytes, self.segment_age)
+
+                js8_dec = Js8Decoder(mode_conf, self.aprsReporter, pool, self.archive_decodes, history, decode_store, aggregator, self.pskReporter, spotWriter,
+                                     decode_log, stagger_offset, depth_ctrl, energy_gate)
+                decoders.append(js8_dec)
+
+                if (self.ingest == INGEST_RTP):
+                    rtp_decoders[(freq, submode["name"])] = js8_dec
+
+                elif (self.rec_mode == REC_MODE_SUBMODE):
+                    scanner.addSource(mode_conf.mode_rec_dir, js8_dec.decodeRecording, js8_dec.decodeSchedule, freq)
+
+            # Wide recordings are sliced into each submode's windows, which are then queued to the pool.
+            if (self.ingest == INGEST_PCMRECORD) and (self.rec_mode == REC_MODE_WIDE):
+                wide_conf = ModeConfig(freq, SM_WIDE, self.data_dir, self.mcast_addr)
+                js8_wide_dec = Js8WideDecoder(wide_conf, decoders, pool, f"{self.js8_scratch_dir}/wide/{wide_conf.freq_hz}")
+                scanner.addSource(wide_conf.mode_rec_dir, js8_wide_dec.decodeRecording, js8_wide_dec.decodeSchedule, freq)
+
+        pool.start()
+
+        if (self.ingest == INGEST_RTP):
+            self.startRtpIngest(rtp_decoders)
+        else:
+            sc_thread = threading.Thread(target=scanner.start, args=())
+            sc_thread.start()
 
         return 0
+
+    def startRtpIngest(self, rtp_decoders:dict):
+
+        def on_window(freq_khz, submode, slot_start, pcm):
+            rtp_decoders[(freq_khz, submode["name"])].submitAudio(slot_start, pcm, self.sample_rate)
+
+        ssrc_map = {}
+        for freq in self.freq_list:
+            ssrc_map[FREQ_SSRC[FREQ_LIST.index(freq)]] = freq
+
+        rtp_ingest = Js8RtpIngest(self.mcast_addr, ssrc_map, self.submodes, on_window, 
+                                  port=self.rtp_port, sample_rate=self.sample_rate, payload_types=self.rtp_payload_types)
+        
+        ri_thread = threading.Thread(target=rtp_ingest.start, args=())
+        ri_thread.start()
+
+        return rtp_ingest
     
     #####################################################################
     ## Utility Related functions
@@ -860,43 +2241,47 @@ class Js8DecodingControl:
         # !!IMPORTANT!! 
         #    Only use aprsReporter during rebuild if debugging and issue. We DO NOT want to flood APRSIS / resend duplicates.
         # js8FrameProc = Js8FrameProcessor(aprsReporter=aprsReporter)
-        js8FrameProc = Js8FrameProcessor(aprsReporter=None)
+        js8FrameProc = Js8FrameProcessor(aprsReporter=None, keep_completed=True)
+        store = self.openDecodeStore()
 
         for freq in self.freq_list:
+            freq_dec_msgs = []
             for submode in self.submodes:
                 
                 # Create a Decoder Hanlding thread.
                 #dh_thread = threading.Thread(target=js8DecoderHandler, args=(freq, submode,), daemon=True)
                 mode_conf = ModeConfig(freq, submode, self.data_dir, self.mcast_addr)
                 
-                all_dec_fn = f"{mode_conf.mode_data_dir}/all_parsed_decodes.txt"
-                self.logger.debug(f"Loading previously decoded messages from [{all_dec_fn}] for Freq: [{mode_conf.freq_khz}] kHz  Submode: [{mode_conf.submode['name']}]...")
-                dec_msgs = loadJson(all_dec_fn)
+                dec_msgs = self.loadDecodes(mode_conf, store)
+                freq_dec_msgs.append(dec_msgs)
                 
-                self.logger.debug(f"Loaded [{len(dec_msgs)}] decoded messages, rebuilding callsign history...")
+                self.logger.info(f"Loaded [{len(dec_msgs)}] decode messages for Freq: [{mode_conf.freq_khz}] kHz  Submode: [{mode_conf.submode['name']}].")
 
-                for dec in dec_msgs:
-                    js8FrameProc.processFrame(dec)
-                
-                self.logger.info(f"Completed processing [{len(dec_msgs)}] decode messages for Freq: [{mode_conf.freq_khz}] kHz  Submode: [{mode_conf.submode['name']}].")
+            # Replay the submodes in timestamp order (as they were heard) so the activity expiry clock only moves forward.
+            count = 0
+            for dec in timestampOrder(freq_dec_msgs):
+                js8FrameProc.processFrame(dec)
+                count += 1
+
+            self.logger.info(f"Completed processing [{count}] decode messages for Freq: [{freq}] kHz.")
 
         # Perform cleanup (ie move expired actvities to "msgbyfreq_db_incomplete")
         js8FrameProc.cleanup()    
 
         if not print_only:
-            archiveFile(callsign_hist_db_fn, f"{self.archive_dir}/callsign_hist_db", ARCHIVE_METHOD_TRUNCATE)
-            archiveFile(msgbyfreq_db_fn, f"{self.archive_dir}/callsign_hist_db", ARCHIVE_METHOD_TRUNCATE)
-            archiveFile(msgbyfreq_incomplete_db_fn, f"{self.archive_dir}/callsign_hist_db", ARCHIVE_METHOD_TRUNCATE)
-            appendJson(js8FrameProc.callsigns, callsign_hist_db_fn)
-            appendJson(js8FrameProc.msgByFreq, msgbyfreq_db_fn)
+            archiveFile(callsign_hist_db_fn, f"{self.archive_dir}/callsign_hist_db", ARCHIVE_METHOD_COMPRESS)
+            archiveFile(msgbyfreq_db_fn, f"{self.archive_dir}/callsign_hist_db", ARCHIVE_METHOD_COMPRESS)
+            archiveFile(msgbyfreq_incomplete_db_fn, f"{self.archive_dir}/callsign_hist_db", ARCHIVE_METHOD_COMPRESS)
+            appendJson(js8FrameProc.history.toDict(), callsign_hist_db_fn)
+            appendJson(js8FrameProc.exportMsgByFreq(), msgbyfreq_db_fn)
             appendJson(js8FrameProc.msgByFreq_incomplete, msgbyfreq_incomplete_db_fn)
         else:
             dbs = {
-                "callsign_hist_db": js8FrameProc.callsigns,
-                "msgbyfreq_db": js8FrameProc.msgByFreq,
+                "callsign_hist_db": js8FrameProc.history.toDict(),
+                "msgbyfreq_db": js8FrameProc.exportMsgByFreq(),
                 "msgbyfreq_db_incomplete": js8FrameProc.msgByFreq_incomplete
             }
-            print(f"{json.dumps(dbs)}")
+            print(f"{json.dumps(dbs, default=jsonDefault)}")
             
 
         self.logger.info(f"Completed rebuilding callsign history DB: [{callsign_hist_db_fn}]")
@@ -913,46 +2298,59 @@ class Js8DecodingControl:
             sys.exit(0)
 
         self.logger.info("Rebuilding spot log from 'all_parsed_decodes' files...")
-        
-        spots = []
-
-        for freq in self.freq_list:
-            for submode in self.submodes:
-                
-                # Create a Decoder Hanlding thread.
-                #dh_thread = threading.Thread(target=js8DecoderHandler, args=(freq, submode,), daemon=True)
-                mode_conf = ModeConfig(freq, submode, self.data_dir, self.mcast_addr)
-                js8_dec = Js8Decoder(mode_conf)
-                
-                all_dec_fn = f"{mode_conf.mode_data_dir}/all_parsed_decodes.txt"
-                self.logger.debug(f"Loading previously decoded messages from [{all_dec_fn}] for Freq: [{mode_conf.freq_khz}] kHz  Submode: [{mode_conf.submode['name']}]...")
-                dec_msgs = loadJson(all_dec_fn)
-                
-                self.logger.debug(f"Loaded [{len(dec_msgs)}] decoded messages, rebuilding spots...")
 
-                for dec in dec_msgs:
-                    spot = generateSpot(dec)
-                    if (spot):
-                        spots.append(f"{spot}\n")
-                        
-                self.logger.info(f"Completed processing [{len(dec_msgs)}] decode messages for Freq: [{mode_conf.freq_khz}] kHz  Submode: [{mode_conf.submode['name']}]. Reported [{len(spots)}] new spots.")
+        store_fn = self.decode_store_file if (self.decode_store == DECODE_STORE_SQLITE) else None
+        # Make sure the store (and its schema) exists before the workers read it
+        if store_fn is not None:
+            self.openDecodeStore().close()
+
+        spot_cnt = 0
+
+        # Each frequency / submode is read and its spots sorted into runs by a worker process, the runs are then 
+        # k-way merged (arranged by timestamp, freq, .....) straight into the spot log.
+        with tempfile.TemporaryDirectory(prefix="spot_runs_", dir=self.data_dir) as run_dir:
+
+            runs = []
+            workers = self.decode_workers if self.decode_workers > 0 else None
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {}
+                for freq in self.freq_list:
+                    for submode in self.submodes:
+                        mode_conf = ModeConfig(freq, submode, self.data_dir, self.mcast_addr)
+                        all_dec_fn = f"{mode_conf.mode_data_dir}/all_parsed_decodes.txt"
+                        future = executor.submit(buildSpotRuns, all_dec_fn, store_fn, mode_conf.freq_hz, submode["name"], f"{run_dir}/{freq}_{submode['name']}")
+                        futures[future] = mode_conf
+
+                for future in concurrent.futures.as_completed(futures):
+                    mode_conf = futures[future]
+                    dec_cnt, shard_spot_cnt, shard_runs = future.result()
+                    runs.extend(shard_runs)
+                    self.logger.info(f"Completed processing [{dec_cnt}] decode messages for Freq: [{mode_conf.freq_khz}] kHz  Submode: [{mode_conf.submode['name']}]. Reported [{shard_spot_cnt}] new spots.")
+
+            run_files = [open(run_fn, "r") for run_fn in runs]
+            try:
+                merged = heapq.merge(*run_files)
 
-        # arrange by timestamp, freq, .....
-        spots.sort()
-        
-        if not print_only:
-            archiveFile(self.spot_log_fn, f"{self.archive_dir}/spots", ARCHIVE_METHOD_TRUNCATE)
-            writeStringsToFile(self.spot_log_fn, spots, False)
-        else:
-            # Moved here so printing out the sorted result
-            for spot in spots:
-                print (spot, end="")
+                if not print_only:
+                    archiveFile(self.spot_log_fn, f"{self.archive_dir}/spots", ARCHIVE_METHOD_COMPRESS)
+                    with open(self.spot_log_fn, "w") as spot_file:
+                        for spot in merged:
+                            spot_file.write(spot)
+                            spot_cnt += 1
+                else:
+                    # Moved here so printing out the sorted result
+                    for spot in merged:
+                        print (spot, end="")
+                        spot_cnt += 1
+            finally:
+                for run_file in run_files:
+                    run_file.close()
 
-        self.logger.info(f"Completed rebuilding spot log, located [{len(spots)}] spots.")
+        self.logger.info(f"Completed rebuilding spot log, located [{spot_cnt}] spots.")
 
         return 0
 
-    def rebuildAllDecodes(self, print_only: bool=True):
+    def rebuildAllDecodes(self, print_only: bool=True, full: bool=False):
 
         rec = self.loadDecoderPid()
 
@@ -961,44 +2359,88 @@ class Js8DecodingControl:
             sys.exit(0)
 
 
-        self.logger.info("Rebuilding 'all_parsed_decodes' by reparsing all archived JS8 decode files...")
-        
-        for freq in self.freq_list:
-            js8_parser = Js8Parser(freq, "usb")
+        self.logger.info("Rebuilding 'all_parsed_decodes' by reparsing new / changed archived JS8 decode files...")
+        store = self.openDecodeStore()
 
-            for submode in self.submodes:
-                
-                # Create a Decoder Hanlding thread.
-                #dh_thread = threading.Thread(target=js8DecoderHandler, args=(freq, submode,), daemon=True)
-                mode_conf = ModeConfig(freq, submode, self.data_dir, self.mcast_addr)
-                
-                dec_files = findFile(mode_conf.mode_dec_proc_dir, r"\.decode$", 2, True)
+        workers = self.decode_workers if self.decode_workers > 0 else None
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        
+            for freq in self.freq_list:
+                for submode in self.submodes:
+                    
+                    mode_conf = ModeConfig(freq, submode, self.data_dir, self.mcast_addr)
+                    
+                    # Without a manifest we can't tell which decodes are already in 'all_parsed_decodes' so reparse them all.
+                    manifest_fn = f"{mode_conf.mode_data_dir}/{DECODE_MANIFEST_FN.format(decode_store=self.decode_store)}"
+                    mode_full = full or (not os.path.exists(manifest_fn))
+                    manifest = {} if mode_full else loadManifest(manifest_fn)
+
+                    dec_files = findFile(mode_conf.mode_dec_proc_dir, r"\.decode$", 2, True)
+                    changed = [dec_fn for dec_fn in dec_files if not isManifestCurrent(manifest, f"{mode_conf.mode_dec_proc_dir}/{dec_fn}", PARSER_VERSION)]
+                    # Previously parsed files whose decodes are to be replaced (ie changed or parsed by an older parser version)
+                    replaced = {dec_fn for dec_fn in changed if dec_fn in manifest}
+
+                    self.logger.info(f"Freq: [{mode_conf.freq_khz}] kHz  Submode: [{mode_conf.submode['name']}] [{len(changed)}] of [{len(dec_files)}] decode files to be parsed.")
+
+                    if (not changed) and (not mode_full):
+                        continue
+
+                    # Reparse across the pool in batches, results come back in decode file order
+                    batches = []
+                    for i in range(0, len(changed), DEFAULT_REPARSE_BATCH):
+                        batches.append([f"{mode_conf.mode_dec_proc_dir}/{dec_fn}" for dec_fn in changed[i:i + DEFAULT_REPARSE_BATCH]])
+
+                    dec_msgs = []
+                    entries = {}
+                    for results in executor.map(parseDecodeFiles, [freq] * len(batches), batches):
+                        for entry, parsedMsgs in results:
+                            entries[entry["file"]] = entry
+
+                            for msg in parsedMsgs:
+                                dec_msgs.append(msg)
+                                if print_only:
+                                    print(json.dumps(msg))
+
+                    self.logger.info(f"Completed processing [{len(dec_msgs)}] decode messages for Freq: [{mode_conf.freq_khz}] kHz  Submode: [{mode_conf.submode['name']}]...")
+
+                    if not print_only:
+                        if store is not None:
+                            if mode_full:
+                                store.replaceDecodes(dec_msgs, mode_conf.freq_hz, mode_conf.submode["name"])
+                            else:
+                                store.replaceDecodeFiles(dec_msgs, replaced, mode_conf.freq_hz, mode_conf.submode["name"])
+                        else:
+                            all_dec_fn = f"{mode_conf.mode_data_dir}/all_parsed_decodes.txt";
+
+                            if mode_full or replaced:
+                                self.rewriteAllDecodes(all_dec_fn, dec_msgs, None if mode_full else replaced)
+                            else:
+                                appendJsonAtomic(dec_msgs, all_dec_fn)
+
+                        manifest.update(entries)
+                        writeManifest(manifest, manifest_fn)
 
-                dec_msgs = []
+        return 0
 
-                for dec_fn in dec_files:
-                    decode_ffp = f"{mode_conf.mode_dec_proc_dir}/{dec_fn}"
-                    parsedMsgs = js8_parser.processJs8DecodeFile(decode_ffp, None)
+        
+    def rewriteAllDecodes(self, all_dec_fn:str, dec_msgs:list, replaced:set=None):
+        # Rewrites 'all_parsed_decodes' keeping the existing decodes not from a replaced decode file (none are kept if 
+        # replaced is None), followed by dec_msgs. The new file is swapped in once complete, the old one (and its 
+        # sealed segments) archived.
+        tmp_fn = f"{all_dec_fn}.tmp"
 
-                    if (parsedMsgs and (len(parsedMsgs) > 0)):
+        with open(tmp_fn, "w") as file:
+            if (replaced is not None) and logExists(all_dec_fn):
+                for msg in iterJson(all_dec_fn):
+                    if os.path.basename(msg.get("decode_file") or "") not in replaced:
+                        file.write(f"{json.dumps(msg)}\n")
 
-                        for msg in parsedMsgs:
-                            dec_msgs.append(msg)
-                            if print_only:
-                                print(json.dumps(msg))
-                            
+            for msg in dec_msgs:
+                file.write(f"{json.dumps(msg, default=jsonDefault)}\n")
 
-                self.logger.info(f"Completed processing [{len(dec_msgs)}] decode messages for Freq: [{mode_conf.freq_khz}] kHz  Submode: [{mode_conf.submode['name']}]...")
-
-        
-                if not print_only:
-                    all_dec_fn = f"{mode_conf.mode_data_dir}/all_parsed_decodes.txt";
-        
-                    archiveFile(all_dec_fn, f"{self.archive_dir}/alldecodes")
-                    appendJson(dec_msgs, all_dec_fn)            
-    
-
-        return 0
+        archiveLogSegments(all_dec_fn, f"{self.archive_dir}/alldecodes")
+        archiveFile(all_dec_fn, f"{self.archive_dir}/alldecodes", ARCHIVE_METHOD_COMPRESS)
+        os.replace(tmp_fn, all_dec_fn)
 
         
     #####################################################################
@@ -1115,8 +2557,13 @@ class Js8DecodingControl:
 
         recs = []
 
+        # In "wide" recording mode only one recorder per frequency is required.
+        rec_submodes = self.submodes
+        if (self.rec_mode == REC_MODE_WIDE):
+            rec_submodes = [SM_WIDE]
+
         for freq in self.freq_list:
-            for submode in self.submodes:
+            for submode in rec_submodes:
                 mode_conf = ModeConfig(freq, submode, self.data_dir, self.mcast_addr)
                 js8_rec = Js8Recorder(mode_conf)
                 rec = js8_rec.start()
@@ -1168,12 +2615,79 @@ class Js8DecodingControl:
 ## Helper / Utils functions
 #################################################################################
 
+def timestampOrder(dec_lists:list):
+    # The decodes of each list (ie a frequency's submodes) merged in timestamp order. Each list is sorted first as its
+    # decodes are written in the order the slots were decoded, not heard (the decode pool's deadline order and backlog 
+    # catch up). The sort is stable (slot order kept) and cheap as the lists are mostly in order.
+    for dec_msgs in dec_lists:
+        dec_msgs.sort(key=lambda dec: dec["timestamp"])
+
+    return heapq.merge(*dec_lists, key=lambda dec: dec["timestamp"])
+
 def generateSpot(dec):
         if (dec["spot"] and dec["is_valid"]):
             return f"{dec['record_time']} {dec['db']:>5} {dec['dt']:>4} {dec['js8mode']} {dec['freq']/1000000:>9} {dec['callsign']:>9} {dec['locator']:>4} ~ {dec['msg']}"
 
         return None
 
+def spotRecord(dec):
+    # Spot as handed to the PSKReporter uploader (only for decodes generateSpot() spots)
+    return {"callsign": dec["callsign"], "locator": dec["locator"], "freq": dec["freq"], "dial_freq": dec["dial_freq"],
+            "snr": dec["db"], "mode": "JS8", "timestamp": dec["timestamp"]}
+
+def buildSpotRuns(all_dec_fn:str, store_fn:str, freq_hz:int, submode:str, run_prefix:str, run_size:int=DEFAULT_SPOT_RUN_SIZE):
+    # rebuild-spots worker (runs in a separate process): streams a frequency / submode's decodes, writing its spots 
+    # out as sorted runs of at most run_size spots. Returns (decodes read, spots found, run file names).
+    if store_fn is not None:
+        store = Js8DecodeStore(store_fn)
+        decodes = store.iterQuery(dial_freqs=[freq_hz], submodes=[submode], spots_only=True)
+    elif logExists(all_dec_fn):
+        decodes = iterJson(all_dec_fn)
+    else:
+        decodes = []
+
+    dec_cnt = 0
+    spot_cnt = 0
+    runs = []
+    spots = []
+
+    def writeRun():
+        spots.sort()
+        run_fn = f"{run_prefix}_{len(runs)}.run"
+        writeStringsToFile(run_fn, spots, False)
+        runs.append(run_fn)
+        spots.clear()
+
+    for dec in decodes:
+        dec_cnt += 1
+        spot = generateSpot(dec)
+        if (spot):
+            spots.append(f"{spot}\n")
+            spot_cnt += 1
+            if len(spots) >= run_size:
+                writeRun()
+
+    if spots:
+        writeRun()
+
+    if store_fn is not None:
+        store.close()
+
+    return dec_cnt, spot_cnt, runs
+
+def parseDecodeFiles(freq_khz:int, decode_ffps:list):
+    # rebuild-alldecodes worker (runs in a separate process): parses a batch of decode files.
+    # Returns [(manifest entry, [decode dict, ...]), ...] in the order given.
+    js8_parser = Js8Parser(freq_khz, "usb")
+
+    results = []
+    for decode_ffp in decode_ffps:
+        entry = manifestEntry(decode_ffp, PARSER_VERSION)
+        parsedMsgs = js8_parser.processJs8DecodeFile(decode_ffp, None)
+        results.append((entry, [msg.toDict() for msg in parsedMsgs]))
+
+    return results
+
 def processArgs(parser):
 
     parser = argparse.ArgumentParser(description="KA9Q-Radio Js8 Decoding Controler.")
@@ -1183,11 +2697,41 @@ def processArgs(parser):
     # Used by Processes (rebuild-spots, rebuild-alldecodes) allowing to print data only and not update. 
     #   Note: Decoders need to be stopped otherwise to allow updating of spots/alldecode files.
     parser.add_argument("-po", "--print-only", action="store_true", help="The action to execute (e.g., 'start', 'stop', 'status')")
+    parser.add_argument("--full", action="store_true", help="rebuild-alldecodes: reparse every decode file, rather than only those new / changed (or parsed by an older parser) since the last rebuild.")
 
     parser.add_argument("-f", "--freq", type=int, nargs='+', default=FREQ_LIST, help="Limit recording processes to 1 or more frequencies. Frquency is that of the radio dial frequency in Hz. If ommited then all standard js8call frequencies will be used.")
     parser.add_argument("-m", "--mode", type=str, default="usb", help="Radio Mode (usb / lsb).")
     parser.add_argument("-sm", "--sub-mode", type=str, nargs='+', default=SUBMODES_BYNAME,  help="Limit the recording process per frequency to a specific set of 1 or more JS7 'sub-modes' (slow, norm, fast, turbo).")
     parser.add_argument("-d", "--data-dir", type=str, default=DEFAULT_DATA_DIR, help="Data directory for storing (recordings, decodes, logs etc).")
+    parser.add_argument("-rm", "--rec-mode", type=str, choices=REC_MODES, default=REC_MODE_SUBMODE, help="Recording mode: 'submode' runs a pcmrecord per frequency and submode, 'wide' runs one pcmrecord per frequency and slices each submode's windows from it. Use the same value for both 'record' and 'decode'.")
+    parser.add_argument("-i", "--ingest", type=str, choices=INGESTS, default=INGEST_PCMRECORD, help="Decoder audio source: 'pcmrecord' decodes wav files written by the 'record' process, 'rtp' joins the PCM multicast group directly (no 'record' process required).")
+    parser.add_argument("-w", "--decode-workers", type=int, default=DEFAULT_DECODE_WORKERS, help="Number of concurrent 'js8' decodes across all frequencies and submodes (0 = one per CPU core).")
+    parser.add_argument("--discovery", type=str, choices=DISCOVERIES, default=DISCOVERY_WATCH, help="How new recordings are found: 'watch' reacts to file events as soon as a recording is finished, 'scan' scans the rec folders every 15secs.")
+    parser.add_argument("--archive-decodes", action=argparse.BooleanOptionalAction, default=True, help="Keep the raw 'js8' output of recordings with decodes in the 'decode/done' folders (required by 'rebuild-alldecodes').")
+    parser.add_argument("--rtp-port", type=int, default=DEFAULT_RTP_PORT, help="RTP port of the PCM multicast stream (used by '--ingest rtp').")
+    parser.add_argument("--sample-rate", type=int, default=DEFAULT_SAMPLE_RATE, help="Sample rate of the PCM multicast stream (used by '--ingest rtp').")
+    parser.add_argument("--rtp-payload-type", type=str, action="append", metavar="PT=ENCODING", help=f"RTP payload type of the PCM multicast stream and its encoding ({', '.join(RTP_ENCODINGS)}), may be repeated. Packets of other payload types are rejected. If not given the first payload type seen per SSRC is taken as s16be (used by '--ingest rtp').")
+    parser.add_argument("--history-max-activities", type=int, default=DEFAULT_HISTORY_MAX_ACTIVITIES, help="Number of completed callsign activities kept in memory by the decoder, older activity is paged out to 'callsign_history.sqlite' in the data directory.")
+    parser.add_argument("--history-max-incomplete", type=int, default=DEFAULT_HISTORY_MAX_INCOMPLETE, help="Number of expired incomplete activities kept in memory per frequency before being paged out to disk.")
+    parser.add_argument("--decode-store", type=str, choices=DECODE_STORES, default=DECODE_STORE_JSONL, help="Where parsed decodes are kept: 'jsonl' appends to each submode's 'all_parsed_decodes.txt', 'sqlite' writes to an indexed 'all_parsed_decodes.sqlite' in the data directory. Use the same value for 'decode' and the rebuild processes.")
+    parser.add_argument("--checkpoint-interval", type=int, default=DEFAULT_CHECKPOINT_INTERVAL, help="Seconds between snapshots of the decoder's callsign / activity state (in 'checkpoint' of the data directory), frames since the last snapshot are replayed on restart. 0 disables checkpointing.")
+    parser.add_argument("--aggregator-shards", type=int, default=DEFAULT_AGGREGATOR_SHARDS, help="Number of threads the frequencies are spread over for processing decoded frames (callsign / activity history), each frequency is only ever processed by one (0 = one per frequency).")
+    parser.add_argument("--spot-fsync", type=str, choices=SPOT_FSYNCS, default=SPOT_FSYNC_NONE, help=f"When the spot log is fsync'ed: 'none' leaves it to the OS, 'batch' after every batch of spots written, 'interval' at most every {SPOT_FSYNC_INTERVAL_SECS} secs.")
+    parser.add_argument("--spot-log-shared", action="store_true", help="Take the cross process 'spot.lock' when writing the spot log, only needed if another process (ie a second decoder) also writes to it.")
+    parser.add_argument("--spot-log-rotate", action="store_true", help="Also rotate the spot log at '--segment-mb' / '--segment-hours', it's copied to 'archive/spots' (then compressed) and truncated. Only use if nothing else (ie 'pskreporter-sender') tails the spot log.")
+    parser.add_argument("--segment-mb", type=int, default=DEFAULT_SEGMENT_BYTES // (1024 * 1024), help="Size (MB) at which 'all_parsed_decodes.txt' (and with '--spot-log-rotate' the spot log) is rotated and compressed. 0 disables.")
+    parser.add_argument("--segment-hours", type=int, default=DEFAULT_SEGMENT_AGE // 3600, help="Age (hours) at which 'all_parsed_decodes.txt' (and with '--spot-log-rotate' the spot log) is rotated and compressed. 0 disables.")
+    parser.add_argument("--decode-stagger", type=float, default=DEFAULT_DECODE_STAGGER, help="Fraction (0 - 1) of a slot the frequencies' decodes are staggered across, so they don't all start at the slot end (0 = no stagger). Decodes are always run earliest deadline first.")
+    parser.add_argument("--backlog-policy", type=str, choices=BACKLOG_POLICIES, default=DEFAULT_BACKLOG_POLICY, help="When decoding falls behind, recordings more than '--max-slot-age' slots past their deadline are: 'defer' moved to a low priority catch-up lane, 'drop' discarded, 'keep' decoded as normal.")
+    parser.add_argument("--max-slot-age", type=int, default=DEFAULT_MAX_SLOT_AGE, help="Number of (the submode's) slots a queued recording can be past its deadline before '--backlog-policy' applies.")
+    parser.add_argument("--max-band-spool", type=int, default=DEFAULT_MAX_BAND_SPOOL, help="Max recordings queued per frequency, the oldest are discarded beyond this (0 = unbounded).")
+    parser.add_argument("--adaptive-depth", action="store_true", help=f"Adjust each band's js8 decode depth (default {DEFAULT_DECODE_DEPTH}) from the extra frames each depth finds and the CPU headroom, rather than always decoding at depth {DEFAULT_DECODE_DEPTH}.")
+    parser.add_argument("--min-depth", type=int, default=DEFAULT_MIN_DEPTH, help="Lowest decode depth used by '--adaptive-depth'.")
+    parser.add_argument("--max-depth", type=int, default=DEFAULT_MAX_DEPTH, help="Highest decode depth used by '--adaptive-depth'.")
+    parser.add_argument("--energy-gate", action="store_true", help="Skip running 'js8' on recordings with nothing above the noise floor (ie empty bands at night).")
+    parser.add_argument("--gate-margin", type=float, default=DEFAULT_GATE_MARGIN, help="Noise standard deviations a signal must be above the noise floor (in its bandwidth) for '--energy-gate' to decode the recording, scaled to dB per submode. Lower to catch weaker signals.")
+    parser.add_argument("--js8-server", type=str, help="Command starting a long lived js8 decoder server (see ka9q_js8Worker), one is kept per decode worker rather than running 'js8' per recording. Falls back to running 'js8' per recording if it can't be started as a server.")
+    parser.add_argument("--js8-scratch-dir", type=str, default=DEFAULT_JS8_SCRATCH_DIR, help="Scratch folder (ideally tmpfs) shared by the js8 decoder servers, each worker has its own folder in it.")
     parser.add_argument("-ma", "--mcast-addr", type=str, default=DEFAULT_MCAST_ADDR, help="Enable verbose output")
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
     parser.add_argument("--aprsis", action="store_true", help="Enables processing received APRSIS commands (ie position reporting)")
@@ -1196,6 +2740,15 @@ def processArgs(parser):
     parser.add_argument("--aprs-user", type=str, help="Enables processing APRSIS commands (ie position reporting)")
     parser.add_argument("--aprs-passcode", type=str, help="APRSIS password (see https://apps.magicbug.co.uk/passcode/)")
     parser.add_argument("--aprs-reporter", type=str, help="Callsign to be used as the reporter.")
+    parser.add_argument("--aprs-position-ttl", type=int, default=DEFAULT_POSITION_TTL, help="Secs a callsign's repeated position (same grid) is not resent to APRSIS.")
+    parser.add_argument("--pskreporter", action="store_true", help="Upload spots directly to PSKReporter (instead of via 'pskreporter-sender' tailing the spot log).")
+    parser.add_argument("--psk-callsign", type=str, help="Receiver callsign reported to PSKReporter.")
+    parser.add_argument("--psk-locator", type=str, help="Receiver 6 character grid locator reported to PSKReporter.")
+    parser.add_argument("--psk-antenna", type=str, help="Receiver antenna description reported to PSKReporter.")
+    parser.add_argument("--psk-host", type=str, default=DEFAULT_PSK_HOST, help="PSKReporter Host name / IP")
+    parser.add_argument("--psk-port", type=int, default=DEFAULT_PSK_PORT, help="PSKReporter UDP Port")
+    parser.add_argument("--psk-interval", type=int, default=DEFAULT_PSK_INTERVAL, help="Secs between uploads to PSKReporter, a callsign is reported at most once per band per interval.")
+    parser.add_argument("--aprs-position-interval", type=int, default=DEFAULT_POSITION_INTERVAL, help="Min secs between position reports for a callsign (after an initial burst).")
     
     args = parser.parse_args()
 
@@ -1217,7 +2770,23 @@ def initAprsReporter(args):
         log_fn = f"{args.data_dir}/aprsis_frames.log"
         return APRSReporter(reporter=args.aprs_reporter, 
                             user=args.aprs_user, passcode=args.aprs_passcode, 
-                            host=args.aprs_host, port=args.aprs_port, log_fn=log_fn)
+                            host=args.aprs_host, port=args.aprs_port, log_fn=log_fn,
+                            position_ttl=args.aprs_position_ttl, position_interval=args.aprs_position_interval)
+
+    return None
+
+def initPskReporter(args):
+
+    if (args.pskreporter):
+
+        if isEmpty(args.psk_callsign):
+            logError("PSKReporter uploading enabled - PSK Callsign is required.", -1)
+
+        if isEmpty(args.psk_locator):
+            logError("PSKReporter uploading enabled - PSK Locator is required.", -1)
+
+        return PSKReporterSender(callsign=args.psk_callsign, locator=args.psk_locator, antenna=args.psk_antenna,
+                                 host=args.psk_host, port=args.psk_port, interval=args.psk_interval)
 
     return None
 
@@ -1230,8 +2799,24 @@ def main():
     parser = argparse.ArgumentParser(description="KA9Q-Radio Js8 Decoding Controler.")
     args = processArgs(parser)
         
+    try:
+        rtp_payload_types = parsePayloadTypes(args.rtp_payload_type)
+    except ValueError as e:
+        parser.error(str(e))
+
     aprsReporter = initAprsReporter(args)
-    js8_dc = Js8DecodingControl(args.freq, args.sub_mode, args.data_dir, args.mcast_addr, aprsReporter=aprsReporter)
+    pskReporter = initPskReporter(args) if (args.process == "decode") else None
+    js8_dc = Js8DecodingControl(args.freq, args.sub_mode, args.data_dir, args.mcast_addr, aprsReporter=aprsReporter, rec_mode=args.rec_mode,
+                                ingest=args.ingest, rtp_port=args.rtp_port, sample_rate=args.sample_rate, rtp_payload_types=rtp_payload_types,
+                                decode_workers=args.decode_workers, discovery=args.discovery, archive_decodes=args.archive_decodes,
+                                history_max_activities=args.history_max_activities, history_max_incomplete=args.history_max_incomplete,
+                                decode_store=args.decode_store, checkpoint_interval=args.checkpoint_interval, aggregator_shards=args.aggregator_shards,
+                                pskReporter=pskReporter, spot_fsync=args.spot_fsync, spot_log_shared=args.spot_log_shared, spot_log_rotate=args.spot_log_rotate,
+                                segment_bytes=args.segment_mb * 1024 * 1024, segment_age=args.segment_hours * 3600,
+                                js8_server=args.js8_server, js8_scratch_dir=args.js8_scratch_dir, decode_stagger=args.decode_stagger,
+                                backlog_policy=args.backlog_policy, max_slot_age=args.max_slot_age, max_band_spool=args.max_band_spool,
+                                adaptive_depth=args.adaptive_depth, min_depth=args.min_depth, max_depth=args.max_depth,
+                                energy_gate=args.energy_gate, gate_margin=args.gate_margin)
 
     glogger.info(f"Performing Process: [{args.process}] Action: [{args.action}]")
 
@@ -1261,7 +2846,7 @@ def main():
         js8_dc.rebuildSpots(args.print_only);
 
     elif (args.process == "rebuild-alldecodes"):
-        js8_dc.rebuildAllDecodes(args.print_only);
+        js8_dc.rebuildAllDecodes(args.print_only, args.full);
     
     elif (args.process == "rebuild-history"):
         js8_dc.rebuildCallsignHistory(args.print_only, aprsReporter=aprsReporter);
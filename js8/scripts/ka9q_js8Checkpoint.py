@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Checkpointing of the decoder's frame processing state.
+##
+##   A compact snapshot of the state is written periodically, and every frame
+##   processed since is appended to a write-ahead log (WAL). On startup the
+##   snapshot is loaded and only the WAL tail is replayed.
+##
+##   Each snapshot starts a new WAL generation and records that generation, so
+##   a crash part way through a snapshot only means replaying an extra WAL file.
+##   Each frame aggregator shard logs to its own WAL ("frames_<gen>_<shard>.wal")
+##   under its own lock, so the shards never wait on each other.
+##
+################################################################################
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from contextlib import ExitStack
+from pathlib import Path
+from ka9q_js8Utils import jsonDefault, iterJson
+
+DEFAULT_CHECKPOINT_INTERVAL = 300
+
+SNAPSHOT_FN = "snapshot.json"
+WAL_FN_REX = re.compile(r"^frames_(\d+)_(\d+)\.wal$")
+
+logger = logging.getLogger(__name__)
+
+
+#################################################################################
+# Js8Checkpoint Class
+#################################################################################
+
+class Js8Checkpoint:
+
+    checkpoint_dir: str
+    interval: int
+    shards: int
+    gen: int
+
+    def __init__(self, checkpoint_dir:str, snapshot_func, interval:int=DEFAULT_CHECKPOINT_INTERVAL, shards:int=1):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.checkpoint_dir = checkpoint_dir
+        self.snapshot_func = snapshot_func
+        self.interval = interval
+        self.shards = shards
+
+        # A shard's frame processing is serialised with snapshots (which take every shard's lock) so a snapshot 
+        # never sees a half processed frame
+        self.locks = [threading.RLock() for _ in range(shards)]
+        self.wals = [None] * shards
+        self.gen = 0
+        self.running = False
+
+        Path(checkpoint_dir).mkdir(parents=True, exist_ok=True)
+
+    def walFn(self, gen:int, shard:int):
+        return f"{self.checkpoint_dir}/frames_{gen}_{shard}.wal"
+
+    def walFiles(self):
+        # [(gen, WAL file)] oldest generation first
+        wal_fns = []
+        for fn in os.listdir(self.checkpoint_dir):
+            match = WAL_FN_REX.match(fn)
+            if match:
+                wal_fns.append((int(match.group(1)), int(match.group(2)), f"{self.checkpoint_dir}/{fn}"))
+
+        return [(gen, wal_fn) for gen, _, wal_fn in sorted(wal_fns)]
+
+    def allShards(self):
+        # Context holding every shard's lock
+        stack = ExitStack()
+        for lock in self.locks:
+            stack.enter_context(lock)
+
+        return stack
+
+    def openWals(self, gen:int):
+        # With all the shard locks held
+        for shard in range(self.shards):
+            if self.wals[shard] is not None:
+                self.wals[shard].close()
+            self.wals[shard] = open(self.walFn(gen, shard), "a")
+
+    def restore(self, load_func, replay_func):
+        # Loads the last snapshot (load_func(state)) then replays the frames logged since (replay_func(frame, watermark)).
+        # A fresh snapshot is then taken, so the replayed WAL is not replayed again. Returns frames replayed.
+        started = time.time()
+        snapshot_fn = f"{self.checkpoint_dir}/{SNAPSHOT_FN}"
+
+        with self.allShards():
+            gen = 0
+            if os.path.exists(snapshot_fn):
+                with open(snapshot_fn, "r") as file:
+                    snapshot = json.load(file)
+
+                load_func(snapshot["state"])
+                gen = snapshot["wal_gen"]
+                self.logger.info(f"Loaded checkpoint snapshot: [{snapshot_fn}] WAL Generation: [{gen}]")
+
+            replayed = 0
+            gens = [gen]
+            for wal_gen, wal_fn in self.walFiles():
+                if wal_gen < gen:
+                    continue
+
+                for entry in iterJson(wal_fn):
+                    replay_func(entry["frame"], entry["watermark"])
+                    replayed += 1
+                gens.append(wal_gen)
+
+            self.gen = max(gens)
+            self.openWals(self.gen)
+
+            self.snapshot()
+
+        self.logger.info(f"Restored frame processing state, replayed [{replayed}] frames in [{time.time() - started:.1f}] secs.")
+        return replayed
+
+    def processFrame(self, shard:int, process_func, frame, watermark:int=None):
+        # Logs the frame (as received, before processing alters it) and its watermark to the shard's WAL then processes it
+        with self.locks[shard]:
+            wal = self.wals[shard]
+            wal.write(f"{json.dumps({'frame': frame, 'watermark': watermark}, default=jsonDefault)}\n")
+            wal.flush()
+            process_func(frame, watermark)
+
+    def snapshot(self):
+        with self.allShards():
+            new_gen = self.gen + 1
+
+            # Frames from here on go to the new WAL generation which the snapshot will refer to
+            self.openWals(new_gen)
+
+            state = self.snapshot_func()
+            snapshot_fn = f"{self.checkpoint_dir}/{SNAPSHOT_FN}"
+            tmp_fn = f"{snapshot_fn}.tmp"
+            with open(tmp_fn, "w") as file:
+                json.dump({"wal_gen": new_gen, "created": int(time.time()), "state": state}, file, default=jsonDefault)
+                file.flush()
+                os.fsync(file.fileno())
+
+            os.replace(tmp_fn, snapshot_fn)
+            self.gen = new_gen
+
+            # Now covered by the snapshot
+            for wal_gen, wal_fn in self.walFiles():
+                if wal_gen < new_gen:
+                    os.remove(wal_fn)
+
+        self.logger.debug(f"Wrote checkpoint snapshot: [{snapshot_fn}] WAL Generation: [{new_gen}]")
+
+    def close(self):
+        with self.allShards():
+            self.running = False
+            for shard in range(self.shards):
+                if self.wals[shard] is not None:
+                    self.wals[shard].close()
+                    self.wals[shard] = None
+
+    def start(self):
+        self.running = True
+
+        while True:
+            time.sleep(self.interval)
+            if not self.running:
+                break
+
+            try:
+                self.snapshot()
+            except Exception as e:
+                self.logger.error(f"Failed to write checkpoint snapshot. {e}")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Indexed SQLite storage for parsed decodes.
+##
+##   Alternative to the per frequency/submode "all_parsed_decodes.txt" JSON
+##   line files. Each decode is stored as its JSON record alongside indexed
+##   columns (timestamp, callsign, dial_freq, submode, spot) so the rebuild
+##   processes and ad-hoc queries read index ranges rather than reparsing
+##   every record.
+##
+##   The decode_file column holds just the decode file's name (the record has
+##   its full path), so the decodes of a reparsed decode file are matched
+##   however the data folder was given.
+##
+################################################################################
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from ka9q_js8Parser import Js8Decode
+from ka9q_js8Utils import jsonDefault
+
+DECODE_STORE_JSONL = "jsonl"
+DECODE_STORE_SQLITE = "sqlite"
+DECODE_STORES = [DECODE_STORE_JSONL, DECODE_STORE_SQLITE]
+
+DECODE_STORE_FN = "all_parsed_decodes.sqlite"
+
+# Schema version (PRAGMA user_version): 1 - decode_file holds the decode file name rather than its path
+DECODE_STORE_VERSION = 1
+
+DECODE_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS decode (
+    id INTEGER PRIMARY KEY,
+    timestamp INTEGER,
+    callsign TEXT,
+    dial_freq INTEGER,
+    submode TEXT,
+    spot INTEGER,
+    is_valid INTEGER,
+    decode_file TEXT,
+    rec TEXT
+);
+CREATE INDEX IF NOT EXISTS decode_timestamp ON decode (timestamp);
+CREATE INDEX IF NOT EXISTS decode_callsign ON decode (callsign, timestamp);
+CREATE INDEX IF NOT EXISTS decode_band ON decode (dial_freq, submode, timestamp);
+CREATE INDEX IF NOT EXISTS decode_spot ON decode (timestamp) WHERE spot = 1 AND is_valid = 1;
+CREATE INDEX IF NOT EXISTS decode_decode_file ON decode (decode_file);
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def decodeRow(msg, submode:str) -> tuple:
+    decode_file = os.path.basename(msg["decode_file"]) if msg["decode_file"] else None
+    return (msg["timestamp"], msg["callsign"], msg["dial_freq"], submode, 1 if msg["spot"] else 0, 1 if msg["is_valid"] else 0,
+            decode_file, json.dumps(msg, default=jsonDefault))
+
+
+#################################################################################
+# Js8DecodeStore Class
+#################################################################################
+
+class Js8DecodeStore:
+
+    db_fn: str
+
+    def __init__(self, db_fn:str):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.db_fn = db_fn
+        self.lock = threading.Lock()
+
+        # Shared by the decode workers, so access is serialised by self.lock
+        self.db = sqlite3.connect(db_fn, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(DECODE_STORE_SCHEMA)
+        self.upgrade()
+        self.db.commit()
+
+    def upgrade(self):
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # Stores written with the decode file's path
+            self.db.create_function("basename", 1, lambda fn: os.path.basename(fn) if fn else fn, deterministic=True)
+            updated = self.db.execute("UPDATE decode SET decode_file = basename(decode_file) WHERE decode_file LIKE '%/%'").rowcount
+            self.logger.info(f"Upgraded decode store: [{self.db_fn}], [{updated}] decode file names.")
+
+        self.db.execute(f"PRAGMA user_version = {DECODE_STORE_VERSION}")
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def addDecodes(self, msgs:list, submode:str):
+        # All decodes of a decode pass (ie one recording) are written in a single transaction
+        if not msgs:
+            return
+
+        rows = [decodeRow(msg, submode) for msg in msgs]
+
+        with self.lock:
+            with self.db:
+                self.db.executemany("INSERT INTO decode (timestamp, callsign, dial_freq, submode, spot, is_valid, decode_file, rec) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def replaceDecodes(self, msgs:list, dial_freq:int, submode:str):
+        # Used by "rebuild-alldecodes" to swap out all decodes for a frequency / submode in one transaction
+        rows = [decodeRow(msg, submode) for msg in msgs]
+
+        with self.lock:
+            with self.db:
+                self.db.execute("DELETE FROM decode WHERE dial_freq = ? AND submode = ?", (dial_freq, submode))
+                self.db.executemany("INSERT INTO decode (timestamp, callsign, dial_freq, submode, spot, is_valid, decode_file, rec) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def replaceDecodeFiles(self, msgs:list, decode_fns:list, dial_freq:int, submode:str):
+        # Used by an incremental "rebuild-alldecodes" to swap out the decodes of reparsed decode files (names, as the
+        # same name is used by each submode) for a frequency / submode in one transaction
+        rows = [decodeRow(msg, submode) for msg in msgs]
+
+        with self.lock:
+            with self.db:
+                self.db.executemany("DELETE FROM decode WHERE decode_file = ? AND dial_freq = ? AND submode = ?",
+                                    [(os.path.basename(decode_fn), dial_freq, submode) for decode_fn in decode_fns])
+                self.db.executemany("INSERT INTO decode (timestamp, callsign, dial_freq, submode, spot, is_valid, decode_file, rec) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def query(self, dial_freqs:list=None, submodes:list=None, start_ts:int=None, end_ts:int=None, callsign:str=None, spots_only:bool=False):
+        # Returns the matching decodes (Js8Decode) in timestamp order. dial_freqs are in Hz, end_ts is exclusive.
+        sql, params = self.querySql(dial_freqs, submodes, start_ts, end_ts, callsign, spots_only)
+
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+
+        return [Js8Decode.fromDict(json.loads(row[0])) for row in rows]
+
+    def iterQuery(self, dial_freqs:list=None, submodes:list=None, start_ts:int=None, end_ts:int=None, callsign:str=None, spots_only:bool=False):
+        # As query() but streams the decodes (as dicts) rather than loading them all. Only for use by a single thread.
+        sql, params = self.querySql(dial_freqs, submodes, start_ts, end_ts, callsign, spots_only)
+
+        for row in self.db.execute(sql, params):
+            yield json.loads(row[0])
+
+    def querySql(self, dial_freqs:list=None, submodes:list=None, start_ts:int=None, end_ts:int=None, callsign:str=None, spots_only:bool=False):
+        where = []
+        params = []
+
+        if dial_freqs:
+            where.append(f"dial_freq IN ({','.join('?' * len(dial_freqs))})")
+            params.extend(dial_freqs)
+
+        if submodes:
+            where.append(f"submode IN ({','.join('?' * len(submodes))})")
+            params.extend(submodes)
+
+        if start_ts is not None:
+            where.append("timestamp >= ?")
+            params.append(start_ts)
+
+        if end_ts is not None:
+            where.append("timestamp < ?")
+            params.append(end_ts)
+
+        if callsign is not None:
+            where.append("callsign = ?")
+            params.append(callsign)
+
+        if spots_only:
+            where.append("spot = 1 AND is_valid = 1")
+
+        sql = "SELECT rec FROM decode"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY timestamp, id"
+
+        return sql, params
+
+    def count(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM decode").fetchone()[0]
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Adaptive js8 decode depth.
+##
+##   Tracks, per band, the decode wall time and the frames decoded at each
+##   depth ("-d") used. Every few recordings a band is decoded one depth above
+##   or below its current depth (a probe) so the extra frames a depth level
+##   yields can be measured. A band's depth is then:
+##
+##     - lowered if the box is overloaded (CPU or the band's decodes taking
+##       too long), the band is quiet, or its current depth isn't finding
+##       enough extra frames over the depth below it
+##     - raised if there's CPU headroom and the depth above finds enough
+##       extra frames
+##
+##   always within the configured min / max depth.
+##
+################################################################################
+
+import logging
+import psutil
+import threading
+import time
+
+DEFAULT_MIN_DEPTH = 1
+DEFAULT_MAX_DEPTH = 3
+
+# Every PROBE_EVERY recordings a band is decoded one depth up / down (alternately) to measure its yield
+PROBE_EVERY = 10
+# Depth is reconsidered every ADJUST_EVERY recordings decoded at the band's depth, once each depth has MIN_SAMPLES
+ADJUST_EVERY = 20
+MIN_SAMPLES = 5
+# Weight of the latest recording in the frames / wall time averages
+EWMA_ALPHA = 0.1
+
+# Extra frames per recording a depth level must find to be raised to, and below which it's dropped (the gap
+# stops a band flapping between depths on noise). Frames per recording below which a band is quiet.
+RAISE_FRAME_GAIN = 0.3
+LOWER_FRAME_GAIN = 0.1
+QUIET_FRAMES = 0.1
+
+# CPU (%) above which the box is overloaded, and below which there is headroom to raise depth
+CPU_HIGH = 90
+CPU_LOW = 70
+CPU_SAMPLE_SECS = 5
+# A band's decodes are taking too long if wall time is over this fraction of the recording's duration
+MAX_DECODE_FRACTION = 0.25
+
+logger = logging.getLogger(__name__)
+
+
+#################################################################################
+# Js8DepthController Class
+#################################################################################
+
+class Js8DepthController:
+
+    min_depth: int
+    max_depth: int
+    bands: dict
+
+    def __init__(self, initial_depth:int, min_depth:int=DEFAULT_MIN_DEPTH, max_depth:int=DEFAULT_MAX_DEPTH):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.initial_depth = max(min_depth, min(max_depth, initial_depth))
+
+        self.bands = {}
+        self.lock = threading.Lock()
+        self.cpu = 0.0
+
+    def bandState(self, band) -> dict:
+        # With the lock held
+        state = self.bands.get(band)
+        if state is None:
+            # Per depth: [samples, frames per recording, wall time / recording duration]
+            state = {"depth": self.initial_depth, "decodes": 0, "probe_up": True, "since_adjust": 0,
+                     "levels": {depth: [0, 0.0, 0.0] for depth in range(self.min_depth, self.max_depth + 1)}}
+            self.bands[band] = state
+
+        return state
+
+    def depthFor(self, band) -> int:
+        # Depth to decode the band's next recording at
+        with self.lock:
+            state = self.bandState(band)
+            state["decodes"] += 1
+            depth = state["depth"]
+
+            if (state["decodes"] % PROBE_EVERY) == 0:
+                state["probe_up"] = not state["probe_up"]
+                probe = depth + 1 if state["probe_up"] else depth - 1
+                if (probe < self.min_depth) or (probe > self.max_depth):
+                    probe = depth - 1 if state["probe_up"] else depth + 1
+                if self.min_depth <= probe <= self.max_depth:
+                    return probe
+
+            return depth
+
+    def record(self, band, depth:int, frames:int, wall_secs:float, duration:int):
+        # Called once a recording (of duration secs) decoded at depth has been parsed
+        with self.lock:
+            state = self.bandState(band)
+            level = state["levels"].get(depth)
+            if level is None:
+                return
+
+            alpha = EWMA_ALPHA if level[0] > 0 else 1.0
+            level[0] += 1
+            level[1] += alpha * (frames - level[1])
+            level[2] += alpha * ((wall_secs / duration) - level[2])
+
+            if depth == state["depth"]:
+                state["since_adjust"] += 1
+                if state["since_adjust"] >= ADJUST_EVERY:
+                    state["since_adjust"] = 0
+                    self.adjust(band, state)
+
+    def frameGain(self, state:dict, depth:int):
+        # Extra frames per recording depth finds over the depth below it, None if not known (yet)
+        lower = state["levels"].get(depth - 1)
+        upper = state["levels"].get(depth)
+        if (lower is None) or (upper is None) or (lower[0] < MIN_SAMPLES) or (upper[0] < MIN_SAMPLES):
+            return None
+
+        return upper[1] - lower[1]
+
+    def adjust(self, band, state:dict):
+        # With the lock held
+        depth = state["depth"]
+        level = state["levels"][depth]
+        gain_down = self.frameGain(state, depth)
+        gain_up = self.frameGain(state, depth + 1)
+        overloaded = (self.cpu >= CPU_HIGH) or (level[2] >= MAX_DECODE_FRACTION)
+
+        new_depth = depth
+        reason = None
+        if depth > self.min_depth:
+            if overloaded:
+                new_depth, reason = depth - 1, "overloaded"
+            elif level[1] < QUIET_FRAMES:
+                new_depth, reason = depth - 1, "quiet"
+            elif (gain_down is not None) and (gain_down < LOWER_FRAME_GAIN):
+                new_depth, reason = depth - 1, f"depth {depth} only finding [{gain_down:.2f}] extra frames"
+
+        if (new_depth == depth) and (depth < self.max_depth) and (not overloaded) and (self.cpu < CPU_LOW) \
+                and (gain_up is not None) and (gain_up >= RAISE_FRAME_GAIN):
+            new_depth, reason = depth + 1, f"depth {depth + 1} finding [{gain_up:.2f}] extra frames"
+
+        if new_depth != depth:
+            state["depth"] = new_depth
+            self.logger.info(f"Band: [{band}] decode depth [{depth}] -> [{new_depth}] ({reason}). CPU: [{self.cpu:.0f}]% "
+                             f"Frames: [{level[1]:.2f}] Decode Time: [{level[2] * 100:.0f}]% of recording.")
+
+    def depths(self) -> dict:
+        with self.lock:
+            return {band: state["depth"] for band, state in self.bands.items()}
+
+    def start(self):
+        self.logger.info(f"Adaptive decode depth started, Depth: [{self.initial_depth}] Min: [{self.min_depth}] Max: [{self.max_depth}]")
+
+        while True:
+            try:
+                cpu = psutil.cpu_percent(interval=CPU_SAMPLE_SECS)
+                with self.lock:
+                    self.cpu = cpu
+            except Exception as e:
+                self.logger.error(f"Failed to sample CPU load. {e}")
+                time.sleep(CPU_SAMPLE_SECS)
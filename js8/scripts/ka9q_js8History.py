@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Callsign history store.
+##
+##   Keeps the most recent completed activity per callsign in memory (in the
+##   same shape as the original "callsign_history.db" records) and pages older
+##   activity out to a SQLite database once the memory budget is reached. The
+##   callsign summaries (last heard etc) are also kept in the database so they
+##   survive a restart of the decoder.
+##
+##   Without a database file the store is unbounded and memory only (as used by
+##   "rebuild-history").
+##
+################################################################################
+
+import json
+import logging
+import sqlite3
+import threading
+
+from collections import deque
+from datetime import datetime, timezone
+from ka9q_js8Parser import Js8Decode
+from ka9q_js8Utils import jsonDefault
+
+DEFAULT_HISTORY_MAX_ACTIVITIES = 20000
+DEFAULT_HISTORY_MAX_INCOMPLETE = 2000
+
+# Activity is paged out (and committed) in batches of this fraction of max_activities, rather than one at a time
+HISTORY_SPILL_FRACTION = 0.1
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS callsign (
+    callsign TEXT PRIMARY KEY,
+    last_freq INTEGER,
+    first_ts INTEGER,
+    last_ts INTEGER
+);
+CREATE TABLE IF NOT EXISTS activity (
+    id TEXT PRIMARY KEY,
+    callsign TEXT,
+    dial_freq INTEGER,
+    timestamp INTEGER,
+    ymd TEXT,
+    hour TEXT,
+    rec TEXT
+);
+CREATE INDEX IF NOT EXISTS activity_callsign_hour ON activity (callsign, ymd, hour);
+CREATE TABLE IF NOT EXISTS incomplete (
+    id TEXT PRIMARY KEY,
+    dial_freq INTEGER,
+    last_ts INTEGER,
+    rec TEXT
+);
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def activityDateHour(act_rec:dict):
+    # <YYYY-MM-DD>, <HH> of the activity (UTC) as used by the "activity_YMD" tree
+    act_dt = datetime.fromtimestamp(act_rec["timestamp"], tz=timezone.utc)
+    return act_dt.strftime("%Y-%m-%d"), act_dt.strftime("%H")
+
+def addActivityByDateTimeFreq(cs_rec:dict, act_rec:dict):
+    # <Callsig>::<YYYY-MM-DD>::<HH>::<DIAL_FREQ>
+    dt_YMD, dt_H = activityDateHour(act_rec)
+    dtH_recs = cs_rec["activity_YMD"].setdefault(dt_YMD, {}).setdefault(dt_H, {})
+    dtH_recs.setdefault(act_rec["dial_freq"], []).append(act_rec)
+
+def dumpActivity(act_rec:dict) -> str:
+    return json.dumps(act_rec, default=jsonDefault)
+
+def loadActivity(rec:str) -> dict:
+    act_rec = json.loads(rec)
+    act_rec["msgs"] = [Js8Decode.fromDict(msg) for msg in act_rec["msgs"]]
+    return act_rec
+
+
+#################################################################################
+# Js8CallsignHistory Class
+#################################################################################
+
+class Js8CallsignHistory:
+
+    db_fn: str
+    max_activities: int
+    max_incomplete: int
+
+    # callsign -> {last_freq, first_ts, last_ts, activity, activity_YMD} (in memory activity only)
+    callsigns: dict
+
+    def __init__(self, db_fn:str=None, max_activities:int=DEFAULT_HISTORY_MAX_ACTIVITIES, max_incomplete:int=DEFAULT_HISTORY_MAX_INCOMPLETE):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.db_fn = db_fn
+        self.max_activities = max_activities
+        self.max_incomplete = max_incomplete
+        self.spill_batch = max(1, int(max_activities * HISTORY_SPILL_FRACTION))
+
+        self.callsigns = {}
+        # In memory activity, oldest first, as (callsign, act_rec)
+        self.recent = deque()
+        self.lock = threading.RLock()
+
+        self.db = None
+        if db_fn is not None:
+            self.db = sqlite3.connect(db_fn, check_same_thread=False)
+            self.db.executescript(HISTORY_SCHEMA)
+            self.db.commit()
+            self.logger.info(f"Callsign history store: [{db_fn}] Max Activities: [{max_activities}] Max Incomplete: [{max_incomplete}]")
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.commit()
+                self.db.close()
+                self.db = None
+
+    def loadSummary(self, callsign:str):
+        if self.db is None:
+            return None
+
+        row = self.db.execute("SELECT last_freq, first_ts, last_ts FROM callsign WHERE callsign = ?", (callsign,)).fetchone()
+        if row is None:
+            return None
+
+        return {"last_freq": row[0], "first_ts": row[1], "last_ts": row[2], "activity": [], "activity_YMD": {}}
+
+    def addActivity(self, callsign:str, act_rec:dict):
+        with self.lock:
+            cs_rec = self.callsigns.get(callsign)
+            if cs_rec is None:
+                cs_rec = self.loadSummary(callsign)
+
+            if cs_rec is None:
+                cs_rec = {"last_freq": act_rec["dial_freq"], "first_ts": act_rec["timestamp"], "last_ts": act_rec["timestamp"], "activity": [], "activity_YMD": {}}
+            elif (act_rec["timestamp"] > cs_rec["last_ts"]):
+                cs_rec["last_ts"] = act_rec["timestamp"]
+
+            self.callsigns[callsign] = cs_rec
+
+            cs_rec["activity"].append(act_rec)
+            addActivityByDateTimeFreq(cs_rec, act_rec)
+
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO callsign (callsign, last_freq, first_ts, last_ts) VALUES (?, ?, ?, ?)",
+                                (callsign, cs_rec["last_freq"], cs_rec["first_ts"], cs_rec["last_ts"]))
+
+                self.recent.append((callsign, act_rec))
+                if len(self.recent) >= self.max_activities + self.spill_batch:
+                    self.spillActivities(len(self.recent) - self.max_activities)
+
+            return cs_rec
+
+    def spillActivities(self, count:int):
+        # Page the oldest in memory activity out to the database, along with the callsign summaries written since 
+        # the last batch (one commit). As activity is added in order the oldest overall is also the oldest in its 
+        # callsign's lists.
+        rows = []
+        for _ in range(count):
+            callsign, act_rec = self.recent.popleft()
+            cs_rec = self.callsigns[callsign]
+            cs_rec["activity"].remove(act_rec)
+
+            dt_YMD, dt_H = activityDateHour(act_rec)
+            dtYMD_recs = cs_rec["activity_YMD"][dt_YMD]
+            band_recs = dtYMD_recs[dt_H][act_rec["dial_freq"]]
+            band_recs.remove(act_rec)
+            if not band_recs:
+                del dtYMD_recs[dt_H][act_rec["dial_freq"]]
+                if not dtYMD_recs[dt_H]:
+                    del dtYMD_recs[dt_H]
+                    if not dtYMD_recs:
+                        del cs_rec["activity_YMD"][dt_YMD]
+
+            # Only the summary is kept in memory for callsigns with no recent activity
+            if not cs_rec["activity"]:
+                del self.callsigns[callsign]
+
+            rows.append((act_rec["id"], callsign, act_rec["dial_freq"], act_rec["timestamp"], dt_YMD, dt_H, dumpActivity(act_rec)))
+
+        self.db.executemany("INSERT OR REPLACE INTO activity (id, callsign, dial_freq, timestamp, ymd, hour, rec) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        self.db.commit()
+        self.logger.debug(f"Paged [{len(rows)}] activities out to: [{self.db_fn}]")
+
+    def trimIncomplete(self, dial_freq:int, incomp_recs:list):
+        # Page the oldest incomplete activity for the band out to the database once over budget (in place).
+        if self.db is None:
+            return
+
+        with self.lock:
+            count = len(incomp_recs) - self.max_incomplete
+            if count <= 0:
+                return
+
+            rows = [(act_rec["id"], dial_freq, act_rec["last_ts"], dumpActivity(act_rec)) for act_rec in incomp_recs[:count]]
+            del incomp_recs[:count]
+
+            self.db.executemany("INSERT OR REPLACE INTO incomplete (id, dial_freq, last_ts, rec) VALUES (?, ?, ?, ?)", rows)
+            self.db.commit()
+
+    def lastHeard(self, callsign:str):
+        # Returns {last_freq, first_ts, last_ts} for the callsign or None if never heard
+        with self.lock:
+            cs_rec = self.callsigns.get(callsign)
+            if cs_rec is None:
+                cs_rec = self.loadSummary(callsign)
+
+            if cs_rec is None:
+                return None
+
+            return {"last_freq": cs_rec["last_freq"], "first_ts": cs_rec["first_ts"], "last_ts": cs_rec["last_ts"]}
+
+    def activityByHour(self, callsign:str, dt_YMD:str, dt_H:str) -> dict:
+        # Returns {dial_freq: [act_rec, ...]} heard for the callsign within the hour (UTC), oldest first. Paged out
+        # activity is older than any still in memory so comes first (that also in memory, ie replayed, is skipped).
+        with self.lock:
+            band_recs = {}
+
+            cs_rec = self.callsigns.get(callsign)
+            hour_recs = cs_rec["activity_YMD"].get(dt_YMD, {}).get(dt_H, {}) if (cs_rec is not None) else {}
+
+            if self.db is not None:
+                mem_ids = {act_rec["id"] for recs in hour_recs.values() for act_rec in recs}
+                rows = self.db.execute("SELECT id, dial_freq, rec FROM activity WHERE callsign = ? AND ymd = ? AND hour = ? ORDER BY timestamp",
+                                       (callsign, dt_YMD, dt_H))
+                for act_id, dial_freq, rec in rows:
+                    if act_id not in mem_ids:
+                        band_recs.setdefault(dial_freq, []).append(loadActivity(rec))
+
+            for dial_freq, recs in hour_recs.items():
+                band_recs.setdefault(dial_freq, []).extend(recs)
+
+            return band_recs
+
+    def toDict(self) -> dict:
+        # Full history in the "callsign_history.db" format, including any activity paged out to the database.
+        with self.lock:
+            if self.db is None:
+                return self.callsigns
+
+            hist = {}
+            for callsign, last_freq, first_ts, last_ts in self.db.execute("SELECT callsign, last_freq, first_ts, last_ts FROM callsign"):
+                hist[callsign] = {"last_freq": last_freq, "first_ts": first_ts, "last_ts": last_ts, "activity": [], "activity_YMD": {}}
+
+            # Activity replayed from a checkpoint WAL may be both paged out and in memory (until paged out again)
+            mem_ids = {act_rec["id"] for _, act_rec in self.recent}
+            rows = self.db.execute("SELECT id, callsign, rec FROM activity ORDER BY rowid").fetchall()
+            for act_id, callsign, rec in rows:
+                if act_id in mem_ids:
+                    continue
+
+                cs_rec = hist[callsign]
+                act_rec = loadActivity(rec)
+                cs_rec["activity"].append(act_rec)
+                addActivityByDateTimeFreq(cs_rec, act_rec)
+
+            for callsign, mem_rec in self.callsigns.items():
+                cs_rec = hist[callsign]
+                for act_rec in mem_rec["activity"]:
+                    cs_rec["activity"].append(act_rec)
+                    addActivityByDateTimeFreq(cs_rec, act_rec)
+
+            return hist
+
+    def toSnapshot(self, ref) -> dict:
+        # In memory history for a checkpoint snapshot, ref(act_rec) adds the activity to the snapshot and returns its id
+        with self.lock:
+            callsigns = {}
+            for callsign, cs_rec in self.callsigns.items():
+                callsigns[callsign] = {"last_freq": cs_rec["last_freq"], "first_ts": cs_rec["first_ts"], "last_ts": cs_rec["last_ts"],
+                                       "activity": [ref(act_rec) for act_rec in cs_rec["activity"]]}
+
+            return {"callsigns": callsigns, "recent": [[callsign, ref(act_rec)] for callsign, act_rec in self.recent]}
+
+    def loadSnapshot(self, snapshot:dict, activities:dict):
+        # Restores the in memory history from toSnapshot(), activities maps the activity ids back to their records
+        with self.lock:
+            self.callsigns.clear()
+            for callsign, snap_rec in snapshot["callsigns"].items():
+                cs_rec = {"last_freq": snap_rec["last_freq"], "first_ts": snap_rec["first_ts"], "last_ts": snap_rec["last_ts"], "activity": [], "activity_YMD": {}}
+                for act_id in snap_rec["activity"]:
+                    act_rec = activities[act_id]
+                    cs_rec["activity"].append(act_rec)
+                    addActivityByDateTimeFreq(cs_rec, act_rec)
+
+                self.callsigns[callsign] = cs_rec
+
+            self.recent = deque((callsign, activities[act_id]) for callsign, act_id in snapshot["recent"])
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Minimal Linux inotify wrapper (via ctypes, no extra dependencies).
+##
+################################################################################
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO    = 0x00000080
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+
+IN_CLOEXEC = 0o2000000
+
+EVENT_HDR = struct.Struct("iIII")
+
+logger = logging.getLogger(__name__)
+
+
+class Inotify:
+
+    fd: int
+    watches: dict
+
+    def __init__(self):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+
+        self.watches = {}
+
+    def addWatch(self, path:str, mask:int=(IN_CLOSE_WRITE | IN_MOVED_TO)):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_add_watch failed for: [{path}] {os.strerror(err)}")
+
+        self.watches[wd] = path
+        return wd
+
+    def read(self, timeout:float=None):
+        # Returns a list of (dir, name, mask), empty if timed out.
+        rlist, _, _ = select.select([self.fd], [], [], timeout)
+        if not rlist:
+            return []
+
+        buf = os.read(self.fd, 65536)
+
+        events = []
+        pos = 0
+        while pos + EVENT_HDR.size <= len(buf):
+            wd, mask, cookie, name_len = EVENT_HDR.unpack_from(buf, pos)
+            pos += EVENT_HDR.size
+            name = buf[pos:pos + name_len].rstrip(b"\0").decode(errors="replace")
+            pos += name_len
+
+            events.append((self.watches.get(wd), name, mask))
+
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
@@ -5,11 +5,17 @@ import argparse
 import json
 import logging
 import re
+import sys
 from datetime import datetime
+from enum import IntEnum
 from js8py import Js8
 from js8py.frames import Js8FrameHeartbeat, Js8FrameCompound, Js8FrameCompoundDirected, Js8FrameDirected, Js8FrameDataCompressed, Js8FrameData
 
 RADIO_MODE_LIST = ["usb", "lsb"]
+
+# Bump when a parser change alters the parsed output, so "rebuild-alldecodes" reparses the decode files it affects.
+PARSER_VERSION = 1
+
 # Freq for which we DO NOT want to perform validation (ie 10m CB)
 IGNORE_FRAME_VALIDATION_FREQ = [ 27246 ]
 
@@ -34,20 +40,136 @@ VALID_GROUP_CALLSIGN_REX=r"^[@][A-Z0-9\/]{0,3}[\/]?[A-Z0-9\/]{0,3}[\/]?[A-Z0-9\/
 
 GRID4_REX=r"^\w{2}\d{2}"
 
+# Precompiled versions of the above, used for every decoded line
+VALID_CALLSIGN_RE = re.compile(VALID_CALLSIGN_REX)
+VALID_GROUP_CALLSIGN_RE = re.compile(VALID_GROUP_CALLSIGN_REX)
+GRID4_RE = re.compile(GRID4_REX)
+
+SPOT_FRAME_CLASSES = (Js8FrameHeartbeat, Js8FrameCompound)
+
+MODE_JS8 = "JS8"
+
 glogger = logging.getLogger(__name__)
 
+
+class Js8ThreadType(IntEnum):
+    MIDDLE = 0
+    FIRST = 1
+    LAST = 2
+    SINGLE = 3
+
+
+#################################################################################
+# Js8Decode Class
+#################################################################################
+
+class Js8Decode:
+
+    # Compact record for a single decoded frame. Decodes are held in memory for a long time by the frame 
+    # processor so slots are used rather than a dict per frame, and the repeated enum like fields 
+    # (mode, frame_class, thread_type) share a single interned value. Supports dict style access so 
+    # existing users (ie dec["callsign"]) work unchanged, and converts to / from the JSON line format.
+
+    # Order of the fields in the JSON line format
+    FIELDS = ("timestamp", "record_time", "mode", "dial_freq", "offset", "freq", "thread_type", "js8mode",
+              "callsign", "locator", "callsign_to", "msg", "db", "dt", "spot", "cmd", "snr",
+              "is_valid", "validation_errors", "frame_class", "raw_msg", "decode_file")
+
+    __slots__ = FIELDS
+
+    def __init__(self, **kwargs):
+        for field in self.FIELDS:
+            setattr(self, field, kwargs.get(field))
+
+    def __getitem__(self, key):
+        try:
+            if key == "validation_errors":
+                return self.validation_errors if self.validation_errors is not None else {}
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def addValidationError(self, name:str, value=True):
+        if self.validation_errors is None:
+            self.validation_errors = {}
+        self.validation_errors[name] = value
+
+    def toDict(self):
+        out = {}
+        for field in self.FIELDS:
+            out[field] = getattr(self, field)
+
+        if out["validation_errors"] is None:
+            out["validation_errors"] = {}
+
+        # decode_file is only present when the frame came from a (archived) decode file
+        if out["decode_file"] is None:
+            del out["decode_file"]
+
+        return out
+
+    def copy(self):
+        dec = Js8Decode()
+        for field in self.FIELDS:
+            setattr(dec, field, getattr(self, field))
+
+        if dec.validation_errors is not None:
+            dec.validation_errors = dict(dec.validation_errors)
+
+        return dec
+
+    @classmethod
+    def fromDict(cls, dd:dict):
+        dec = cls(**dd)
+
+        if dec.mode is not None:
+            dec.mode = sys.intern(dec.mode)
+        if dec.frame_class is not None:
+            dec.frame_class = sys.intern(dec.frame_class)
+        if dec.thread_type is not None:
+            dec.thread_type = internThreadType(dec.thread_type)
+        if not dec.validation_errors:
+            dec.validation_errors = None
+
+        return dec
+
+
+def internThreadType(thread_type):
+    try:
+        return Js8ThreadType(int(thread_type))
+    except ValueError:
+        return thread_type
+
 class Js8Parser:
 
     freq_khz: int
     freq_hz: int
     radio_mode: str
     record_time: datetime
+    record_timestamp: int
+    record_time_fmt: str
 
     decoderRegex = re.compile(" ?<Decode(Started|Debug|Finished)>")
     #decodeMsgRegex = r"(?P<ts>\d{6})\s+(?P<snr>[+-]?\d{2})\s+(?P<dt>[+-]?\d{1,2}\.\d)\s+(?P<offset>\d{,4})\s+(?P<mode>\w)\s+(?P<msg>.*)\s+\d.*"
 
     def __init__(self, freq_khz=None, radio_mode=None, record_time=None):
         self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.js8 = Js8()
         self.set_freq_khz(freq_khz)
         self.set_radio_mode(radio_mode)
         self.set_record_time(record_time)
@@ -69,13 +191,24 @@ class Js8Parser:
     def set_record_time(self, record_time:datetime):
         self.record_time = record_time
 
+        # These are the same for every line from a recording so only format them once
+        if record_time is not None:
+            self.record_timestamp = int(record_time.timestamp())
+            self.record_time_fmt = record_time.strftime("%Y/%m/%d %H:%M:%S")
+        else:
+            self.record_timestamp = None
+            self.record_time_fmt = None
+
     #######################################################################
 
     def matches(self, txt, rexpat):
         if (txt is None):
             return False
         
-        match = re.search(rexpat, txt)
+        if isinstance(rexpat, re.Pattern):
+            match = rexpat.search(txt)
+        else:
+            match = re.search(rexpat, txt)
 
         if match:
             return True
@@ -86,10 +219,13 @@ class Js8Parser:
         if (not callsign):
             return False
 
-        return self.matches(callsign, VALID_CALLSIGN_REX)
+        return VALID_CALLSIGN_RE.search(callsign) is not None
     
     def validateGroupCallsign(self, callsign):
-        return self.matches(callsign, VALID_GROUP_CALLSIGN_REX)
+        if (callsign is None):
+            return False
+
+        return VALID_GROUP_CALLSIGN_RE.search(callsign) is not None
 
     def validateGrid(self, grid, grid_rex):
         return self.matches(grid, grid_rex)
@@ -97,7 +233,8 @@ class Js8Parser:
     def parse(self, raw_msg):
         try:
             msg = raw_msg.rstrip()
-            if self.decoderRegex.match(msg):
+            # Only lines starting with "<" or " " can be decoder status lines
+            if (msg[:1] in "< ") and self.decoderRegex.match(msg):
                 return None
             if msg.startswith(" EOF on input file"):
                 return None
@@ -108,81 +245,72 @@ class Js8Parser:
             if (self.record_time is None):
                 raise ValueError("record_time has not been set.")
 
-            frame = Js8().parse_message(msg)
+            frame = self.js8.parse_message(msg)
 
             is_spot = False
-            if ((isinstance(frame, Js8FrameHeartbeat) or isinstance(frame, Js8FrameCompound)) and frame.grid):
+            if (isinstance(frame, SPOT_FRAME_CLASSES) and frame.grid):
                 is_spot = True
 
-            timestamp = int(self.record_time.timestamp())
-            fmt_dt = self.record_time.strftime("%Y/%m/%d %H:%M:%S")
-
-            out = {
-                #"timestamp": frame.timestamp,
-                "timestamp": timestamp,
-                "record_time": fmt_dt,
-                "mode": "JS8",
-                "dial_freq": self.freq_hz,
-                "offset": int(frame.freq),
-                "freq": self.freq_hz + frame.freq,
-                "thread_type": frame.thread_type,
-                "js8mode": frame.mode,
-                "callsign": None,
-                "locator": None,
-                "callsign_to": None,
-                "msg": str(frame),
-                "db": frame.db,
-                "dt": frame.dt,
-                "spot": is_spot,
-                "cmd": None,
-                "snr": None,
+            out = Js8Decode(
+                #timestamp=frame.timestamp,
+                timestamp=self.record_timestamp,
+                record_time=self.record_time_fmt,
+                mode=MODE_JS8,
+                dial_freq=self.freq_hz,
+                offset=int(frame.freq),
+                freq=self.freq_hz + frame.freq,
+                thread_type=internThreadType(frame.thread_type),
+                js8mode=frame.mode,
+                msg=str(frame),
+                db=frame.db,
+                dt=frame.dt,
+                spot=is_spot,
 
                 # Status/Debugging Fields
-                "is_valid": True,
-                "validation_errors": {},
-                "frame_class": frame.__class__.__name__,
-                "raw_msg": raw_msg,
-            }
+                is_valid=True,
+                frame_class=sys.intern(frame.__class__.__name__),
+                raw_msg=raw_msg,
+            )
 
 
             # Current Main Branch uses (callsign, callsign_from, callsign_to)
             if (hasattr(frame, 'callsign')):
-                out["callsign"] = frame.callsign
+                out.callsign = frame.callsign
 
             if (hasattr(frame, 'callsign_from')):
-                out["callsign"] = frame.callsign_from
+                out.callsign = frame.callsign_from
             
             if (hasattr(frame, 'callsign_to')):
-                out["callsign_to"] = frame.callsign_to
+                out.callsign_to = frame.callsign_to
 
             # Current Develop Branch restructured callsign to (source['callsign'] and destination['callsign'])
             if (hasattr(frame, 'source')):
-                out["callsign"] = frame.source['callsign']
+                out.callsign = frame.source['callsign']
         
             if (hasattr(frame, 'destination')):
-                out["callsign_to"] = frame.destination['callsign']
+                out.callsign_to = frame.destination['callsign']
                 
             if (hasattr(frame, 'grid')):
-                out["locator"] = frame.grid
+                out.locator = frame.grid
                 
             if (hasattr(frame, 'cmd')):
-                out["cmd"] = frame.cmd
+                out.cmd = frame.cmd
                 
             if (hasattr(frame, 'snr')):
-                out["snr"] = frame.snr
+                out.snr = frame.snr
                 
-            callsign = out["callsign"]
-            callsignTo = out["callsign_to"]
+            callsign = out.callsign
+            callsignTo = out.callsign_to
             validationErrors = {}
 
             # Some Validation for HAM Bands only:
             if (self.freq_khz not in (IGNORE_FRAME_VALIDATION_FREQ)):
                 if isinstance(frame, Js8FrameHeartbeat):
                     hasValidCallsign = self.validateCallsign(callsign)
-                    hasValidGrid = self.validateGrid(out["locator"], GRID4_REX)
+                    hasValidGrid = self.validateGrid(out.locator, GRID4_RE)
 
                     if ((not hasValidCallsign) or (not hasValidGrid)):
-                        out["spot"] = False
+                        out.spot = False
                         validationErrors = ({"hasValidCallsign": hasValidCallsign, "hasValidGrid": hasValidGrid})
 
                 elif  isinstance(frame, Js8FrameDirected):
@@ -190,14 +318,14 @@ class Js8Parser:
                     hasValidCallsignTo = self.validateCallsign(callsignTo) or self.validateGroupCallsign(callsignTo)
 
                     if ((not hasValidCallsign) or (not hasValidCallsignTo)):
-                        out["spot"] = False
+                        out.spot = False
                         validationErrors = ({"hasValidCallsign": hasValidCallsign, "hasValidCallsignTo": hasValidCallsignTo})
 
                 elif (isinstance(frame, Js8FrameCompound) or isinstance(frame, Js8FrameCompoundDirected)):
                     hasValidCallsign = self.validateCallsign(callsign) or self.validateGroupCallsign(callsign)
                 
                     if (not hasValidCallsign):
-                        out["spot"] = False
+                        out.spot = False
                         validationErrors = ({"hasValidCallsign": hasValidCallsign})
 
                 elif (isinstance(frame, Js8FrameData) or isinstance(frame, Js8FrameDataCompressed)):
@@ -207,16 +335,16 @@ class Js8Parser:
                     # Nothing to do here ???
 
                 else:
-                    out["spot"] = False
+                    out.spot = False
                     validationErrors = ({"unknownFrameClass": frame.__class__.__name__})
             
             # Apply this check to ALL callsign if available
             if ((callsign and (callsign.count("/") > 1)) or (callsignTo and (callsignTo.count("/") > 1))):
-               out["spot"] = False
+               out.spot = False
                validationErrors["hasValidCallsign"] = False
 
-            out["validation_errors"]=validationErrors
-            out["is_valid"] = (len(validationErrors) == 0)
+            out.validation_errors = validationErrors if validationErrors else None
+            out.is_valid = (len(validationErrors) == 0)
 
             return out
 
@@ -225,6 +353,24 @@ class Js8Parser:
             return None
 
 
+    # Batch version of parse() for processing many lines from the same recording (ie a decode file)
+    def parse_many(self, lines, record_time:datetime, freq_khz:int=None):
+
+        if freq_khz:
+            self.set_freq_khz(freq_khz)
+
+        self.set_record_time(record_time)
+
+        res = []
+        parse = self.parse
+        for line in lines:
+            out = parse(line)
+            if out:
+                res.append(out)
+
+        return res
+
+
     # Determines if the first part of the firstname confirms to "--jt" option used by recording utlising (ie pcmrecord).
     def processJTFilename(self, fn:str):
        
@@ -291,11 +437,9 @@ class Js8Parser:
         # Open and process the file line by line
         try:
             with open(js8decode_fn, "r") as file:
-                for line in file:
-                    out = self.parse(line)
-                    if out:
-                        out["decode_file"] = js8decode_fn
-                        res.append(out)
+                res = self.parse_many(file, self.record_time)
+                for out in res:
+                    out["decode_file"] = js8decode_fn
 
         except FileNotFoundError as e:
             raise FileNotFoundError(f"The file '{js8decode_fn}' was not found.") from e
@@ -304,6 +448,22 @@ class Js8Parser:
 
         return res
 
+    # Same as processJs8DecodeFile, but parses each line as it is read from the stream (ie a js8 stdout pipe)
+    # yielding the parsed messages as they are emitted. js8decode_fn is used for the JT filename details.
+    def processJs8DecodeStream(self, stream, js8decode_fn:str, record_time:datetime=None, freq_khz:int=None):
+
+        if freq_khz:
+            self.set_freq_khz(freq_khz)
+
+        self.set_record_time(record_time)
+
+        self.processJTFilename(js8decode_fn)
+
+        for line in stream:
+            out = self.parse(line)
+            if out:
+                yield out
+
 #################################################################################
 
 def processArgs():
@@ -340,12 +500,12 @@ def main():
         res = parser.processJs8DecodeFile(args.decode_file)
         #res = parser.processJs8DecodeFile(args.decode_file, record_time, args.freq)
         for msg in res:
-            print (json.dumps(msg))
+            print (json.dumps(msg.toDict()))
         
     elif (args.decode_line):
         res = parser.processJs8DecodeLine(args.decode_line, record_time)
         #res = parser.processJs8DecodeLine(args.decode_line, record_time, args.freq)
-        print (json.dumps(res))
+        print (json.dumps(res.toDict() if res else None))
     else:
         glogger.info("Nothing to do!  Did you specify either FILE or MSG option?")
 
@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Native RTP multicast ingest for KA9Q-Radio PCM streams.
+##
+##   Joins the radiod PCM multicast group (eg "js8-pcm.local"), demuxes the
+##   RTP stream by SSRC and cuts slot aligned audio windows in memory for each
+##   JS8 submode. Replaces running a "pcmrecord" process per frequency/submode.
+##
+##   Radiod's default PCM encoding for the channel is 16bit signed, big endian
+##   (RTP L16), mono. Radiod gives each encoding a (dynamic) RTP payload type,
+##   so unless the payload types are mapped to their encodings the first one
+##   seen for a SSRC is taken as that, and packets of any other type (ie the
+##   channel was changed to Opus) are rejected. Mapped encodings other than
+##   S16BE are converted to it.
+##
+##   The multicast socket is (re)opened until stopped, so the ingest rides out
+##   the network / mDNS name not being up yet.
+##
+##   numpy is only needed (imported) to convert mapped encodings other than
+##   S16BE.
+##
+################################################################################
+
+import logging
+import socket
+import struct
+import sys
+import time
+
+from array import array
+
+DEFAULT_RTP_PORT = 5004
+DEFAULT_SAMPLE_RATE = 12000
+
+RTP_VERSION = 2
+RTP_HEADER_LEN = 12
+
+# PCM encodings (as named by radiod) that can be ingested, and their bytes per sample
+ENCODING_S16BE = "s16be"
+ENCODING_S16LE = "s16le"
+ENCODING_F32LE = "f32le"
+RTP_ENCODINGS = {ENCODING_S16BE: 2, ENCODING_S16LE: 2, ENCODING_F32LE: 4}
+
+# Static (RFC 3551) payload type of stereo L16, never taken as the channel's (mono) PCM
+RTP_PT_L16_STEREO = 10
+
+# Secs to wait before reopening the multicast socket after it failed
+RTP_RETRY_SECS = 10
+
+# Re-anchor the RTP timestamp to wall clock if they drift more than this (eg radiod restarted)
+RTP_RESYNC_SECS = 2.0
+
+# Minimum portion of a slot that must have been received before it is handed to the decoders
+DEFAULT_MIN_FILL = 0.9
+
+logger = logging.getLogger(__name__)
+
+
+def toS16BE(payload:bytes, encoding:str) -> bytes:
+    # Converts the PCM payload to the 16bit big endian samples the slot cutter takes
+    if encoding == ENCODING_S16BE:
+        return payload
+
+    import numpy as np
+
+    if encoding == ENCODING_S16LE:
+        return np.frombuffer(payload, dtype="<i2").astype(">i2").tobytes()
+
+    if encoding == ENCODING_F32LE:
+        return (np.clip(np.frombuffer(payload, dtype="<f4"), -1.0, 1.0) * 32767).astype(">i2").tobytes()
+
+    return payload
+
+def parsePayloadTypes(entries:list) -> dict:
+    # ["<pt>=<encoding>", ...] as given on the command line to {pt: encoding}
+    payload_types = {}
+    for entry in entries or []:
+        pt, _, encoding = entry.partition("=")
+        encoding = encoding.strip().lower()
+        if (not pt.strip().isdigit()) or (encoding not in RTP_ENCODINGS):
+            raise ValueError(f"Invalid RTP payload type: [{entry}], expected <pt>=<{'|'.join(RTP_ENCODINGS)}>")
+        payload_types[int(pt)] = encoding
+
+    return payload_types
+
+def parseRtpPacket(pkt: bytes):
+    if len(pkt) < RTP_HEADER_LEN:
+        return None
+
+    b0, b1, seq, ts, ssrc = struct.unpack("!BBHII", pkt[:RTP_HEADER_LEN])
+
+    if (b0 >> 6) != RTP_VERSION:
+        return None
+
+    offset = RTP_HEADER_LEN + (4 * (b0 & 0x0F))
+
+    # Header extension
+    if b0 & 0x10:
+        if len(pkt) < offset + 4:
+            return None
+        ext_len = struct.unpack("!H", pkt[offset + 2:offset + 4])[0]
+        offset += 4 + (4 * ext_len)
+
+    end = len(pkt)
+
+    # Padding
+    if b0 & 0x20:
+        end -= pkt[-1]
+
+    if offset > end:
+        return None
+
+    return {
+        "pt": b1 & 0x7F,
+        "marker": bool(b1 & 0x80),
+        "seq": seq,
+        "timestamp": ts,
+        "ssrc": ssrc,
+        "payload": pkt[offset:end],
+    }
+
+
+#################################################################################
+# RtpSlotCutter Class
+#################################################################################
+
+class RtpSlotCutter:
+
+    ssrc: int
+    sample_rate: int
+    slots: dict
+
+    def __init__(self, ssrc:int, submodes:list, on_window, sample_rate:int=DEFAULT_SAMPLE_RATE, min_fill:float=DEFAULT_MIN_FILL):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.ssrc = ssrc
+        self.sample_rate = sample_rate
+        self.min_fill = min_fill
+        self.on_window = on_window
+
+        # Per submode: current slot index, its sample buffer (kept big endian as received) and samples received.
+        self.slots = {}
+        for submode in submodes:
+            self.slots[submode["name"]] = {"submode": submode, "slot_samples": submode["duration"] * sample_rate,
+                                           "index": None, "buf": None, "filled": 0}
+
+        self.anchor_sample = None
+        self.last_ts = None
+        self.ext_ts = 0
+
+    def reset(self):
+        self.anchor_sample = None
+        for slot in self.slots.values():
+            slot["index"] = None
+            slot["buf"] = None
+            slot["filled"] = 0
+
+    def sampleIndex(self, rtp_ts:int, now:float):
+        # Map the 32bit RTP timestamp onto an absolute sample count since the epoch, anchored
+        # to the wall clock on the first packet and unwrapped thereafter.
+        if self.anchor_sample is None:
+            self.anchor_sample = int(now * self.sample_rate)
+            self.last_ts = rtp_ts
+            self.ext_ts = 0
+        else:
+            diff = (rtp_ts - self.last_ts) & 0xFFFFFFFF
+            if diff >= 0x80000000:
+                diff -= 0x100000000
+            self.ext_ts += diff
+            self.last_ts = rtp_ts
+
+        sample = self.anchor_sample + self.ext_ts
+
+        if abs((sample / self.sample_rate) - now) > RTP_RESYNC_SECS:
+            self.logger.warning(f"SSRC: [{self.ssrc}] RTP timestamp drifted from wall clock, resynchronising.")
+            self.reset()
+            return self.sampleIndex(rtp_ts, now)
+
+        return sample
+
+    def emit(self, slot):
+        fill = slot["filled"] / slot["slot_samples"]
+        submode = slot["submode"]
+
+        if fill >= self.min_fill:
+            pcm = array("h")
+            pcm.frombytes(slot["buf"])
+            if sys.byteorder == "little":
+                pcm.byteswap()
+
+            slot_start = slot["index"] * submode["duration"]
+            self.on_window(self.ssrc, submode, slot_start, pcm.tobytes())
+        else:
+            self.logger.debug(f"SSRC: [{self.ssrc}] Submode: [{submode['name']}] dropping partial slot ({fill:.0%} received).")
+
+    def addSamples(self, rtp_ts:int, payload:bytes, now:float=None):
+        if now is None:
+            now = time.time()
+
+        first = self.sampleIndex(rtp_ts, now)
+        nsamples = len(payload) // 2
+
+        for slot in self.slots.values():
+            slot_samples = slot["slot_samples"]
+            pos = 0
+
+            # A packet may straddle a slot boundary so copy it in pieces
+            while pos < nsamples:
+                sample = first + pos
+                index = sample // slot_samples
+                offset = sample - (index * slot_samples)
+                count = min(nsamples - pos, slot_samples - offset)
+
+                if (slot["index"] is not None) and ((index < slot["index"]) or ((index == slot["index"]) and (slot["buf"] is None))):
+                    # Late packet for an already closed slot
+                    pos += count
+                    continue
+
+                if slot["index"] != index:
+                    if slot["buf"] is not None:
+                        self.emit(slot)
+
+                    slot["index"] = index
+                    slot["buf"] = bytearray(slot_samples * 2)
+                    slot["filled"] = 0
+
+                slot["buf"][offset * 2:(offset + count) * 2] = payload[pos * 2:(pos + count) * 2]
+                slot["filled"] += count
+                pos += count
+
+            # Close the slot as soon as its last sample has arrived rather than waiting for the next packet
+            if (slot["buf"] is not None) and ((first + nsamples) >= ((slot["index"] + 1) * slot_samples)):
+                self.emit(slot)
+                slot["buf"] = None
+                slot["filled"] = 0
+
+
+#################################################################################
+# Js8RtpIngest Class
+#################################################################################
+
+class Js8RtpIngest:
+
+    mcast_addr: str
+    port: int
+    ssrc_map: dict
+    cutters: dict
+
+    def __init__(self, mcast_addr:str, ssrc_map:dict, submodes:list, on_window, port:int=DEFAULT_RTP_PORT,
+                 sample_rate:int=DEFAULT_SAMPLE_RATE, iface_addr:str="0.0.0.0", payload_types:dict=None):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.mcast_addr = mcast_addr
+        self.port = port
+        self.iface_addr = iface_addr
+        self.ssrc_map = ssrc_map
+        self.running = False
+        self.sock = None
+
+        # {payload type: encoding}, if not given the payload type first seen per SSRC is taken as S16BE
+        self.payload_types = payload_types if payload_types else {}
+        self.ssrc_pt = {}
+        self.rejected_pts = set()
+
+        # on_window(key, submode, slot_start, pcm) where key is the ssrc_map value (ie freq_khz)
+        self.cutters = {}
+        for ssrc, key in ssrc_map.items():
+            self.cutters[ssrc] = RtpSlotCutter(ssrc, submodes,
+                                               lambda ssrc, submode, slot_start, pcm, key=key: on_window(key, submode, slot_start, pcm),
+                                               sample_rate=sample_rate)
+
+        self.stats = {"packets": 0, "unknown_ssrc": 0, "invalid": 0, "rejected_pt": 0}
+
+    def open(self):
+        group = socket.gethostbyname(self.mcast_addr)
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(("", self.port))
+
+        mreq = struct.pack("4s4s", socket.inet_aton(group), socket.inet_aton(self.iface_addr))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        sock.settimeout(1.0)
+
+        self.logger.info(f"Joined multicast group: [{self.mcast_addr}] ({group}) Port: [{self.port}] SSRCs: [{list(self.ssrc_map.keys())}]")
+        self.sock = sock
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def processPacket(self, pkt:bytes, now:float=None):
+        rtp = parseRtpPacket(pkt)
+        if rtp is None:
+            self.stats["invalid"] += 1
+            return
+
+        cutter = self.cutters.get(rtp["ssrc"])
+        if cutter is None:
+            self.stats["unknown_ssrc"] += 1
+            return
+
+        encoding = self.payloadEncoding(rtp["ssrc"], rtp["pt"])
+        if encoding is None:
+            self.stats["rejected_pt"] += 1
+            return
+
+        payload = rtp["payload"]
+        if (len(payload) % RTP_ENCODINGS[encoding]) != 0:
+            self.stats["invalid"] += 1
+            return
+
+        self.stats["packets"] += 1
+        cutter.addSamples(rtp["timestamp"], toS16BE(payload, encoding), now)
+
+    def payloadEncoding(self, ssrc:int, pt:int):
+        # Encoding of the SSRC's packets of payload type pt, None if they can't be ingested
+        if self.payload_types:
+            encoding = self.payload_types.get(pt)
+        else:
+            if (ssrc not in self.ssrc_pt) and (pt != RTP_PT_L16_STEREO):
+                self.ssrc_pt[ssrc] = pt
+                self.logger.info(f"SSRC: [{ssrc}] taking RTP payload type: [{pt}] as 16bit PCM ({ENCODING_S16BE}).")
+            encoding = ENCODING_S16BE if (self.ssrc_pt.get(ssrc) == pt) else None
+
+        if (encoding is None) and ((ssrc, pt) not in self.rejected_pts):
+            self.rejected_pts.add((ssrc, pt))
+            self.logger.warning(f"SSRC: [{ssrc}] rejecting packets of RTP payload type: [{pt}], not a known mono PCM encoding "
+                                f"(see --rtp-payload-type).")
+
+        return encoding
+
+    def receive(self):
+        while self.running:
+            try:
+                pkt = self.sock.recv(65536)
+            except socket.timeout:
+                continue
+
+            try:
+                self.processPacket(pkt)
+            except Exception as e:
+                self.logger.error(f"Error while processing RTP packet. {e}")
+
+    def start(self):
+        self.running = True
+
+        while self.running:
+            try:
+                self.open()
+                self.receive()
+            except OSError as e:
+                self.logger.error(f"RTP multicast socket for: [{self.mcast_addr}] Port: [{self.port}] failed ({e}), retrying in {RTP_RETRY_SECS}secs.")
+                time.sleep(RTP_RETRY_SECS)
+            finally:
+                self.close()
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Segmented (rotating) append only logs.
+##
+##   Once the log reaches a size or age it is sealed, renamed to a timestamped
+##   segment alongside the log, and compressed (gzip) in the background. The
+##   readers (iterJson / loadJson) read the segments followed by the log, so
+##   rotation is transparent to them.
+##
+##   Logs in a folder we can't create files in (ie "/var/log/js8.log") are
+##   instead sealed by a plain copy into a segment folder and truncated, the
+##   copy being compressed in the background.
+##
+##   A log's age is taken from its first record, so it carries over restarts.
+##
+################################################################################
+
+import concurrent.futures
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+from datetime import datetime, timezone
+from ka9q_js8Utils import compressSegment, jsonDefault, segmentFn, truncateFile, uncompressedSegments
+
+# Segment size (bytes) and age (secs) at which a log is rotated, 0 disables
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+DEFAULT_SEGMENT_AGE = 24 * 60 * 60
+
+# Record time a spot line starts with (UTC)
+SPOT_TIME_FMT = "%Y/%m/%d %H:%M:%S"
+
+logger = logging.getLogger(__name__)
+
+# Sealed segments are compressed one at a time by a single background thread
+compressor = None
+compressor_lock = threading.Lock()
+
+
+def compressInBackground(seg_fn:str):
+    global compressor
+
+    with compressor_lock:
+        if compressor is None:
+            compressor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="segment-compress")
+
+    compressor.submit(compressSegmentTask, seg_fn)
+
+def waitForCompression():
+    # Blocks until the segments sealed so far have been compressed
+    with compressor_lock:
+        if compressor is None:
+            return
+
+    compressor.submit(lambda: None).result()
+
+def compressSegmentTask(seg_fn:str):
+    try:
+        started = time.time()
+        gz_fn = compressSegment(seg_fn)
+        logger.debug(f"Compressed log segment: [{gz_fn}] in [{time.time() - started:.1f}] secs.")
+    except Exception as e:
+        logger.error(f"Failed to compress log segment: [{seg_fn}]. {e}")
+
+def recordTime(line:str):
+    # Time (secs since epoch) of a log record, the "timestamp" of a (JSON) decode or the time a spot line starts 
+    # with. None if it has neither.
+    try:
+        if line.startswith("{"):
+            return float(json.loads(line)["timestamp"])
+
+        return datetime.strptime(line[:len("YYYY/mm/dd HH:MM:SS")], SPOT_TIME_FMT).replace(tzinfo=timezone.utc).timestamp()
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+#################################################################################
+# Js8SegmentedLog Class
+#################################################################################
+
+class Js8SegmentedLog:
+
+    log_fn: str
+    max_bytes: int
+    max_age: int
+    seg_dir: str
+
+    def __init__(self, log_fn:str, max_bytes:int=DEFAULT_SEGMENT_BYTES, max_age:int=DEFAULT_SEGMENT_AGE, seg_dir:str=None):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.log_fn = log_fn
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.seg_dir = seg_dir
+
+        # Writes (and rotation) are serialised, the log may be shared by concurrent decodes
+        self.lock = threading.RLock()
+        self.file = None
+        self.segment_start = self.segmentStart()
+
+        # Segments sealed but not yet compressed when last stopped
+        for seg_fn in uncompressedSegments(self.segmentBase()):
+            compressInBackground(seg_fn)
+
+    def segmentBase(self) -> str:
+        # Name the log's segments are sealed under, alongside the log or in seg_dir
+        if self.seg_dir is None:
+            return self.log_fn
+
+        return os.path.join(self.seg_dir, os.path.basename(self.log_fn))
+
+    def segmentStart(self) -> float:
+        # When the log's current segment was started: its first record's time, or if that can't be had when it was
+        # last written (the oldest the file is known to be). Now if the log is empty.
+        try:
+            with open(self.log_fn, errors="replace") as f:
+                first_line = f.readline()
+            modified = os.path.getmtime(self.log_fn)
+        except OSError:
+            return time.time()
+
+        if not first_line:
+            return time.time()
+
+        started = recordTime(first_line)
+        return min(started, modified) if started is not None else modified
+
+    def write(self, lines:list, fsync:bool=False):
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.log_fn, "a")
+
+            for line in lines:
+                self.file.write(line)
+            self.file.flush()
+
+            if fsync:
+                os.fsync(self.file.fileno())
+
+            if self.isFull():
+                self.rotate()
+
+    def writeJson(self, msgs:list, fsync:bool=False):
+        self.write([f"{json.dumps(msg, default=jsonDefault)}\n" for msg in msgs], fsync)
+
+    def isFull(self) -> bool:
+        if (self.max_bytes > 0) and (self.file.tell() >= self.max_bytes):
+            return True
+
+        return (self.max_age > 0) and (time.time() - self.segment_start >= self.max_age)
+
+    def rotate(self):
+        with self.lock:
+            self.closeFile()
+            self.segment_start = time.time()
+
+            if not os.path.exists(self.log_fn):
+                return
+
+            seg_fn = segmentFn(self.segmentBase())
+            if self.seg_dir is None:
+                # Rename is cheap, the compression is left to the background
+                os.rename(self.log_fn, seg_fn)
+            else:
+                # Copy-truncate keeps the log's name and perms. Only the plain copy is made here, it's compressed in the
+                # background too.
+                try:
+                    os.makedirs(self.seg_dir, exist_ok=True)
+                    shutil.copyfile(self.log_fn, seg_fn)
+                    truncateFile(self.log_fn)
+                except OSError as e:
+                    self.logger.error(f"Failed to archive log: [{self.log_fn}] to folder: [{self.seg_dir}]. {e}")
+                    return
+
+            compressInBackground(seg_fn)
+            self.logger.info(f"Rotated log: [{self.log_fn}] to: [{seg_fn}]")
+
+    def closeFile(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def close(self):
+        with self.lock:
+            self.closeFile()
@@ -1,17 +1,30 @@
 
+import gzip
 import logging
 import json
 import os
 import re
 import shutil
+import struct
 import sys
 import time
+import wave
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 ARCHIVE_METHOD_MOVE="AMM"
 ARCHIVE_METHOD_TRUNCATE="AMT"
+ARCHIVE_METHOD_COMPRESS="AMC"
+
+# Sealed log segments are kept alongside the log as "<log>.<YYYYmmdd_HHMMSS.ffffff>", then compressed to "<...>.gz"
+SEGMENT_TS_FMT = "%Y%m%d_%H%M%S.%f"
+COMPRESSED_SUFFIX = ".gz"
+
+# Expected JT format: <DateTime_iso8601>_<DialfreqHz>_<mode>........
+#   eg 20251026T192630Z_10130000_usb........
+JT_FILENAME_REX = re.compile(r"(\d{8}T\d{6}Z)_(\d{7,})_(usb|lsb).*")
+JT_DATETIME_FMT = "%Y%m%dT%H%M%SZ"
 
 logger = logging.getLogger(__name__)
 
@@ -28,11 +41,14 @@ def findFile(dirss, re_pat, age_secs, sort:bool=True):
 
     files = []
 
+    # Compile once per scan rather than per directory entry
+    rex = re.compile(re_pat) if re_pat else None
+
     with os.scandir(dirss) as listOfEntries:
         for entry in listOfEntries:
             # If regex pattern provide only include file if it matches
-            if (re_pat):
-                res = re.search(re_pat, entry.name)
+            if (rex):
+                res = rex.search(entry.name)
                 if not res:
                     continue;
             
@@ -72,6 +88,10 @@ def archiveFile(fn:str, archiveDir: str=None, archiveMethod: str=ARCHIVE_METHOD_
                 # To preserve file perms we COPY original to destination then trucate the existing file.
                 shutil.copy(src, dest)
                 truncateFile(fn)
+            elif (archiveMethod == ARCHIVE_METHOD_COMPRESS):
+                # As TRUNCATE, but the copy is compressed
+                compressFile(src, f"{dest}{COMPRESSED_SUFFIX}")
+                truncateFile(fn)
             else:
                 # Move original and allow process to create new file
                 shutil.move(src, dest)
@@ -80,6 +100,97 @@ def archiveFile(fn:str, archiveDir: str=None, archiveMethod: str=ARCHIVE_METHOD_
         logger.error(f"Failed to archive file: [{fn}] to folder: [{archiveDir}] {e}")
 
 
+def compressFile(src_fn:str, dest_fn:str):
+    # Written to a tmp file and swapped in once complete, so dest_fn is never a partial file
+    tmp_fn = f"{dest_fn}.tmp"
+    with open(src_fn, "rb") as src, open(tmp_fn, "wb") as raw:
+        with gzip.GzipFile(filename=os.path.basename(src_fn), mode="wb", fileobj=raw) as dest:
+            shutil.copyfileobj(src, dest, 1024 * 1024)
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    os.replace(tmp_fn, dest_fn)
+
+def compressSegment(seg_fn:str):
+    # Compresses a sealed log segment, the uncompressed segment is only removed once the compressed one is in place
+    gz_fn = f"{seg_fn}{COMPRESSED_SUFFIX}"
+    compressFile(seg_fn, gz_fn)
+    os.remove(seg_fn)
+    return gz_fn
+
+def segmentFn(log_fn:str):
+    # Name for a newly sealed segment, unique even if the log is rotated more than once in the same instant
+    seg_dt = datetime.now(timezone.utc)
+    while True:
+        seg_fn = f"{log_fn}.{seg_dt.strftime(SEGMENT_TS_FMT)}"
+        if not (os.path.exists(seg_fn) or os.path.exists(f"{seg_fn}{COMPRESSED_SUFFIX}")):
+            return seg_fn
+        seg_dt += timedelta(microseconds=1)
+
+def segmentFiles(log_fn:str):
+    # {segment timestamp: (uncompressed segment name or None, compressed segment name or None)} of the log's sealed segments
+    log_dir, log_base = os.path.split(log_fn)
+    rex = re.compile(rf"^{re.escape(log_base)}\.(\d{{8}}_\d{{6}}\.\d{{6}})({re.escape(COMPRESSED_SUFFIX)})?$")
+
+    try:
+        names = os.listdir(log_dir or ".")
+    except FileNotFoundError:
+        names = []
+
+    segs = {}
+    for name in names:
+        match = rex.match(name)
+        if match:
+            raw_fn, gz_fn = segs.get(match.group(1), (None, None))
+            if match.group(2):
+                gz_fn = os.path.join(log_dir, name)
+            else:
+                raw_fn = os.path.join(log_dir, name)
+            segs[match.group(1)] = (raw_fn, gz_fn)
+
+    return segs
+
+def logSegments(log_fn:str, include_log:bool=True):
+    # Sealed segments of the log oldest first (the compressed one once compressed), followed by the log itself
+    segs = segmentFiles(log_fn)
+    seg_fns = [segs[seg_ts][1] or segs[seg_ts][0] for seg_ts in sorted(segs)]
+    if include_log and os.path.exists(log_fn):
+        seg_fns.append(log_fn)
+
+    return seg_fns
+
+def uncompressedSegments(log_fn:str):
+    # Sealed segments still to be compressed (including any left behind by an interrupted compression)
+    segs = segmentFiles(log_fn)
+    return [segs[seg_ts][0] for seg_ts in sorted(segs) if segs[seg_ts][0] is not None]
+
+def logExists(log_fn:str):
+    return len(logSegments(log_fn)) > 0
+
+def openLog(fn:str):
+    # Opens a log (or log segment) for reading, decompressing if compressed
+    if fn.endswith(COMPRESSED_SUFFIX):
+        return gzip.open(fn, "rt")
+
+    return open(fn, "r")
+
+def archiveLogSegments(log_fn:str, archiveDir:str):
+    # Moves the log's sealed segments to the archive folder (which may hold the segments of other logs with the same name)
+    Path(archiveDir).mkdir(parents=True, exist_ok=True)
+    for raw_fn, gz_fn in segmentFiles(log_fn).values():
+        for seg_fn in (raw_fn, gz_fn):
+            if seg_fn is None:
+                continue
+
+            seg_base = os.path.basename(seg_fn)
+            dest = f"{archiveDir}/{seg_base}"
+            dup = 1
+            while os.path.exists(dest):
+                dest = f"{archiveDir}/{dup}_{seg_base}"
+                dup += 1
+
+            shutil.move(seg_fn, dest)
+
 def writeStringsToFile(out_fn: str, str_list: list, append: bool=True):
     wmode = "w"
     if (append == True):
@@ -102,20 +213,167 @@ def writeStringToFile(out_fn: str, item: str, append: bool=True):
 
     return 0
 
+def jsonDefault(obj):
+    # Allows records with a toDict() (ie Js8Decode) to be serialised by json.dumps
+    if hasattr(obj, "toDict"):
+        return obj.toDict()
+
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
 def appendJson(parsedMsgs, log_fn):
     with open(log_fn, 'a') as file:
 
         for msg in parsedMsgs:
-            file.write(f"{json.dumps(msg)}\n")
+            file.write(f"{json.dumps(msg, default=jsonDefault)}\n")
+
+def iterJson(log_fn, factory=None):
+    # Streams the records of a JSON lines file one at a time, including any sealed (compressed) segments of it
+    for seg_fn in (logSegments(log_fn) or [log_fn]):
+        with openLog(seg_fn) as file:
+
+            for line in file:
+                try:
+                    msg = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Invalid decode message: [{line}] ignored.")
+                    continue
+
+                yield factory(msg) if factory else msg
+
+def loadJson(log_fn, factory=None):
+    return list(iterJson(log_fn, factory))
+
+def appendJsonAtomic(parsedMsgs, log_fn):
+    # Appends all the records with a single O_APPEND write, so readers never see a partial batch
+    data = "".join(f"{json.dumps(msg, default=jsonDefault)}\n" for msg in parsedMsgs).encode()
+    if not data:
+        return
+
+    fd = os.open(log_fn, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
+
+#################################################################################
+## Processed file manifest
+##   JSON lines of {"file", "size", "mtime", "version"}, later lines for a file override earlier ones.
+#################################################################################
+
+def manifestEntry(fn:str, version:int):
+    st = os.stat(fn)
+    return {"file": os.path.basename(fn), "size": st.st_size, "mtime": st.st_mtime_ns, "version": version}
+
+def isManifestCurrent(manifest:dict, fn:str, version:int):
+    rec = manifest.get(os.path.basename(fn))
+    if rec is None:
+        return False
+
+    try:
+        st = os.stat(fn)
+    except OSError:
+        return False
+
+    return (rec["size"] == st.st_size) and (rec["mtime"] == st.st_mtime_ns) and (rec["version"] == version)
+
+def loadManifest(manifest_fn:str):
+    manifest = {}
+    if os.path.exists(manifest_fn):
+        for rec in iterJson(manifest_fn):
+            manifest[rec["file"]] = rec
+
+    return manifest
+
+def writeManifest(manifest:dict, manifest_fn:str):
+    # Rewritten (compacted) atomically
+    tmp_fn = f"{manifest_fn}.tmp"
+    with open(tmp_fn, "w") as file:
+        for rec in manifest.values():
+            file.write(f"{json.dumps(rec)}\n")
+
+    os.replace(tmp_fn, manifest_fn)
+
+#################################################################################
+## JT Filename / WAV helpers
+#################################################################################
+
+def parseJTFilename(fn:str):
+    match = JT_FILENAME_REX.search(os.path.basename(fn))
+
+    if not match:
+        return None
+
+    return {
+        "record_time": datetime.strptime(match.group(1), JT_DATETIME_FMT).replace(tzinfo=timezone.utc),
+        "freq": int(match.group(2)),
+        "radio_mode": match.group(3)
+    }
+
+def formatJTFilename(record_time:datetime, freq_hz:int, radio_mode:str, ext:str="wav"):
+    return f"{record_time.strftime(JT_DATETIME_FMT)}_{freq_hz}_{radio_mode}.{ext}"
+
+def readWavInfo(fn:str):
+    # Walk the RIFF chunks rather than relying on the "wave" module so we also learn where the
+    # sample data starts within the file (needed to mmap it) and the size claimed by the header.
+    with open(fn, "rb") as f:
+        riff = f.read(12)
+        if (len(riff) < 12) or (riff[0:4] != b"RIFF") or (riff[8:12] != b"WAVE"):
+            raise ValueError(f"File: [{fn}] is not a RIFF/WAVE file.")
+
+        info = {"riff_size": struct.unpack("<I", riff[4:8])[0]}
+
+        while True:
+            hdr = f.read(8)
+            if len(hdr) < 8:
+                raise ValueError(f"File: [{fn}] has no data chunk.")
+
+            chunk_id, chunk_size = struct.unpack("<4sI", hdr)
+
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                (info["format"], info["channels"], info["sample_rate"], _, 
+                 info["block_align"], info["bits_per_sample"]) = struct.unpack("<HHIIHH", fmt[:16])
+                if chunk_size % 2:
+                    f.seek(1, os.SEEK_CUR)
+
+            elif chunk_id == b"data":
+                if "format" not in info:
+                    raise ValueError(f"File: [{fn}] data chunk found before fmt chunk.")
+                info["data_offset"] = f.tell()
+                info["data_size"] = chunk_size
+                break
+
+            else:
+                f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+
+    return info
+
+def isWavComplete(fn:str):
+    # A wav is complete once its header has been finalised (ie RIFF / data sizes patched on close) and 
+    # the file holds all the sample data the header claims.
+    try:
+        info = readWavInfo(fn)
+        file_size = os.path.getsize(fn)
+    except (OSError, ValueError, struct.error):
+        return False
+
+    data_size = info["data_size"]
+    if (data_size == 0) or (data_size == 0xFFFFFFFF):
+        return False
 
-def loadJson(log_fn):
-    msgs = []
-    with open(log_fn, 'r') as file:
+    if (info["riff_size"] + 8 > file_size) or (info["data_offset"] + data_size > file_size):
+        return False
 
-        for line in file:
-            try:
-                msgs.append(json.loads(line))
-            except json.JSONDecodeError:
-                logger.warning(f"Invalid decode message: [{line}] ignored.")
+    return True
 
-    return msgs
\ No newline at end of file
+def writeWav(out_fn:str, channels:int, sample_rate:int, sample_width:int, frames):
+    # frames may be any bytes-like object (eg a memoryview over an mmap) and is written without copying.
+    with wave.open(out_fn, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(sample_width)
+        w.setframerate(sample_rate)
+        w.setnframes(len(frames) // (channels * sample_width))
+        w.writeframesraw(frames)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Long lived js8 decoder worker.
+##
+##   Rather than starting "js8" for every recording, a decoder "server" is
+##   started once per decode worker and fed recordings over its stdin:
+##
+##     - started as: <server_cmd> -a <plan_dir> -t <scratch_dir>
+##     - once ready it prints "<ServerReady>"
+##     - each request is one line, the js8 arguments for a recording separated
+##       by tabs with the wav path last (ie "-f\t7078000\t--js8\t...\t<wav>")
+##     - it prints the decode output as "js8" would, ending with a line
+##       "<DecodeFinished>", or "<DecodeError> <reason>" if it failed
+##     - it exits when its stdin is closed
+##
+##   A server that doesn't finish a request within the decode timeout is
+##   killed (the decode pool then starts a new one). tests/js8server_stub.py
+##   is a stand-in server implementing the protocol.
+##
+##   The servers share the plan (FFTW wisdom) folder, each has its own scratch
+##   folder under a shared (ideally tmpfs) scratch area.
+##
+################################################################################
+
+import logging
+import os
+import select
+import subprocess
+import time
+
+from pathlib import Path
+
+SERVER_READY = "<ServerReady>"
+DECODE_FINISHED = "<DecodeFinished>"
+DECODE_ERROR = "<DecodeError>"
+
+# Secs to wait for a server to report it's ready, it's assumed it can't run as a server if it doesn't
+DEFAULT_SERVER_READY_TIMEOUT = 10
+# Secs a server has to finish decoding a recording before it's taken to be hung and killed
+DEFAULT_DECODE_TIMEOUT = 60
+
+logger = logging.getLogger(__name__)
+
+
+#################################################################################
+# Js8ServerWorker Class
+#################################################################################
+
+class Js8ServerWorker:
+
+    server_cmd: list
+    scratch_dir: str
+    plan_dir: str
+
+    def __init__(self, server_cmd:list, scratch_dir:str, plan_dir:str, ready_timeout:float=DEFAULT_SERVER_READY_TIMEOUT,
+                 decode_timeout:float=DEFAULT_DECODE_TIMEOUT):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.server_cmd = server_cmd
+        self.scratch_dir = scratch_dir
+        self.plan_dir = plan_dir
+        self.ready_timeout = ready_timeout
+        self.decode_timeout = decode_timeout
+
+        self.process = None
+        self.err_file = None
+        self.error = None
+        # Output read from the server but not yet returned as lines
+        self.out_buf = b""
+
+    def start(self) -> bool:
+        # Starts the server, returns False if it didn't start or report ready in time
+        Path(self.scratch_dir).mkdir(parents=True, exist_ok=True)
+        Path(self.plan_dir).mkdir(parents=True, exist_ok=True)
+
+        cmd = self.server_cmd + ["-a", self.plan_dir, "-t", self.scratch_dir]
+        # stderr goes to a file so it can never fill up a pipe nobody is reading
+        self.err_file = open(f"{self.scratch_dir}/server.err", "w")
+
+        try:
+            self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self.err_file, bufsize=0)
+        except OSError as e:
+            self.logger.warning(f"Unable to start js8 server: [{' '.join(cmd)}]. {e}")
+            self.stop()
+            return False
+
+        self.out_buf = b""
+        line = self.readLine(time.monotonic() + self.ready_timeout) or ""
+        if line.strip() != SERVER_READY:
+            self.logger.warning(f"js8 server: [{' '.join(cmd)}] did not report ready (got: [{line.strip()}]).")
+            self.stop(kill=True)
+            return False
+
+        self.logger.info(f"Started js8 server PID: [{self.process.pid}] Scratch: [{self.scratch_dir}]")
+        return True
+
+    def isAlive(self) -> bool:
+        return (self.process is not None) and (self.process.poll() is None)
+
+    def readLine(self, deadline:float):
+        # Next line of the server's output, "" at EOF or None if none by the deadline (time.monotonic()).
+        # stdout is read unbuffered so select() never waits on output already read.
+        fd = self.process.stdout.fileno()
+        while b"\n" not in self.out_buf:
+            ready, _, _ = select.select([fd], [], [], max(0, deadline - time.monotonic()))
+            if not ready:
+                return None
+
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                line, self.out_buf = self.out_buf, b""
+                return line.decode(errors="replace")
+
+            self.out_buf += chunk
+
+        line, _, self.out_buf = self.out_buf.partition(b"\n")
+        return line.decode(errors="replace") + "\n"
+
+    def decode(self, args:list):
+        # Yields the server's decode output lines for the recording (args as for js8, wav path last).
+        # Once done result() gives the (return code, error output) as would be had from running js8.
+        # If the server has died (or is killed as hung) it is stopped, so isAlive() is False and the pool starts a new one.
+        self.error = None
+
+        try:
+            self.process.stdin.write(("\t".join(args) + "\n").encode())
+            self.process.stdin.flush()
+        except OSError as e:
+            self.error = f"Failed to send request to js8 server. {e}"
+            self.stop()
+            return
+
+        deadline = time.monotonic() + self.decode_timeout
+        while True:
+            line = self.readLine(deadline)
+            if line is None:
+                self.error = f"js8 server PID: [{self.process.pid}] did not finish decoding within [{self.decode_timeout}] secs, killed."
+                self.logger.warning(self.error)
+                self.stop(kill=True)
+                return
+
+            if not line:
+                self.error = f"js8 server exited, return code: [{self.process.poll()}]"
+                self.stop()
+                return
+
+            if line.startswith(DECODE_ERROR):
+                self.error = line[len(DECODE_ERROR):].strip()
+                return
+
+            yield line
+
+            if line.startswith(DECODE_FINISHED):
+                return
+
+    def result(self):
+        if self.error is not None:
+            return 1, self.error
+
+        return 0, ""
+
+    def stop(self, kill:bool=False):
+        if self.process is not None:
+            try:
+                if kill:
+                    self.process.kill()
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+
+        if self.err_file is not None:
+            self.err_file.close()
+            self.err_file = None
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## PSKReporter uploader.
+##
+##   Takes spot records straight from the decoder, batches them and sends them
+##   to PSKReporter as IPFIX UDP datagrams (see https://pskreporter.info/pskdev.html)
+##   on a timer. A callsign is only reported once per band within the
+##   reporting interval.
+##
+##   Replaces tailing "/var/log/js8.log" with the patched "pskreporter-sender".
+##
+################################################################################
+
+import logging
+import random
+import socket
+import struct
+import threading
+import time
+
+DEFAULT_PSK_HOST="report.pskreporter.info"
+DEFAULT_PSK_PORT=4739
+# PSKReporter asks for uploads no more often than every 5mins
+DEFAULT_PSK_INTERVAL=300
+DECODER_SOFTWARE="ka9q-js8"
+
+# Kept under a typical MTU so the datagrams are never fragmented
+MAX_DATAGRAM_SIZE=1400
+# Record descriptors (templates) are sent in the first few datagrams then hourly
+TEMPLATE_INITIAL_PACKETS=3
+TEMPLATE_RESEND_SECS=3600
+
+IPFIX_VERSION = 0x000A
+IPFIX_HEADER = struct.Struct(">HHIII")
+SET_HEADER = struct.Struct(">HH")
+
+RECEIVER_TEMPLATE_ID = 0x9992
+SENDER_TEMPLATE_ID = 0x9993
+
+# Information source: 1 = automatically extracted
+INFORMATION_SOURCE_AUTOMATIC = 1
+
+# Receiver: receiverCallsign, receiverLocator, decoderSoftware, antennaInformation
+RECEIVER_TEMPLATE = bytes.fromhex(
+    "0003002C" "99920004" "0000"
+    "8002FFFF0000768F"
+    "8004FFFF0000768F"
+    "8008FFFF0000768F"
+    "8009FFFF0000768F"
+    "0000")
+
+# Sender: senderCallsign, frequency, sNR, mode, informationSource, senderLocator, flowStartSeconds
+SENDER_TEMPLATE = bytes.fromhex(
+    "0002003C" "99930007"
+    "8001FFFF0000768F"
+    "800500040000768F"
+    "800600010000768F"
+    "800AFFFF0000768F"
+    "800B00010000768F"
+    "8003FFFF0000768F"
+    "00960004")
+
+logger = logging.getLogger(__name__)
+
+
+def ipfixString(value:str) -> bytes:
+    data = (value or "").encode("utf-8")[:254]
+    return bytes([len(data)]) + data
+
+def ipfixSet(set_id:int, records:bytes) -> bytes:
+    # Sets are padded out to a multiple of 4 bytes
+    length = SET_HEADER.size + len(records)
+    padding = (4 - (length % 4)) % 4
+    return SET_HEADER.pack(set_id, length + padding) + records + (b"\0" * padding)
+
+def encodeSpot(spot:dict) -> bytes:
+    snr = max(-128, min(127, int(spot["snr"])))
+    return (ipfixString(spot["callsign"])
+            + struct.pack(">Ib", int(spot["freq"]), snr)
+            + ipfixString(spot["mode"])
+            + struct.pack(">B", INFORMATION_SOURCE_AUTOMATIC)
+            + ipfixString(spot["locator"])
+            + struct.pack(">I", int(spot["timestamp"])))
+
+
+#################################################################################
+# PSKReporterSender Class
+#################################################################################
+
+class PSKReporterSender:
+
+    callsign: str
+    locator: str
+    antenna: str
+    host: str
+    port: int
+    interval: int
+
+    def __init__(self, callsign:str, locator:str, antenna:str=None, host:str=DEFAULT_PSK_HOST, port:int=DEFAULT_PSK_PORT, interval:int=DEFAULT_PSK_INTERVAL):
+        self.logger = logging.getLogger("%s.%s" % (__name__, self.__class__.__name__))
+        self.callsign = callsign.upper()
+        self.locator = locator
+        self.antenna = antenna
+        self.host = host
+        self.port = port
+        self.interval = interval
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sequence = 0
+        self.observation_id = random.getrandbits(32)
+        self.packets_sent = 0
+        self.templates_sent_ts = 0
+
+        # Spots waiting for the next upload by (callsign, dial_freq), and when each key was last sent
+        self.pending = {}
+        self.reported = {}
+        self.lock = threading.Lock()
+        self.running = False
+        self.stopped = threading.Event()
+
+        self.receiver_record = ipfixString(self.callsign) + ipfixString(self.locator) + ipfixString(DECODER_SOFTWARE) + ipfixString(self.antenna)
+
+    def addSpots(self, spots:list, now:float=None):
+        # Queues spot records {callsign, locator, freq, dial_freq, snr, mode, timestamp} for the next upload
+        if now is None:
+            now = time.time()
+
+        with self.lock:
+            for spot in spots:
+                key = (spot["callsign"], spot["dial_freq"])
+                if key in self.pending:
+                    continue
+                last_ts = self.reported.get(key)
+                if (last_ts is not None) and (now - last_ts < self.interval):
+                    continue
+
+                self.pending[key] = spot
+
+    def buildDatagram(self, spots:list, pos:int, now:float, send_templates:bool):
+        # Packs as many spots from pos as fit (always at least one), returns the datagram and the position after the last spot
+        head = (RECEIVER_TEMPLATE + SENDER_TEMPLATE) if send_templates else b""
+        head += ipfixSet(RECEIVER_TEMPLATE_ID, self.receiver_record)
+
+        records = []
+        size = IPFIX_HEADER.size + len(head) + SET_HEADER.size + 3
+        while pos < len(spots):
+            record = encodeSpot(spots[pos])
+            if records and (size + len(record) > MAX_DATAGRAM_SIZE):
+                break
+            records.append(record)
+            size += len(record)
+            pos += 1
+
+        body = head + ipfixSet(SENDER_TEMPLATE_ID, b"".join(records))
+        header = IPFIX_HEADER.pack(IPFIX_VERSION, IPFIX_HEADER.size + len(body), int(now), self.sequence, self.observation_id)
+        return header + body, pos
+
+    def flush(self, now:float=None):
+        if now is None:
+            now = time.time()
+
+        # Held while sending too, so the datagram sequence numbers go out in order. UDP sends don't block for long.
+        with self.lock:
+            spots = list(self.pending.values())
+            self.pending = {}
+            # Keys older than the interval would no longer suppress a spot
+            self.reported = {key: ts for key, ts in self.reported.items() if now - ts < self.interval}
+
+            if not spots:
+                return 0
+
+            sent = 0
+            datagrams = 0
+            pos = 0
+            while pos < len(spots):
+                # Templates (and the sequence number) only count as sent once a datagram actually goes out
+                send_templates = (self.packets_sent < TEMPLATE_INITIAL_PACKETS) or (now - self.templates_sent_ts >= TEMPLATE_RESEND_SECS)
+                datagram, end = self.buildDatagram(spots, pos, now, send_templates)
+                try:
+                    self.sock.sendto(datagram, (self.host, self.port))
+                except OSError as e:
+                    # Kept for the next upload, and not marked as reported so they aren't suppressed meanwhile
+                    self.logger.warning(f"Failed to send [{end - pos}] spots to PSKReporter: [{self.host}:{self.port}], retrying next upload. {e}")
+                    for spot in spots[pos:end]:
+                        self.pending[(spot["callsign"], spot["dial_freq"])] = spot
+                    pos = end
+                    continue
+
+                for spot in spots[pos:end]:
+                    self.reported[(spot["callsign"], spot["dial_freq"])] = now
+                self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+                self.packets_sent += 1
+                if send_templates:
+                    self.templates_sent_ts = now
+                sent += end - pos
+                datagrams += 1
+                pos = end
+
+        self.logger.info(f"Sent [{sent}] spots to PSKReporter in [{datagrams}] datagrams.")
+        return sent
+
+    def close(self):
+        # Sends anything still pending
+        self.running = False
+        self.stopped.set()
+        self.flush()
+        self.sock.close()
+
+    def start(self):
+        self.running = True
+        self.logger.info(f"PSKReporter uploader started for: [{self.callsign}] Locator: [{self.locator}] Server: [{self.host}:{self.port}] Interval: [{self.interval}] secs.")
+
+        while not self.stopped.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.error(f"Failed to upload spots to PSKReporter. {e}")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Stand-in js8 decoder server (see ka9q_js8Worker) for testing.
+##
+##   Speaks the server protocol without decoding anything, every existing wav
+##   "decodes" to the same two frames. Misbehaviour is set from the environment:
+##
+##     STUB_CRASH_AT=<n>   exit (without a reply) on the n-th request
+##     STUB_HANG_AT=<n>    stop replying part way through the n-th request
+##     STUB_NOT_READY=1    never print "<ServerReady>"
+##
+################################################################################
+
+import os
+import sys
+import time
+
+DECODE_LINES = [
+    "000000 -10 0.1 1500 A HB VK4TMZ QG62",
+    "000000 -12 0.2 1800 A DIR VK4AAA VK4BBB SNR 3",
+]
+
+
+def envCount(name:str) -> int:
+    return int(os.environ.get(name, "0"))
+
+
+def main():
+    if envCount("STUB_NOT_READY"):
+        time.sleep(3600)
+        return
+
+    print("<ServerReady>", flush=True)
+
+    count = 0
+    for line in sys.stdin:
+        count += 1
+        args = line.rstrip("\n").split("\t")
+        wav_fn = args[-1]
+
+        if count == envCount("STUB_CRASH_AT"):
+            sys.exit(3)
+
+        if not os.path.isfile(wav_fn):
+            print(f"<DecodeError> No such file: [{wav_fn}]", flush=True)
+            continue
+
+        # Request echoed as js8 echoes its settings, so the args can be checked
+        print(f"<DecodeStarted> {' '.join(args[:-1])}", flush=True)
+        print(DECODE_LINES[0], flush=True)
+        if count == envCount("STUB_HANG_AT"):
+            time.sleep(3600)
+
+        for decode_line in DECODE_LINES[1:]:
+            print(decode_line)
+        print("<DecodeFinished>", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## APRS-IS sender against a local stand-in server: batching, reconnecting
+## after the server drops the connection, and draining the queue on close
+## (including during an outage).
+##
+##   python -m unittest discover -s tests
+##
+################################################################################
+
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+try:
+    from aprsis_reporter import APRSReporter, SEND_BATCH_SIZE, RECONNECT_BACKOFF_MIN
+except ImportError:
+    APRSReporter = None
+
+USER = "VK4TMZ"
+PASSCODE = "12345"
+
+
+def frames(count:int, start:int=0) -> list:
+    return [f"VK4A{i:02d}>APJ8CL,qAS,{USER}:>test {i}" for i in range(start, start + count)]
+
+
+#################################################################################
+# StandInServer Class
+#################################################################################
+
+class StandInServer:
+    # Minimal APRS-IS: banner, login response, then records the lines received on each connection.
+    # With drop_after the connection is closed once that many lines have been received on it.
+
+    def __init__(self, drop_after:int=0):
+        self.drop_after = drop_after
+        self.connections = []
+        self.dropped = threading.Event()
+        self.lock = threading.Lock()
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(4)
+        self.port = self.sock.getsockname()[1]
+
+        self.thread = threading.Thread(target=self.acceptLoop, daemon=True)
+        self.thread.start()
+
+    def acceptLoop(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            lines = []
+            with self.lock:
+                self.connections.append(lines)
+            threading.Thread(target=self.serve, args=(conn, lines), daemon=True).start()
+
+    def serve(self, conn, lines:list):
+        with conn:
+            conn.sendall(b"# aprsc stand-in\r\n")
+            reader = conn.makefile("rb")
+            login = reader.readline().decode("latin-1")
+            callsign = login.split(" ")[1]
+            conn.sendall(f"# logresp {callsign} verified, server TEST\r\n".encode("latin-1"))
+
+            for line in reader:
+                with self.lock:
+                    lines.append(line.decode("latin-1").rstrip("\r\n"))
+                if self.drop_after and len(lines) >= self.drop_after:
+                    break
+            reader.close()
+
+        if self.drop_after:
+            self.dropped.set()
+
+    def received(self) -> list:
+        with self.lock:
+            return [list(lines) for lines in self.connections]
+
+    def waitFor(self, count:int, timeout:float=5) -> list:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            received = self.received()
+            if sum(len(lines) for lines in received) >= count:
+                return received
+            time.sleep(0.02)
+        return self.received()
+
+    def close(self):
+        self.sock.close()
+
+
+@unittest.skipIf(APRSReporter is None, "aprslib / maidenhead not installed")
+class TestAPRSReporterSender(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_fn = os.path.join(self.tmp_dir.name, "aprs_frames.log")
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.close()
+        self.tmp_dir.cleanup()
+
+    def reporter(self, port:int) -> APRSReporter:
+        return APRSReporter(reporter=USER, user=USER, passcode=PASSCODE, host="127.0.0.1", port=port, log_fn=self.log_fn)
+
+    def loggedFrames(self) -> list:
+        with open(self.log_fn) as f:
+            return [line.rstrip("\n").split(": ", 1)[1] for line in f]
+
+    def testBatchesAndDrainsOnClose(self):
+        self.server = StandInServer()
+        reporter = self.reporter(self.server.port)
+
+        # Queued before the sender starts, so it finds them all waiting
+        sent = frames(2 * SEND_BATCH_SIZE + 5)
+        for frame in sent:
+            reporter.send_queue.put_nowait(("2026/10/17-00:00:00", frame))
+
+        writes = []
+        sendall = reporter.AIS.sendall
+        def countingSendall(line):
+            writes.append(line.count("\r\n") + 1)
+            sendall(line)
+        reporter.AIS.sendall = countingSendall
+
+        reporter.startSender()
+        reporter.close()
+
+        self.assertFalse(reporter.sender.is_alive())
+        self.assertEqual(writes, [SEND_BATCH_SIZE, SEND_BATCH_SIZE, 5])
+        self.assertEqual(self.server.waitFor(len(sent)), [sent])
+        self.assertEqual(self.loggedFrames(), sent)
+
+    def testReconnectsAfterServerDrop(self):
+        self.server = StandInServer(drop_after=3)
+        reporter = self.reporter(self.server.port)
+
+        first = frames(3)
+        for frame in first:
+            reporter.sendFrame(frame)
+        self.assertTrue(self.server.dropped.wait(5))
+        # Let the server's close reach the client before the next frames are written
+        time.sleep(0.2)
+
+        second = frames(2, start=3)
+        for frame in second:
+            reporter.sendFrame(frame)
+        reporter.close()
+
+        self.assertEqual(self.server.waitFor(len(first) + len(second)), [first, second])
+        self.assertEqual(self.loggedFrames(), first + second)
+
+    def testCloseDuringOutage(self):
+        # Nothing listening, every connect is refused and the sender backs off
+        probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+        probe.close()
+
+        reporter = self.reporter(port)
+        queued = frames(SEND_BATCH_SIZE + 5)
+        for frame in queued:
+            reporter.send_queue.put_nowait(("2026/10/17-00:00:00", frame))
+        reporter.startSender()
+        time.sleep(0.3)
+
+        start = time.time()
+        reporter.close()
+
+        self.assertLess(time.time() - start, RECONNECT_BACKOFF_MIN)
+        self.assertFalse(reporter.sender.is_alive())
+        # Unsent frames, including those never taken off the queue, still end up in the log
+        self.assertEqual(self.loggedFrames(), queued)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Checkpoint restore: activity paged out to the callsign history between the
+## last snapshot and a crash is replaced, not added again, when the WAL is
+## replayed.
+##
+##   python -m unittest discover -s tests
+##
+################################################################################
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+try:
+    from ka9q_js8 import Js8FrameAggregator
+    from ka9q_js8Checkpoint import Js8Checkpoint
+    from ka9q_js8History import Js8CallsignHistory
+    from ka9q_js8Parser import Js8Decode, Js8ThreadType
+except ImportError:
+    Js8FrameAggregator = Js8Decode = None
+
+FREQ_LIST = [7078, 14078]
+MAX_ACTIVITIES = 10
+START_TS = 1761506790
+
+
+def heartbeat(idx:int) -> Js8Decode:
+    # A single frame (complete) activity, a different callsign every 4th
+    callsign = f"VK4A{chr(ord('A') + (idx % 4))}"
+    return Js8Decode(timestamp=START_TS + (idx * 15), dial_freq=FREQ_LIST[idx % 2] * 1000, offset=1000 + (idx % 7) * 100,
+                     thread_type=Js8ThreadType.SINGLE, frame_class="Js8FrameHeartbeat", js8mode="A", callsign=callsign,
+                     locator="QG62", msg=f"{callsign}: @HB HEARTBEAT QG62", db=-10, is_valid=True)
+
+
+@unittest.skipIf(Js8FrameAggregator is None, "ka9q_js8 dependencies (ie js8py) are not installed")
+class Js8CheckpointRestoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_fn = f"{self.tmp_dir.name}/callsign_history.sqlite"
+        self.checkpoint_dir = f"{self.tmp_dir.name}/checkpoint"
+        self.history = None
+
+    def tearDown(self):
+        self.history.close()
+        self.tmp_dir.cleanup()
+
+    def startDecoder(self):
+        # The frame processing state as the decoder restores it on start up
+        self.history = Js8CallsignHistory(self.db_fn, MAX_ACTIVITIES)
+        self.aggregator = Js8FrameAggregator(None, self.history, FREQ_LIST, len(FREQ_LIST))
+        self.checkpoint = Js8Checkpoint(self.checkpoint_dir, self.aggregator.toSnapshot, 300, len(FREQ_LIST))
+        replayed = self.checkpoint.restore(self.aggregator.loadSnapshot,
+                                           lambda frame, watermark: self.aggregator.replayFrame(Js8Decode.fromDict(frame), watermark))
+        self.aggregator.checkpoint = self.checkpoint
+        return replayed
+
+    def crash(self):
+        # Nothing more is written, what was only in memory (or not committed) is lost
+        for wal in self.checkpoint.wals:
+            wal.close()
+        self.history.db.close()
+        self.history.db = None
+
+    def process(self, frames:list):
+        # As the aggregator's shard threads would
+        for frame in frames:
+            shard = self.aggregator.shardFor(frame["dial_freq"])
+            self.checkpoint.processFrame(shard["index"], shard["proc"].processFrame, frame)
+
+    def activityCounts(self) -> dict:
+        # (callsign, timestamp) -> times the activity is held, paged out or in memory
+        counts = {}
+        for callsign, cs_rec in self.history.toDict().items():
+            for act_rec in cs_rec["activity"]:
+                key = (callsign, act_rec["timestamp"])
+                counts[key] = counts.get(key, 0) + 1
+
+        return counts
+
+    def test_replay_after_spill(self):
+        frames = [heartbeat(idx) for idx in range(4 * MAX_ACTIVITIES)]
+        self.startDecoder()
+        self.process(frames[:5])
+        self.checkpoint.snapshot()
+
+        # Paged out (and committed) after the snapshot, then the decoder dies
+        self.process(frames[5:])
+        with sqlite3.connect(self.db_fn) as db:
+            paged_out = db.execute("SELECT COUNT(*) FROM activity").fetchone()[0]
+        self.assertGreater(paged_out, 0)
+        self.crash()
+
+        self.assertEqual(self.startDecoder(), len(frames) - 5)
+        counts = self.activityCounts()
+        self.assertEqual(len(counts), len(frames))
+        self.assertEqual(set(counts.values()), {1})
+
+        # Replayed activity paged out again replaces its earlier row
+        self.process([heartbeat(idx) for idx in range(len(frames), len(frames) + (2 * MAX_ACTIVITIES))])
+        counts = self.activityCounts()
+        self.assertEqual(len(counts), len(frames) + (2 * MAX_ACTIVITIES))
+        self.assertEqual(set(counts.values()), {1})
+
+        rows = self.history.db.execute("SELECT COUNT(*), COUNT(DISTINCT callsign || timestamp) FROM activity").fetchone()
+        self.assertEqual(rows[0], rows[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
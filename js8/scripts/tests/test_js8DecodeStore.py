@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Js8DecodeStore: an incremental rebuild replaces a reparsed decode file's
+## decodes however its path was spelt, and only for its frequency / submode.
+##
+##   python -m unittest discover -s tests
+##
+################################################################################
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+try:
+    from ka9q_js8DecodeStore import Js8DecodeStore
+except ImportError:
+    Js8DecodeStore = None
+
+DIAL_FREQ = 7078000
+DECODE_FN = "20251026T192630Z_7078000_usb.wav.decode"
+
+
+def decode(decode_file:str, msg:str) -> dict:
+    return {"timestamp": 1761506790, "callsign": "VK4TMZ", "dial_freq": DIAL_FREQ, "spot": True, "is_valid": True,
+            "msg": msg, "decode_file": decode_file}
+
+
+@unittest.skipIf(Js8DecodeStore is None, "js8py is not installed")
+class Js8DecodeStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_fn = f"{self.tmp_dir.name}/{DECODE_FN}.sqlite"
+        self.store = None
+
+    def tearDown(self):
+        if self.store is not None:
+            self.store.close()
+        self.tmp_dir.cleanup()
+
+    def msgs(self, submode:str="normal") -> list:
+        return [dec["msg"] for dec in self.store.query(submodes=[submode])]
+
+    def test_replace_other_spelling(self):
+        self.store = Js8DecodeStore(self.db_fn)
+
+        # Decoded live with an absolute data folder, rebuilt with a relative one
+        self.store.addDecodes([decode(f"/srv/js8/data/7078000/normal/decode/done/{DECODE_FN}", "old")], "normal")
+        self.store.addDecodes([decode(f"/srv/js8/data/7078000/turbo/decode/done/{DECODE_FN}", "turbo")], "turbo")
+        self.store.replaceDecodeFiles([decode(f"./data/7078000/normal/decode/done/{DECODE_FN}", "new")], [DECODE_FN], DIAL_FREQ, "normal")
+
+        self.assertEqual(self.msgs(), ["new"])
+        # The turbo decode file of the same name is left alone
+        self.assertEqual(self.msgs("turbo"), ["turbo"])
+        # The record still has the decode file's path
+        self.assertEqual(self.store.query(submodes=["normal"])[0]["decode_file"], f"./data/7078000/normal/decode/done/{DECODE_FN}")
+
+    def test_upgrade(self):
+        # A store written with the decode file paths
+        self.store = Js8DecodeStore(self.db_fn)
+        self.store.addDecodes([decode(None, "undecoded")], "normal")
+        self.store.close()
+
+        with sqlite3.connect(self.db_fn) as db:
+            db.execute("INSERT INTO decode (timestamp, callsign, dial_freq, submode, spot, is_valid, decode_file, rec) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                       (1761506790, "VK4TMZ", DIAL_FREQ, "normal", 1, 1, f"/srv/js8/{DECODE_FN}", '{"msg": "old"}'))
+            db.execute("PRAGMA user_version = 0")
+
+        self.store = Js8DecodeStore(self.db_fn)
+        self.store.replaceDecodeFiles([decode(f"data/{DECODE_FN}", "new")], [DECODE_FN], DIAL_FREQ, "normal")
+        self.assertEqual(sorted(self.msgs()), ["new", "undecoded"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Energy gate against synthetic recordings: white noise alone must (almost)
+## never pass, a JS8 like 8-FSK signal at the SNR documented in ka9q_js8Gate
+## must (almost) always pass.
+##
+##   python -m unittest discover -s tests
+##
+################################################################################
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ka9q_js8Gate import Js8EnergyGate
+from ka9q_js8Utils import writeWav
+
+SAMPLE_RATE = 12000
+NOISE_SIGMA = 2000.0
+
+# name: (duration secs, bandwidth Hz, baud / tone spacing Hz, SNR dB it's documented to pass from)
+SUBMODES = {
+    "turbo": (6, 160, 20.0, -14),
+    "fast": (10, 80, 10.0, -18),
+    "norm": (15, 50, 6.25, -20),
+    "slow": (30, 25, 3.125, -22),
+}
+
+# Symbols in a JS8 frame
+JS8_SYMBOLS = 79
+
+# Slots tested and how many may go the wrong way (noise passing under 1% of the time, signals 90%+)
+NOISE_SLOTS = 20
+NOISE_PASSES_ALLOWED = 1
+SIGNAL_SLOTS = 10
+SIGNAL_MISSES_ALLOWED = 1
+
+
+def synthSlot(rng, duration:int, baud:float=None, snr_db:float=None):
+    # White noise with (optionally) a random 8-FSK frame at snr_db (in 2500Hz) starting 0.5s into the slot
+    samples = rng.normal(0, NOISE_SIGMA, SAMPLE_RATE * duration)
+
+    if snr_db is not None:
+        noise_density = NOISE_SIGMA ** 2 / (SAMPLE_RATE / 2)
+        amplitude = np.sqrt(2 * (10 ** (snr_db / 10)) * noise_density * 2500)
+        tones = rng.integers(0, 8, JS8_SYMBOLS)
+        freqs = np.repeat(rng.uniform(300, 2700) + (tones * baud), int(SAMPLE_RATE / baud))
+        signal = amplitude * np.cos(2 * np.pi * np.cumsum(freqs) / SAMPLE_RATE)
+
+        start = SAMPLE_RATE // 2
+        count = min(len(signal), len(samples) - start)
+        samples[start:start + count] += signal[:count]
+
+    return np.clip(samples, -32768, 32767).astype("<i2").tobytes()
+
+
+class Js8EnergyGateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.gate = Js8EnergyGate()
+        self.rng = np.random.default_rng(8)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.wav_fn = f"{self.tmp_dir.name}/slot.wav"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def passes(self, duration:int, bandwidth:int, baud:float=None, snr_db:float=None) -> bool:
+        writeWav(self.wav_fn, 1, SAMPLE_RATE, 2, synthSlot(self.rng, duration, baud, snr_db))
+        return self.gate.isOccupied(self.wav_fn, bandwidth)
+
+    def test_noise_rejected(self):
+        for name, (duration, bandwidth, _, _) in SUBMODES.items():
+            with self.subTest(submode=name):
+                passed = sum(self.passes(duration, bandwidth) for _ in range(NOISE_SLOTS))
+                self.assertLessEqual(passed, NOISE_PASSES_ALLOWED, f"{passed} of {NOISE_SLOTS} noise only slots passed")
+
+    def test_signal_accepted(self):
+        for name, (duration, bandwidth, baud, snr_db) in SUBMODES.items():
+            with self.subTest(submode=name, snr_db=snr_db):
+                passed = sum(self.passes(duration, bandwidth, baud, snr_db) for _ in range(SIGNAL_SLOTS))
+                self.assertGreaterEqual(passed, SIGNAL_SLOTS - SIGNAL_MISSES_ALLOWED, f"{passed} of {SIGNAL_SLOTS} slots at {snr_db}dB passed")
+
+    def test_silence_rejected(self):
+        writeWav(self.wav_fn, 1, SAMPLE_RATE, 2, bytes(2 * SAMPLE_RATE * 15))
+        self.assertFalse(self.gate.isOccupied(self.wav_fn, 50))
+
+    def test_unmeasurable_decoded(self):
+        # Too short to measure, so it's decoded rather than skipped
+        writeWav(self.wav_fn, 1, SAMPLE_RATE, 2, bytes(100))
+        self.assertTrue(self.gate.isOccupied(self.wav_fn, 50))
+
+
+if __name__ == "__main__":
+    unittest.main()
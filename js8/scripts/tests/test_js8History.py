@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Js8CallsignHistory: last heard and by hour queries answer from both the in
+## memory activity and activity paged out to the database.
+##
+##   python -m unittest discover -s tests
+##
+################################################################################
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+try:
+    from ka9q_js8History import Js8CallsignHistory, activityDateHour
+    from ka9q_js8Parser import Js8Decode
+except ImportError:
+    Js8CallsignHistory = None
+
+MAX_ACTIVITIES = 10
+START_TS = 1761506790
+DIAL_FREQS = [7078000, 14078000]
+
+
+def activity(act_id:int, callsign:str, dial_freq:int, timestamp:int) -> dict:
+    # A completed (heartbeat) activity as added by the frame processor
+    msg = Js8Decode(timestamp=timestamp, dial_freq=dial_freq, offset=1500, callsign=callsign, locator="QG62",
+                    msg=f"{callsign}: @HB HEARTBEAT QG62", frame_class="Js8FrameHeartbeat", thread_type=3)
+    return {"id": f"act-{act_id}", "offset": 1500, "first_ts": timestamp, "last_ts": timestamp, "is_complete": True,
+            "msgs": [msg], "timestamp": timestamp, "callsign": callsign, "locator": "QG62", "dial_freq": dial_freq,
+            "freq": dial_freq + 1500}
+
+
+@unittest.skipIf(Js8CallsignHistory is None, "js8py is not installed")
+class Js8CallsignHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.history = Js8CallsignHistory(f"{self.tmp_dir.name}/history.db", max_activities=MAX_ACTIVITIES)
+
+        # Activity 2.5 mins apart over ~2 hours. VK4TMZ is heard first (and every 5th) so its earliest activity is
+        # paged out by the others'
+        self.added = []
+        for idx in range(5 * MAX_ACTIVITIES):
+            callsign = "VK4TMZ" if (idx % 5 == 0) else f"VK2A{chr(ord('A') + (idx % 5))}"
+            act_rec = activity(idx, callsign, DIAL_FREQS[idx % 2], START_TS + (idx * 150))
+            self.history.addActivity(callsign, act_rec)
+            self.added.append(act_rec)
+
+    def tearDown(self):
+        self.history.close()
+        self.tmp_dir.cleanup()
+
+    def spilled(self) -> int:
+        return self.history.db.execute("SELECT COUNT(*) FROM activity").fetchone()[0]
+
+    def test_spilled(self):
+        self.assertGreater(self.spilled(), 0)
+        self.assertLess(len(self.history.recent), MAX_ACTIVITIES + self.history.spill_batch)
+
+    def test_last_heard(self):
+        tmz_recs = [act_rec for act_rec in self.added if act_rec["callsign"] == "VK4TMZ"]
+        heard = self.history.lastHeard("VK4TMZ")
+        self.assertEqual(heard["first_ts"], tmz_recs[0]["timestamp"])
+        self.assertEqual(heard["last_ts"], tmz_recs[-1]["timestamp"])
+        self.assertIsNone(self.history.lastHeard("VK9XX"))
+
+    def test_last_heard_paged_out(self):
+        # A callsign all of whose activity has been paged out
+        self.history.addActivity("VK3OLD", activity(1000, "VK3OLD", DIAL_FREQS[0], START_TS - 3600))
+        for idx in range(MAX_ACTIVITIES + self.history.spill_batch):
+            self.history.addActivity("VK2AB", activity(2000 + idx, "VK2AB", DIAL_FREQS[0], START_TS + 7200 + idx))
+
+        self.assertNotIn("VK3OLD", self.history.callsigns)
+        heard = self.history.lastHeard("VK3OLD")
+        self.assertEqual((heard["last_freq"], heard["first_ts"], heard["last_ts"]), (DIAL_FREQS[0], START_TS - 3600, START_TS - 3600))
+
+    def test_activity_by_hour(self):
+        # Every hour VK4TMZ was heard in, from paged out and in memory activity, matches what was added
+        expected = {}
+        for act_rec in self.added:
+            if act_rec["callsign"] == "VK4TMZ":
+                hour_recs = expected.setdefault(activityDateHour(act_rec), {})
+                hour_recs.setdefault(act_rec["dial_freq"], []).append(act_rec["id"])
+
+        self.assertGreater(self.spilled(), 0)
+        for (dt_YMD, dt_H), band_ids in expected.items():
+            with self.subTest(hour=f"{dt_YMD} {dt_H}"):
+                band_recs = self.history.activityByHour("VK4TMZ", dt_YMD, dt_H)
+                self.assertEqual({dial_freq: [act_rec["id"] for act_rec in recs] for dial_freq, recs in band_recs.items()}, band_ids)
+
+        # Paged out activity comes back as it was added
+        first = self.added[0]
+        dt_YMD, dt_H = activityDateHour(first)
+        paged = self.history.activityByHour("VK4TMZ", dt_YMD, dt_H)[first["dial_freq"]][0]
+        self.assertEqual(paged["timestamp"], first["timestamp"])
+        self.assertEqual(paged["msgs"][0]["msg"], first["msgs"][0]["msg"])
+
+        self.assertEqual(self.history.activityByHour("VK4TMZ", "2000-01-01", "00"), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
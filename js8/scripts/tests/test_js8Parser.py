@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Js8Parser fast path (parse_many / processJs8DecodeStream: one reused js8py
+## Js8, status lines skipped by prefix, per recording fields set once) against
+## the slow path: a new js8py Js8 parse_message() for every line.
+##
+##   python -m unittest discover -s tests
+##
+################################################################################
+
+import os
+import sys
+import unittest
+
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+try:
+    from js8py import Js8
+    from ka9q_js8Parser import Js8Parser, internThreadType
+except ImportError:
+    Js8 = Js8Parser = None
+
+FREQ_KHZ = 7078
+RECORD_TIME = datetime(2025, 10, 26, 19, 26, 30, tzinfo=timezone.utc)
+
+# A decode as output by "js8": status lines around "<time> <snr> <dt> <offset> <submode> <frame> <thread type>" 
+# lines, across the submodes and thread types. Followed by lines that aren't decodes.
+DECODE_LINES = [
+    "<DecodeStarted>\n",
+    "000000 -12  0.3 1210 A  PKLGG1rGFWAx 3\n",
+    "000000  -4 -0.2 1500 A  2Klgq1iNLBw0 1\n",
+    "000000 -18  0.1  934 A  ZeQAcfI37Tt9 0\n",
+    "000000 -20  1.4 1847 A  cNyOyF9S-CWG 2\n",
+    "000000   3  0.0  752 B  a+0Kq7Mzz1Dd 3\n",
+    "000000 -16  0.6 2010 C  XUAlkG6+rzp0 1\n",
+    "000000 -24 -1.1 1320 E  Hh0-9rrTqgyA 2\n",
+    " <DecodeDebug> candidate 1210 sync 3.2\n",
+    " <DecodeFinished>\n",
+]
+INVALID_LINES = [
+    "\n",
+    " EOF on input file\n",
+    "not a decode\n",
+    "000000 -12\n",
+]
+
+
+def slowParse(line:str):
+    # The frame from a new js8py instance, None if it isn't one
+    try:
+        return Js8().parse_message(line.rstrip())
+    except Exception:
+        return None
+
+
+@unittest.skipIf(Js8 is None, "js8py is not installed")
+class Js8ParserFastPathTest(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = DECODE_LINES + INVALID_LINES
+        self.frames = [slowParse(line) for line in self.lines]
+        if not any(self.frames):
+            self.skipTest("js8py decoded none of the sample lines")
+
+    def decodes(self, parser:Js8Parser, lines:list, record_time:datetime=RECORD_TIME, freq_khz:int=FREQ_KHZ) -> list:
+        return [dec.toDict() for dec in parser.parse_many(lines, record_time, freq_khz)]
+
+    def test_matches_slow_path(self):
+        decodes = Js8Parser(FREQ_KHZ, "usb").parse_many(self.lines, RECORD_TIME)
+
+        # Only the lines js8py takes as frames are decodes, and in order
+        frames = [(line, frame) for line, frame in zip(self.lines, self.frames) if frame is not None]
+        self.assertEqual([dec.raw_msg for dec in decodes], [line for line, _ in frames])
+
+        for dec, (line, frame) in zip(decodes, frames):
+            with self.subTest(line=line):
+                self.assertEqual(dec.msg, str(frame))
+                self.assertEqual(dec.frame_class, frame.__class__.__name__)
+                self.assertEqual(dec.js8mode, frame.mode)
+                self.assertEqual(dec.db, frame.db)
+                self.assertEqual(dec.dt, frame.dt)
+                self.assertEqual(dec.offset, int(frame.freq))
+                self.assertEqual(dec.freq, (FREQ_KHZ * 1000) + frame.freq)
+                self.assertEqual(dec.thread_type, internThreadType(frame.thread_type))
+                self.assertEqual(dec.timestamp, int(RECORD_TIME.timestamp()))
+                self.assertEqual(dec.record_time, "2025/10/26 19:26:30")
+
+    def test_stream_matches_batch(self):
+        batch = self.decodes(Js8Parser(FREQ_KHZ, "usb"), self.lines)
+        fn = f"/tmp/{RECORD_TIME.strftime('%Y%m%dT%H%M%SZ')}_{FREQ_KHZ * 1000}_usb.wav"
+        stream = [dec.toDict() for dec in Js8Parser(FREQ_KHZ, "usb").processJs8DecodeStream(iter(self.lines), fn)]
+        self.assertEqual(stream, batch)
+
+    def test_instance_reuse(self):
+        # Each line parsed by a parser of its own, ie a new js8py instance
+        expected = [self.decodes(Js8Parser(FREQ_KHZ, "usb"), [line]) for line in self.lines]
+
+        # One parser (one js8py instance) reused: repeatedly, in reverse and between recordings of other bands / times
+        parser = Js8Parser(FREQ_KHZ, "usb")
+        for _ in range(3):
+            self.assertEqual(self.decodes(parser, self.lines), sum(expected, []))
+
+        self.assertEqual(self.decodes(parser, self.lines[::-1]), sum(expected[::-1], []))
+
+        other_time = datetime(2025, 10, 26, 19, 27, 0, tzinfo=timezone.utc)
+        for line, line_expected in zip(self.lines, expected):
+            other = self.decodes(parser, [line], other_time, 14078)
+            self.assertEqual(len(other), len(line_expected))
+            self.assertEqual(self.decodes(parser, [line]), line_expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## rebuild-history replays each frequency's decodes in timestamp order, even
+## though the decode logs are written in the order slots were decoded.
+##
+##   python -m unittest discover -s tests
+##
+################################################################################
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+try:
+    from ka9q_js8 import Js8FrameProcessor, timestampOrder, ACTIVITY_WINDOW_SECS
+    from ka9q_js8Parser import Js8Decode, Js8ThreadType
+except ImportError:
+    Js8FrameProcessor = Js8Decode = Js8ThreadType = None
+
+DIAL_FREQ = 7078000
+START_TS = 1761506790
+
+
+def frame(timestamp:int, frame_class:str, thread_type:Js8ThreadType, offset:int, js8mode:str="A") -> Js8Decode:
+    return Js8Decode(timestamp=timestamp, dial_freq=DIAL_FREQ, offset=offset, thread_type=thread_type, frame_class=frame_class,
+                     js8mode=js8mode, callsign="VK4TMZ", locator="QG62", msg="VK4TMZ: VK2ABC HELLO", db=-10, is_valid=True)
+
+
+@unittest.skipIf(Js8FrameProcessor is None, "ka9q_js8 dependencies (ie js8py) are not installed")
+class TimestampOrderTest(unittest.TestCase):
+
+    def test_order(self):
+        normal = [frame(START_TS + ts, "Js8FrameHeartbeat", Js8ThreadType.SINGLE, 1000) for ts in (30, 0, 15, 60, 45)]
+        turbo = [frame(START_TS + ts, "Js8FrameHeartbeat", Js8ThreadType.SINGLE, 2000, "C") for ts in (6, 0, 12)]
+        merged = list(timestampOrder([normal, turbo]))
+
+        self.assertEqual(len(merged), 8)
+        timestamps = [dec["timestamp"] - START_TS for dec in merged]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_activity_completed(self):
+        # A two frame message whose last frame's slot was decoded after a later slot (ie caught up from a backlog)
+        later_ts = START_TS + 15 + (2 * ACTIVITY_WINDOW_SECS)
+        normal = [frame(START_TS, "Js8FrameDirected", Js8ThreadType.FIRST, 1500),
+                  frame(later_ts, "Js8FrameHeartbeat", Js8ThreadType.SINGLE, 2500),
+                  frame(START_TS + 15, "Js8FrameData", Js8ThreadType.LAST, 1500)]
+
+        frame_proc = Js8FrameProcessor(aprsReporter=None, keep_completed=True)
+        for dec in timestampOrder([normal]):
+            frame_proc.processFrame(dec)
+
+        message = [act_rec for act_rec in frame_proc.msgByFreq[DIAL_FREQ].values() if act_rec["offset"] == 1500]
+        self.assertEqual(len(message), 1)
+        self.assertTrue(message[0]["is_complete"])
+        self.assertEqual(len(message[0]["msgs"]), 2)
+        self.assertEqual(frame_proc.msgByFreq_incomplete[DIAL_FREQ], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
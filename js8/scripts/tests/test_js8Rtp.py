@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## RTP ingest: packet parsing, slot cutting (gaps, late packets, closing a
+## slot on its last sample), payload type filtering, and a local multicast
+## sender end to end.
+##
+##   python -m unittest discover -s tests
+##
+################################################################################
+
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+import unittest
+
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ka9q_js8Rtp import Js8RtpIngest, RtpSlotCutter, parseRtpPacket, RTP_PT_L16_STEREO
+
+# Low sample rate keeps the slots small: a normal (15s) slot is 1500 samples
+SAMPLE_RATE = 100
+SUBMODES = [{"name": "normal", "duration": 15}, {"name": "turbo", "duration": 6}]
+# Start of a slot of both submodes
+SLOT_START = 1761506790
+# RTP timestamp of the first sample, wraps during the first slot
+RTP_TS = 0xFFFFFF00
+SSRC = 7078000
+PT = 122
+
+MCAST_GROUP = "239.77.8.1"
+MCAST_PORT = 45004
+
+
+def rtpPacket(ts:int, payload:bytes, pt:int=PT, ssrc:int=SSRC, seq:int=0, csrcs:int=0, ext:bytes=None, padding:int=0) -> bytes:
+    b0 = 0x80 | csrcs | (0x10 if ext is not None else 0) | (0x20 if padding else 0)
+    pkt = struct.pack("!BBHII", b0, pt, seq, ts & 0xFFFFFFFF, ssrc) + bytes(4 * csrcs)
+    if ext is not None:
+        pkt += struct.pack("!HH", 0xBEDE, len(ext) // 4) + ext
+    pkt += payload
+    if padding:
+        pkt += bytes(padding - 1) + bytes([padding])
+
+    return pkt
+
+def samples(count:int, value:int, byteorder:str=">") -> bytes:
+    return struct.pack(f"{byteorder}{count}h", *([value] * count))
+
+def pcmSamples(pcm:bytes) -> array:
+    # Windows are handed on in native byte order
+    out = array("h")
+    out.frombytes(pcm)
+    return out
+
+
+class ParseRtpPacketTest(unittest.TestCase):
+
+    def test_parse(self):
+        rtp = parseRtpPacket(rtpPacket(RTP_TS, b"\x01\x02", seq=7))
+        self.assertEqual((rtp["pt"], rtp["seq"], rtp["timestamp"], rtp["ssrc"], rtp["payload"]), (PT, 7, RTP_TS, SSRC, b"\x01\x02"))
+        self.assertFalse(rtp["marker"])
+
+    def test_csrc_extension_padding(self):
+        rtp = parseRtpPacket(rtpPacket(RTP_TS, b"\x01\x02\x03\x04", csrcs=2, ext=bytes(8), padding=4))
+        self.assertEqual(rtp["payload"], b"\x01\x02\x03\x04")
+
+    def test_invalid(self):
+        self.assertIsNone(parseRtpPacket(b"\x80\x7a"))
+        # Version 1
+        self.assertIsNone(parseRtpPacket(b"\x40" + rtpPacket(RTP_TS, b"\x01\x02")[1:]))
+        # Extension / CSRCs past the end of the packet
+        self.assertIsNone(parseRtpPacket(b"\x90" + rtpPacket(RTP_TS, b"")[1:]))
+        self.assertIsNone(parseRtpPacket(b"\x8f" + rtpPacket(RTP_TS, b"\x01\x02")[1:]))
+
+
+class RtpSlotCutterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.windows = []
+        self.cutter = RtpSlotCutter(SSRC, SUBMODES, self.onWindow, sample_rate=SAMPLE_RATE)
+
+    def onWindow(self, ssrc:int, submode:dict, slot_start:int, pcm:bytes):
+        self.windows.append((submode["name"], slot_start, pcmSamples(pcm)))
+
+    def feed(self, start:int, end:int, value:int=100, packet:int=100, ):
+        # Samples start to end (from the slot start) in packets, each received (as the cutter takes it) when its first 
+        # sample is due
+        for first in range(start, end, packet):
+            count = min(packet, end - first)
+            self.cutter.addSamples(RTP_TS + first, samples(count, value), SLOT_START + (first / SAMPLE_RATE))
+
+    def slotWindows(self, name:str) -> list:
+        return [(slot_start - SLOT_START, pcm) for submode, slot_start, pcm in self.windows if submode == name]
+
+    def test_slot_closed_on_last_sample(self):
+        self.feed(0, 1400)
+        self.assertEqual(self.slotWindows("normal"), [])
+        self.assertEqual([start for start, _ in self.slotWindows("turbo")], [0, 6])
+
+        # The last packet closes the slot, no need to wait for the next one
+        self.feed(1400, 1500)
+        normal = self.slotWindows("normal")
+        self.assertEqual(len(normal), 1)
+        start, pcm = normal[0]
+        self.assertEqual(start, 0)
+        self.assertEqual(len(pcm), 1500)
+        self.assertEqual(set(pcm), {100})
+
+    def test_packet_straddles_slots(self):
+        self.feed(0, 1550, packet=110)
+        self.assertEqual([start for start, _ in self.slotWindows("normal")], [0])
+        self.assertEqual([start for start, _ in self.slotWindows("turbo")], [0, 6])
+
+    def test_gap(self):
+        # 100 samples lost: 7% of the normal slot (still decoded, the gap silent), 17% of the first turbo slot (dropped)
+        self.feed(0, 500)
+        self.feed(600, 1500)
+
+        start, pcm = self.slotWindows("normal")[0]
+        self.assertEqual(set(pcm[500:600]), {0})
+        self.assertEqual(set(pcm[:500]) | set(pcm[600:]), {100})
+        self.assertEqual([start for start, _ in self.slotWindows("turbo")], [6])
+
+    def test_late_packet(self):
+        self.feed(0, 1600)
+        self.assertEqual(len(self.slotWindows("normal")), 1)
+
+        # A packet of the closed slot arriving late is dropped, not taken into the next slot
+        self.cutter.addSamples(RTP_TS + 1450, samples(50, -5), SLOT_START + 16.5)
+        self.feed(1600, 3000, value=200)
+
+        normal = self.slotWindows("normal")
+        self.assertEqual([start for start, _ in normal], [0, 15])
+        self.assertEqual(set(normal[0][1]), {100})
+        self.assertEqual(set(normal[1][1][:100]), {100})
+        self.assertEqual(set(normal[1][1][100:]), {200})
+
+    def test_resync(self):
+        self.feed(0, 300)
+        # radiod restarted: the RTP timestamp jumps, the cutter re-anchors to the wall clock
+        self.cutter.addSamples(RTP_TS + 500000, samples(100, 100), SLOT_START + 4)
+        self.assertEqual(self.cutter.ext_ts, 0)
+
+
+class Js8RtpIngestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.windows = []
+
+    def onWindow(self, key, submode:dict, slot_start:int, pcm:bytes):
+        self.windows.append((key, submode["name"], slot_start, pcmSamples(pcm)))
+
+    def ingest(self, payload_types:dict=None, **kwargs) -> Js8RtpIngest:
+        return Js8RtpIngest(MCAST_GROUP, {SSRC: 7078}, SUBMODES, self.onWindow, port=MCAST_PORT, sample_rate=SAMPLE_RATE,
+                            payload_types=payload_types, **kwargs)
+
+    def feed(self, ingest:Js8RtpIngest, start:int, end:int, pt:int=PT, byteorder:str=">", value:int=100):
+        for first in range(start, end, 100):
+            ingest.processPacket(rtpPacket(RTP_TS + first, samples(100, value, byteorder), pt=pt), SLOT_START + (first / SAMPLE_RATE))
+
+    def test_first_payload_type_taken(self):
+        ingest = self.ingest()
+        self.feed(ingest, 0, 700)
+        # The channel switched to (ie) Opus
+        self.feed(ingest, 700, 1000, pt=111)
+
+        self.assertEqual(ingest.stats["packets"], 7)
+        self.assertEqual(ingest.stats["rejected_pt"], 3)
+        self.assertEqual([(name, slot_start - SLOT_START) for _, name, slot_start, _ in self.windows], [("turbo", 0)])
+
+    def test_stereo_not_taken(self):
+        ingest = self.ingest()
+        self.feed(ingest, 0, 200, pt=RTP_PT_L16_STEREO)
+        self.feed(ingest, 200, 300)
+
+        self.assertEqual(ingest.stats["rejected_pt"], 2)
+        self.assertEqual(ingest.ssrc_pt, {SSRC: PT})
+
+    def test_mapped_payload_types(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy is not installed")
+
+        ingest = self.ingest({PT: "s16le"})
+        self.feed(ingest, 0, 600, byteorder="<", value=1234)
+        self.feed(ingest, 600, 700, pt=PT + 1)
+
+        self.assertEqual(ingest.stats["rejected_pt"], 1)
+        _, name, _, pcm = self.windows[0]
+        self.assertEqual(name, "turbo")
+        self.assertEqual(set(pcm), {1234})
+
+    def test_invalid_packets(self):
+        ingest = self.ingest()
+        ingest.processPacket(b"\x00" * 8)
+        ingest.processPacket(rtpPacket(RTP_TS, samples(10, 1), ssrc=1))
+        ingest.processPacket(rtpPacket(RTP_TS, b"\x01\x02\x03"))
+
+        self.assertEqual(ingest.stats, {"packets": 0, "unknown_ssrc": 1, "invalid": 2, "rejected_pt": 0})
+
+    def test_multicast(self):
+        # A local sender pacing 1s slots of audio in real time over loopback multicast
+        submodes = [{"name": "second", "duration": 1}]
+        ingest = Js8RtpIngest(MCAST_GROUP, {SSRC: 7078}, submodes, self.onWindow, port=MCAST_PORT, sample_rate=SAMPLE_RATE,
+                              iface_addr="127.0.0.1")
+        ingest_thread = threading.Thread(target=ingest.start, daemon=True)
+        ingest_thread.start()
+
+        try:
+            sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton("127.0.0.1"))
+            sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+
+            deadline = time.time() + 5
+            while (ingest.sock is None) and (time.time() < deadline):
+                time.sleep(0.05)
+            if ingest.sock is None:
+                self.skipTest("Unable to join a multicast group on loopback")
+
+            for idx in range(25):
+                sender.sendto(rtpPacket(RTP_TS + (idx * 10), samples(10, 100), seq=idx), (MCAST_GROUP, MCAST_PORT))
+                time.sleep(0.1)
+            sender.close()
+        finally:
+            ingest.stop()
+            ingest_thread.join(timeout=5)
+
+        # 2.5s of audio, so at least one whole slot (the first may start part way through a slot)
+        self.assertEqual(ingest.stats["packets"], 25)
+        self.assertTrue(all((key, name, len(pcm)) == (7078, "second", SAMPLE_RATE) for key, name, _, pcm in self.windows))
+        self.assertGreaterEqual(len([pcm for _, _, _, pcm in self.windows if set(pcm) == {100}]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Js8SegmentedLog age: a log is rotated once its first record is older than
+## the segment age, including across restarts. Copy-truncate rotation into a
+## segment folder.
+##
+##   python -m unittest discover -s tests
+##
+################################################################################
+
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ka9q_js8Segments import Js8SegmentedLog, waitForCompression
+
+SEGMENT_AGE = 60 * 60
+
+
+class Js8SegmentedLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_fn = f"{self.tmp_dir.name}/all_parsed_decodes.txt"
+        self.seg_dir = f"{self.tmp_dir.name}/segments"
+
+    def tearDown(self):
+        waitForCompression()
+        self.tmp_dir.cleanup()
+
+    def openLog(self, lines:list=None) -> Js8SegmentedLog:
+        # The log as found on (re)start, holding lines
+        if lines is not None:
+            with open(self.log_fn, "w") as f:
+                f.writelines(lines)
+
+        # Rotated by a copy into seg_dir
+        return Js8SegmentedLog(self.log_fn, 0, SEGMENT_AGE, self.seg_dir)
+
+    def rotated(self) -> bool:
+        return os.path.isdir(self.seg_dir) and (len(os.listdir(self.seg_dir)) > 0)
+
+    def test_new_log(self):
+        log = self.openLog()
+        self.assertAlmostEqual(log.segment_start, time.time(), delta=5)
+
+        log.write(["first\n"])
+        log.close()
+        self.assertFalse(self.rotated())
+
+    def test_decode_log_age_kept(self):
+        started = int(time.time()) - (2 * SEGMENT_AGE)
+        log = self.openLog([f"{json.dumps({'timestamp': started, 'msg': 'HB'})}\n"])
+        self.assertEqual(log.segment_start, started)
+
+        # Already past its age, so the next write seals it
+        log.write([f"{json.dumps({'timestamp': int(time.time()), 'msg': 'HB'})}\n"])
+        log.close()
+        self.assertTrue(self.rotated())
+        self.assertEqual(os.path.getsize(self.log_fn), 0)
+
+    def test_recent_log_not_rotated(self):
+        started = int(time.time()) - (SEGMENT_AGE // 2)
+        log = self.openLog([f"{json.dumps({'timestamp': started})}\n"])
+
+        log.write(["next\n"])
+        log.close()
+        self.assertFalse(self.rotated())
+
+    def test_spot_log_age_kept(self):
+        started = time.time() - (2 * SEGMENT_AGE)
+        spot = f"{time.strftime('%Y/%m/%d %H:%M:%S', time.gmtime(started))}   -10  0.1 A   7.0795    VK4TMZ QG62 ~ VK4TMZ: @HB HEARTBEAT QG62\n"
+        log = self.openLog([spot])
+        self.assertAlmostEqual(log.segment_start, started, delta=1)
+
+    def test_unknown_records_use_mtime(self):
+        log = self.openLog(["not a record\n"])
+        modified = time.time() - (2 * SEGMENT_AGE)
+        os.utime(self.log_fn, (modified, modified))
+
+        log = self.openLog()
+        self.assertAlmostEqual(log.segment_start, modified, delta=1)
+
+    def test_copy_truncate(self):
+        started = int(time.time()) - (2 * SEGMENT_AGE)
+        first = f"{json.dumps({'timestamp': started, 'msg': 'HB'})}\n"
+        log = self.openLog([first])
+        os.chmod(self.log_fn, 0o640)
+
+        second = f"{json.dumps({'timestamp': int(time.time()), 'msg': 'HB'})}\n"
+        log.write([second])
+        waitForCompression()
+
+        # Same file (and perms) left in place, the copy compressed
+        self.assertEqual(os.path.getsize(self.log_fn), 0)
+        self.assertEqual(os.stat(self.log_fn).st_mode & 0o777, 0o640)
+        segs = os.listdir(self.seg_dir)
+        self.assertEqual(len(segs), 1)
+        self.assertTrue(segs[0].startswith("all_parsed_decodes.txt.") and segs[0].endswith(".gz"))
+        with gzip.open(f"{self.seg_dir}/{segs[0]}", "rt") as f:
+            self.assertEqual(f.read(), first + second)
+
+        # Written on after the truncate
+        log.write(["next\n"])
+        log.close()
+        with open(self.log_fn) as f:
+            self.assertEqual(f.read(), "next\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
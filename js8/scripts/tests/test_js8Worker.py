@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## Js8ServerWorker against the stand-in server (js8server_stub.py): the
+## request / reply protocol, decode errors, and a server that crashes or hangs
+## being stopped so the decode pool starts a new one.
+##
+##   python -m unittest discover -s tests
+##
+################################################################################
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+from unittest import mock
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, ".."))
+
+from ka9q_js8Worker import Js8ServerWorker, DECODE_FINISHED
+
+SERVER_CMD = [sys.executable, os.path.join(TESTS_DIR, "js8server_stub.py")]
+DECODE_ARGS = ["-f", "7078000", "--js8", "-b", "A", "-d", "3"]
+
+
+class Js8ServerWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.wav_fn = f"{self.tmp_dir.name}/slot.wav"
+        with open(self.wav_fn, "wb") as f:
+            f.write(bytes(44))
+
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.stop()
+        self.tmp_dir.cleanup()
+
+    def startServer(self, env:dict=None, **kwargs) -> bool:
+        self.server = Js8ServerWorker(SERVER_CMD, f"{self.tmp_dir.name}/scratch", f"{self.tmp_dir.name}/plans", **kwargs)
+        with mock.patch.dict(os.environ, env or {}):
+            return self.server.start()
+
+    def decode(self, wav_fn:str=None):
+        return list(self.server.decode(DECODE_ARGS + [wav_fn or self.wav_fn]))
+
+    def test_decode(self):
+        self.assertTrue(self.startServer())
+
+        # The server is reused, each request gets its own complete reply
+        for _ in range(3):
+            lines = self.decode()
+            self.assertEqual(lines[0], f"<DecodeStarted> {' '.join(DECODE_ARGS)}\n")
+            self.assertEqual(lines[1], "000000 -10 0.1 1500 A HB VK4TMZ QG62\n")
+            self.assertTrue(lines[-1].startswith(DECODE_FINISHED))
+            self.assertEqual(self.server.result(), (0, ""))
+            self.assertTrue(self.server.isAlive())
+
+    def test_decode_error(self):
+        self.assertTrue(self.startServer())
+
+        self.assertEqual(self.decode(f"{self.tmp_dir.name}/missing.wav"), [])
+        code, error = self.server.result()
+        self.assertEqual(code, 1)
+        self.assertIn("missing.wav", error)
+
+        # A failed recording doesn't stop the server
+        self.assertTrue(self.server.isAlive())
+        self.decode()
+        self.assertEqual(self.server.result(), (0, ""))
+
+    def test_not_ready(self):
+        started = time.monotonic()
+        self.assertFalse(self.startServer({"STUB_NOT_READY": "1"}, ready_timeout=0.5))
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertFalse(self.server.isAlive())
+
+    def test_crash(self):
+        self.assertTrue(self.startServer({"STUB_CRASH_AT": "2"}))
+
+        self.decode()
+        self.assertEqual(self.server.result(), (0, ""))
+
+        self.assertEqual(self.decode(), [])
+        code, error = self.server.result()
+        self.assertEqual(code, 1)
+        self.assertIn("exited", error)
+        self.assertFalse(self.server.isAlive())
+
+    def test_hang(self):
+        self.assertTrue(self.startServer({"STUB_HANG_AT": "1"}, decode_timeout=0.5))
+
+        started = time.monotonic()
+        lines = self.decode()
+        self.assertLess(time.monotonic() - started, 5)
+
+        # The lines sent before it hung are still had, then it's killed
+        self.assertEqual(len(lines), 2)
+        code, error = self.server.result()
+        self.assertEqual(code, 1)
+        self.assertIn("killed", error)
+        self.assertFalse(self.server.isAlive())
+
+        # A new server takes over (as the decode pool does)
+        self.assertTrue(self.startServer())
+        self.decode()
+        self.assertEqual(self.server.result(), (0, ""))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+
+################################################################################
+##
+## PSKReporter uploader against a local UDP sink: datagrams are received and
+## decoded as IPFIX (set padding, size limit, template resends, sequence
+## numbers), plus per band de-duplication and re-queueing after a failed send.
+##
+##   python -m unittest discover -s tests
+##
+################################################################################
+
+import os
+import socket
+import struct
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pskreporter_sender import (PSKReporterSender, MAX_DATAGRAM_SIZE, TEMPLATE_INITIAL_PACKETS, TEMPLATE_RESEND_SECS, IPFIX_VERSION, IPFIX_HEADER,
+                                SET_HEADER, RECEIVER_TEMPLATE_ID, SENDER_TEMPLATE_ID, DECODER_SOFTWARE)
+
+NOW = 1761506790
+INTERVAL = 300
+
+# Template and options template set ids
+TEMPLATE_SET_IDS = (2, 3)
+# Smallest sender record: 3 empty strings, frequency, sNR, informationSource and flowStartSeconds
+MIN_SENDER_RECORD = 3 + 4 + 1 + 1 + 4
+
+
+def spot(i:int, dial_freq:int=7078000, callsign:str=None) -> dict:
+    # Callsign / locator lengths vary so the sets need differing amounts of padding
+    return {"callsign": callsign or f"VK{i % 10}{'A' * (1 + i % 3)}{i}", "locator": ["QG62", "QG62ls", "PF95"][i % 3], "freq": dial_freq + 1000 + i,
+            "dial_freq": dial_freq, "snr": -20 + (i % 30), "mode": "JS8", "timestamp": NOW - i}
+
+def readString(data:bytes, pos:int):
+    length = data[pos]
+    return data[pos + 1:pos + 1 + length].decode("utf-8"), pos + 1 + length
+
+def decodeSender(data:bytes):
+    spots = []
+    pos = 0
+    while len(data) - pos >= MIN_SENDER_RECORD:
+        callsign, pos = readString(data, pos)
+        freq, snr = struct.unpack_from(">Ib", data, pos)
+        mode, pos = readString(data, pos + 5)
+        pos += 1
+        locator, pos = readString(data, pos)
+        timestamp, = struct.unpack_from(">I", data, pos)
+        pos += 4
+        spots.append({"callsign": callsign, "locator": locator, "freq": freq, "snr": snr, "mode": mode, "timestamp": timestamp})
+
+    return spots, pos
+
+
+#################################################################################
+# UdpSink Class
+#################################################################################
+
+class UdpSink:
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.2)
+        self.port = self.sock.getsockname()[1]
+
+    def receive(self) -> list:
+        datagrams = []
+        while True:
+            try:
+                datagrams.append(self.sock.recv(65535))
+            except socket.timeout:
+                return datagrams
+
+    def close(self):
+        self.sock.close()
+
+
+class TestPSKReporterSender(unittest.TestCase):
+
+    def setUp(self):
+        self.sink = UdpSink()
+        self.sender = PSKReporterSender(callsign="vk4tmz", locator="QG62ls", antenna="EFHW", host="127.0.0.1", port=self.sink.port, interval=INTERVAL)
+
+    def tearDown(self):
+        self.sender.sock.close()
+        self.sink.close()
+
+    def decode(self, datagram:bytes) -> dict:
+        # Checks the IPFIX framing and returns the sets found
+        self.assertLessEqual(len(datagram), MAX_DATAGRAM_SIZE)
+        version, length, export_ts, sequence, observation_id = IPFIX_HEADER.unpack_from(datagram)
+        self.assertEqual(version, IPFIX_VERSION)
+        self.assertEqual(length, len(datagram))
+
+        decoded = {"export_ts": export_ts, "sequence": sequence, "observation_id": observation_id, "templates": [], "receiver": None, "spots": [], "padded": False}
+        pos = IPFIX_HEADER.size
+        while pos < length:
+            set_id, set_length = SET_HEADER.unpack_from(datagram, pos)
+            self.assertEqual(set_length % 4, 0)
+            self.assertLessEqual(pos + set_length, length)
+            data = datagram[pos + SET_HEADER.size:pos + set_length]
+
+            if set_id in TEMPLATE_SET_IDS:
+                decoded["templates"].append(struct.unpack_from(">H", data)[0])
+            elif set_id == RECEIVER_TEMPLATE_ID:
+                callsign, end = readString(data, 0)
+                locator, end = readString(data, end)
+                software, end = readString(data, end)
+                antenna, end = readString(data, end)
+                decoded["receiver"] = (callsign, locator, software, antenna)
+                self.assertEqual(data[end:], b"\0" * (len(data) - end))
+                decoded["padded"] |= end < len(data)
+            elif set_id == SENDER_TEMPLATE_ID:
+                records, end = decodeSender(data)
+                self.assertEqual(data[end:], b"\0" * (len(data) - end))
+                decoded["spots"].extend(records)
+                decoded["padded"] |= end < len(data)
+            else:
+                self.fail(f"Unexpected set id: {set_id:#x}")
+
+            pos += set_length
+
+        self.assertEqual(pos, length)
+        return decoded
+
+    def testDatagramsDecode(self):
+        spots = [spot(i) for i in range(200)]
+        self.sender.addSpots(spots, now=NOW)
+        self.assertEqual(self.sender.flush(now=NOW), len(spots))
+
+        decoded = [self.decode(datagram) for datagram in self.sink.receive()]
+        # Too many for one datagram
+        self.assertGreater(len(decoded), 1)
+
+        received = [s for d in decoded for s in d["spots"]]
+        expected = [{key: s[key] for key in ("callsign", "locator", "freq", "snr", "mode", "timestamp")} for s in spots]
+        self.assertEqual(received, expected)
+
+        self.assertEqual([d["sequence"] for d in decoded], list(range(len(decoded))))
+        self.assertEqual({d["observation_id"] for d in decoded}, {self.sender.observation_id})
+        self.assertTrue(all(d["export_ts"] == NOW for d in decoded))
+        self.assertTrue(all(d["receiver"] == ("VK4TMZ", "QG62ls", DECODER_SOFTWARE, "EFHW") for d in decoded))
+        self.assertTrue(any(d["padded"] for d in decoded))
+
+        # Templates go in the first few datagrams only
+        with_templates = [bool(d["templates"]) for d in decoded]
+        self.assertEqual(with_templates, [True] * TEMPLATE_INITIAL_PACKETS + [False] * (len(decoded) - TEMPLATE_INITIAL_PACKETS))
+        self.assertEqual(decoded[0]["templates"], [RECEIVER_TEMPLATE_ID, SENDER_TEMPLATE_ID])
+
+    def testTemplatesResent(self):
+        for n, ts in enumerate([NOW, NOW + 60, NOW + 120, NOW + 180, NOW + TEMPLATE_RESEND_SECS - 1, NOW + 2 * TEMPLATE_RESEND_SECS]):
+            self.sender.addSpots([spot(n, callsign=f"VK4T{n}")], now=ts)
+            self.sender.flush(now=ts)
+
+        decoded = [self.decode(datagram) for datagram in self.sink.receive()]
+        # The last template went out with the 3rd datagram, so the 5th doesn't have them, an hour later they are resent
+        self.assertEqual([bool(d["templates"]) for d in decoded], [True, True, True, False, False, True])
+
+    def testOncePerBandPerInterval(self):
+        self.sender.addSpots([spot(1), spot(1), spot(1, dial_freq=14078000)], now=NOW)
+        self.sender.addSpots([spot(1)], now=NOW + 10)
+        self.assertEqual(self.sender.flush(now=NOW + 10), 2)
+
+        # Reported, so suppressed for the rest of the interval
+        self.sender.addSpots([spot(1)], now=NOW + 20)
+        self.assertEqual(self.sender.flush(now=NOW + 20), 0)
+        self.sender.addSpots([spot(1)], now=NOW + 10 + INTERVAL)
+        self.assertEqual(self.sender.flush(now=NOW + 10 + INTERVAL), 1)
+
+        self.assertEqual(len([s for d in self.sink.receive() for s in self.decode(d)["spots"]]), 3)
+
+    def testFailedSendRequeued(self):
+        spots = [spot(i) for i in range(5)]
+        self.sender.addSpots(spots, now=NOW)
+        self.sender.port = 0
+        self.assertEqual(self.sender.flush(now=NOW), 0)
+
+        # Not marked as reported, and still only queued once
+        self.sender.addSpots(spots, now=NOW + 10)
+        self.sender.port = self.sink.port
+        self.assertEqual(self.sender.flush(now=NOW + 20), len(spots))
+
+        decoded = [self.decode(datagram) for datagram in self.sink.receive()]
+        self.assertEqual([s["callsign"] for d in decoded for s in d["spots"]], [s["callsign"] for s in spots])
+        # Nothing went out before, so the sequence starts at 0 and the templates are sent
+        self.assertEqual(decoded[0]["sequence"], 0)
+        self.assertTrue(decoded[0]["templates"])
+
+
+if __name__ == "__main__":
+    unittest.main()